@@ -13,9 +13,8 @@ ensure('spacy')
 ensure('requests')
 
 import spacy
-import requests
-import time
 from pprint import pprint
+from wikidata_linker import WikidataLinker, best_match
 
 # load or download fr model
 try:
@@ -25,53 +24,31 @@ except OSError:
     subprocess.check_call([sys.executable, '-m', 'spacy', 'download', 'fr_core_news_sm'])
     nlp = spacy.load('fr_core_news_sm')
 
-# Wikidata search helper
-WIKIDATA_SEARCH_URL = 'https://www.wikidata.org/w/api.php'
-
-def wikidata_search(label, language='fr', limit=1):
-    params = {
-        'action':'wbsearchentities',
-        'format':'json',
-        'language': language,
-        'type':'item',
-        'search': label,
-        'limit': limit
-    }
-    try:
-        r = requests.get(WIKIDATA_SEARCH_URL, params=params, timeout=10)
-        r.raise_for_status()
-        return r.json().get('search', [])
-    except Exception:
-        return []
-
-# extract + link
-def extract_and_link(text, nlp=nlp, sleep_between=0.08):
+# extract + link: unique entities are resolved in one batch through the cached linker
+def extract_and_link(text, nlp=nlp, linker=None):
     doc = nlp(text)
-    results = []
+    ents = []
     seen = set()
     for ent in doc.ents:
         key = (ent.text, ent.label_)
         if key in seen:
             continue
         seen.add(key)
-        candidates = wikidata_search(ent.text, language='fr', limit=3)
-        if candidates:
-            best = candidates[0]
-            results.append({
-                'text': ent.text,
-                'label': ent.label_,
-                'wikidata_id': best.get('id'),
-                'wikidata_label': best.get('label'),
-                'description': best.get('description'),
-                'match': best.get('match')
-            })
+        ents.append(key)
+    own_linker = linker is None
+    linker = linker or WikidataLinker(language='fr', limit=3)
+    try:
+        candidates = linker.search_many(t for t, _ in ents)
+    finally:
+        if own_linker:
+            linker.close()
+    results = []
+    for text_, label in ents:
+        best = best_match(candidates.get(text_))
+        if best:
+            results.append({'text': text_, 'label': label, **best})
         else:
-            results.append({
-                'text': ent.text,
-                'label': ent.label_,
-                'wikidata_id': None
-            })
-        time.sleep(sleep_between)
+            results.append({'text': text_, 'label': label, 'wikidata_id': None})
     return results
 
 if __name__ == '__main__':
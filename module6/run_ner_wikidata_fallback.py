@@ -11,27 +11,8 @@ def ensure(pkg):
 # Try to ensure requests only (we won't force spaCy model install here)
 ensure('requests')
 
-import requests
-import time
 from pprint import pprint
-
-WIKIDATA_SEARCH_URL = 'https://www.wikidata.org/w/api.php'
-
-def wikidata_search(label, language='fr', limit=1):
-    params = {
-        'action':'wbsearchentities',
-        'format':'json',
-        'language': language,
-        'type':'item',
-        'search': label,
-        'limit': limit
-    }
-    try:
-        r = requests.get(WIKIDATA_SEARCH_URL, params=params, timeout=10)
-        r.raise_for_status()
-        return r.json().get('search', [])
-    except Exception:
-        return []
+from wikidata_linker import WikidataLinker, best_match
 
 # Heuristic extractor: sequences of capitalized words (allowing small lower-case connectors like de, la)
 CAP_PATTERN = re.compile(r"\b([A-ZÀÂÄÇÉÈÊËÎÏÔÖÙÛÜŸ][\w'’\-]+(?:[\s\-](?:de|du|des|la|le|les|van|von|and|of|el|al|d'|l')?\s*[A-ZÀÂÄÇÉÈÊËÎÏÔÖÙÛÜŸ][\w'’\-]+)*)\b")
@@ -66,46 +47,36 @@ except Exception:
 
 print('spaCy model available:', use_spacy)
 
-def extract_and_link(text, sleep_between=0.08):
-    results = []
+def extract_and_link(text, linker=None):
     if use_spacy:
         doc = nlp(text)
+        ents = []
         seen = set()
         for ent in doc.ents:
             key = (ent.text, ent.label_)
             if key in seen:
                 continue
             seen.add(key)
-            candidates = wikidata_search(ent.text, language='fr', limit=3)
-            if candidates:
-                best = candidates[0]
-                results.append({
-                    'text': ent.text,
-                    'label': ent.label_,
-                    'wikidata_id': best.get('id'),
-                    'wikidata_label': best.get('label'),
-                    'description': best.get('description')
-                })
-            else:
-                results.append({'text': ent.text, 'label': ent.label_, 'wikidata_id': None})
-            time.sleep(sleep_between)
+            ents.append(key)
     else:
         # heuristic
-        cands = heuristic_extract(text)
-        for cand in cands:
-            candidates = wikidata_search(cand, language='fr', limit=3)
-            if candidates:
-                best = candidates[0]
-                results.append({
-                    'text': cand,
-                    'label': 'HEUR',
-                    'wikidata_id': best.get('id'),
-                    'wikidata_label': best.get('label'),
-                    'description': best.get('description')
-                })
-            else:
-                results.append({'text': cand, 'label': 'HEUR', 'wikidata_id': None})
-            time.sleep(sleep_between)
+        ents = [(cand, 'HEUR') for cand in heuristic_extract(text)]
+
+    # unique labels are resolved in one batch through the cached linker
+    own_linker = linker is None
+    linker = linker or WikidataLinker(language='fr', limit=3)
+    try:
+        candidates = linker.search_many(t for t, _ in ents)
+    finally:
+        if own_linker:
+            linker.close()
+    results = []
+    for text_, label in ents:
+        best = best_match(candidates.get(text_))
+        if best:
+            results.append({'text': text_, 'label': label, **best})
+        else:
+            results.append({'text': text_, 'label': label, 'wikidata_id': None})
     return results
 
 if __name__ == '__main__':
@@ -0,0 +1,169 @@
+# Wikidata entity linking with a persistent cache and concurrent, rate-limited lookups
+# Used by run_ner_wikidata.py and run_ner_wikidata_fallback.py.
+#
+# - label -> candidates are cached in SQLite with a TTL; empty results are cached too
+#   (negative caching, shorter TTL) so unknown labels are not re-queried every run
+# - one pooled requests.Session with retries is shared by all lookups
+# - cache misses are fetched concurrently by a thread pool, throttled to a max request rate
+# - the endpoint is configurable (WIKIDATA_API_URL or url=...) to run against a local stub server
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+WIKIDATA_SEARCH_URL = os.getenv('WIKIDATA_API_URL', 'https://www.wikidata.org/w/api.php')
+CACHE_PATH = os.path.join(os.path.dirname(__file__), 'wikidata_cache.sqlite')
+TTL = 30 * 24 * 3600           # positive results: 30 days
+NEGATIVE_TTL = 24 * 3600       # empty results: 1 day
+USER_AGENT = 'tac-wikidata-linker/1.0'
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls at least 1/rate seconds apart."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class WikidataLinker:
+    def __init__(self, cache_path=CACHE_PATH, url=WIKIDATA_SEARCH_URL, language='fr', limit=3,
+                 max_workers=4, rate=10.0, ttl=TTL, negative_ttl=NEGATIVE_TTL, timeout=10):
+        self.url = url
+        self.language = language
+        self.limit = limit
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+        self.stats = {'hits': 0, 'misses': 0, 'requests': 0, 'errors': 0}
+
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=False)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['User-Agent'] = USER_AGENT
+
+        self.db = sqlite3.connect(cache_path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS search ('
+                        'language TEXT, label TEXT, limit_ INTEGER, results TEXT, fetched REAL, '
+                        'PRIMARY KEY (language, label, limit_))')
+        self.db.commit()
+
+    def close(self):
+        self.session.close()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # cache --------------------------------------------------------------
+    def _cached(self, label):
+        row = self.db.execute('SELECT results, fetched FROM search WHERE language=? AND label=? AND limit_=?',
+                              (self.language, label, self.limit)).fetchone()
+        if row is None:
+            return None
+        results = json.loads(row[0])
+        ttl = self.ttl if results else self.negative_ttl
+        if time.time() - row[1] > ttl:
+            return None
+        return results
+
+    def _store(self, items):
+        now = time.time()
+        self.db.executemany('INSERT OR REPLACE INTO search VALUES (?, ?, ?, ?, ?)',
+                            [(self.language, label, self.limit, json.dumps(res, ensure_ascii=False), now)
+                             for label, res in items])
+        self.db.commit()
+
+    # network ------------------------------------------------------------
+    def _fetch(self, label):
+        params = {
+            'action': 'wbsearchentities',
+            'format': 'json',
+            'language': self.language,
+            'type': 'item',
+            'search': label,
+            'limit': self.limit,
+        }
+        self.limiter.wait()
+        r = self.session.get(self.url, params=params, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json().get('search', [])
+
+    # public API ---------------------------------------------------------
+    def search_many(self, labels):
+        """Return {label: candidates} for labels, one request per uncached unique label.
+
+        Failed requests return [] for that label and are not cached.
+        """
+        results = {}
+        misses = []
+        for label in dict.fromkeys(labels):
+            cached = self._cached(label)
+            if cached is None:
+                misses.append(label)
+            else:
+                results[label] = cached
+        self.stats['hits'] += len(results)
+        self.stats['misses'] += len(misses)
+        if not misses:
+            return results
+
+        self.stats['requests'] += len(misses)
+        fetched = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [(label, pool.submit(self._fetch, label)) for label in misses]
+            for label, fut in futures:
+                try:
+                    res = fut.result()
+                except Exception:
+                    self.stats['errors'] += 1
+                    results[label] = []
+                    continue
+                results[label] = res
+                fetched.append((label, res))
+        self._store(fetched)
+        return results
+
+    def search(self, label):
+        return self.search_many([label])[label]
+
+    def link(self, label):
+        """Best candidate as a dict (wikidata_id, wikidata_label, description, match) or None."""
+        candidates = self.search(label)
+        return best_match(candidates)
+
+
+def best_match(candidates):
+    if not candidates:
+        return None
+    best = candidates[0]
+    return {
+        'wikidata_id': best.get('id'),
+        'wikidata_label': best.get('label'),
+        'description': best.get('description'),
+        'match': best.get('match'),
+    }
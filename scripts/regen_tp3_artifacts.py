@@ -1,12 +1,17 @@
-import os
+"""Regenerate the TP3 artifacts (clusters, top terms, wordclouds, Word2Vec).
+
+Usage (from the repository root): python -m scripts.regen_tp3_artifacts
+"""
 from pathlib import Path
 import pandas as pd
-import nltk
-from nltk import word_tokenize
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
 from sklearn.cluster import KMeans
-from wordcloud import WordCloud
-from gensim.models import Word2Vec
+from tps.corpus.embeddings import SentenceFile, export_vectors, train, vectors_path
+from tps.corpus.clustering import cluster_frequencies, cluster_members, top_k
+from tps.corpus.index import CorpusIndex
+from tps.corpus.loader import iter_documents, words
+from tps.corpus.ocr import load_variants
+from tps.corpus.wordclouds import render
 
 # Parameters
 DECADE_START = 1950
@@ -14,85 +19,80 @@ DECADE_END = 1959
 N_CLUSTERS = 6
 DATA_DIR = Path('data') / 'txt'
 OUT_DIR = Path.cwd() / 'tp3'
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-
-nltk.download('punkt')
-
-# Discover files
-files = [f for f in sorted(os.listdir(DATA_DIR)) if any(str(y) in f for y in range(DECADE_START, DECADE_END+1))]
-print(f'Found {len(files)} files for decade {DECADE_START}-{DECADE_END}')
-
-# Read texts
-texts = []
-filenames = []
-for f in files:
-    p = DATA_DIR / f
-    try:
-        txt = p.read_text(encoding='utf-8')
-    except Exception:
-        try:
-            txt = p.read_text(encoding='latin-1')
-        except Exception:
-            txt = ''
-    texts.append(txt)
-    filenames.append(f)
-
-# Vectorize
-
-def preprocessing(text):
-    # simple tokenization for vectorizer
-    return word_tokenize(text)
-
-vectorizer = TfidfVectorizer(tokenizer=preprocessing, stop_words='english', max_df=0.6, min_df=2, lowercase=True)
-X = vectorizer.fit_transform(texts)
-print('TF-IDF shape', X.shape)
-
-# KMeans
-km = KMeans(n_clusters=N_CLUSTERS, random_state=42)
-clusters = km.fit_predict(X)
-
-# Save clusters
-df = pd.DataFrame({'filename': filenames, 'cluster': clusters})
-clusters_csv = OUT_DIR / f'clusters_{DECADE_START}_{DECADE_END}.csv'
-df.to_csv(clusters_csv, index=False)
-print('Saved', clusters_csv)
-
-# Top terms per cluster
-terms = vectorizer.get_feature_names_out()
-rows = []
-for i, center in enumerate(km.cluster_centers_):
-    topn = [terms[idx] for idx in center.argsort()[::-1][:20]]
-    rows.append({'cluster': i, 'top_terms': ' '.join(topn)})
-
-df_terms = pd.DataFrame(rows)
-terms_csv = OUT_DIR / f'cluster_top_terms_{DECADE_START}_{DECADE_END}.csv'
-df_terms.to_csv(terms_csv, index=False)
-print('Saved', terms_csv)
-
-# Wordclouds
-for i in range(N_CLUSTERS):
-    member_files = df[df.cluster==i].filename.tolist()
-    text_combined = ' '.join((DATA_DIR / f).read_text(encoding='utf-8') for f in member_files if (DATA_DIR / f).exists())
-    if not text_combined.strip():
-        continue
-    wc = WordCloud(width=800, height=400, background_color='white').generate(text_combined)
-    out_png = OUT_DIR / f'cluster_{i}_wordcloud_{DECADE_START}_{DECADE_END}.png'
-    wc.to_file(out_png)
-    print('Saved', out_png)
-
-# Word2Vec training on sentences
-sents = []
-for f in filenames:
-    txt = (DATA_DIR / f).read_text(encoding='utf-8')
-    for sent in nltk.sent_tokenize(txt):
-        tokens = [w.lower() for w in word_tokenize(sent) if w.isalpha()]
-        if tokens:
-            sents.append(tokens)
-
-if sents:
-    model = Word2Vec(sentences=sents, vector_size=100, window=5, min_count=5, workers=1)
-    w2v_path = OUT_DIR / f'word2vec_{DECADE_START}_{DECADE_END}.model'
-    model.save(w2v_path)
-    print('Saved', w2v_path)
-else:
-    print('No sentences found for Word2Vec training')
+
+
+def identity(toks):
+    # documents are already tokenized and lowercased by the corpus loader
+    return toks
+
+
+def main():
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Discover files
+    index = CorpusIndex.open(DATA_DIR)
+    files = index.paths(index.years(DECADE_START, DECADE_END))
+    print(f'Found {len(files)} files for decade {DECADE_START}-{DECADE_END}')
+
+    # Read texts (decoded + tokenized once, cached under data/cache/tokens);
+    # Word2Vec sentences are streamed to a LineSentence file while reading; OCR variants
+    # are normalized on load when data/ocr_variants.tsv exists
+    variants = load_variants()
+    tokens = []
+    filenames = []
+    sents_file = OUT_DIR / f'sents_{DECADE_START}_{DECADE_END}.txt'
+    with SentenceFile(sents_file) as sents:
+        for doc in iter_documents(files, variants=variants):
+            tokens.append([w.lower() for w in words(doc)])
+            filenames.append(doc['name'])
+            for sent in doc['sents']:
+                sents.write([w.lower() for w in sent if w.isalpha()])
+
+    # Vectorize
+    counter = CountVectorizer(preprocessor=identity, tokenizer=identity, token_pattern=None, stop_words='english', max_df=0.6, min_df=2)
+    counts = counter.fit_transform(tokens)
+    X = TfidfTransformer().fit_transform(counts)
+    print('TF-IDF shape', X.shape)
+
+    # KMeans
+    km = KMeans(n_clusters=N_CLUSTERS, random_state=42)
+    clusters = km.fit_predict(X)
+    members = cluster_members(clusters, N_CLUSTERS)
+
+    # Save clusters
+    df = pd.DataFrame({'filename': filenames, 'cluster': clusters})
+    clusters_csv = OUT_DIR / f'clusters_{DECADE_START}_{DECADE_END}.csv'
+    df.to_csv(clusters_csv, index=False)
+    print('Saved', clusters_csv)
+
+    # Top terms per cluster
+    terms = counter.get_feature_names_out()
+    rows = []
+    for i, center in enumerate(km.cluster_centers_):
+        topn = [terms[idx] for idx in top_k(center, 20)]
+        rows.append({'cluster': i, 'top_terms': ' '.join(topn)})
+
+    df_terms = pd.DataFrame(rows)
+    terms_csv = OUT_DIR / f'cluster_top_terms_{DECADE_START}_{DECADE_END}.csv'
+    df_terms.to_csv(terms_csv, index=False)
+    print('Saved', terms_csv)
+
+    # Wordclouds
+    # built from the cluster's summed term counts, rendered in parallel and skipped when unchanged
+    render({OUT_DIR / f'cluster_{i}_wordcloud_{DECADE_START}_{DECADE_END}.png': freqs
+            for i, freqs in enumerate(cluster_frequencies(counts, members, terms))},
+           width=800, height=400, background_color='white')
+
+    # Word2Vec training from the sentences file (corpus_file mode, one worker per core)
+    if sents.n_sents:
+        model = train(sents_file, vector_size=100, window=5, min_count=5)
+        w2v_path = OUT_DIR / f'word2vec_{DECADE_START}_{DECADE_END}.model'
+        model.save(w2v_path)
+        print('Saved', w2v_path)
+        print('Saved', export_vectors(model, vectors_path(w2v_path), ann_index=True))
+    else:
+        print('No sentences found for Word2Vec training')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Inspect saved Word2Vec models through their vectors-only .kv exports.
+
+Replaces the inspect_model_*.py scripts: each model is read as memory-mapped
+KeyedVectors (exported next to the .model file on first use) and all
+neighbour/similarity queries are answered by one batched query per model.
+Neighbours come from the model's ANN index when one was built (.ivf.npz).
+
+Usage (from the repository root):
+    python -m tp3.inspect_models
+    python -m tp3.inspect_models tps/tp3/word2vec_w5_mc5.model
+"""
+import sys
+from pathlib import Path
+from tps.corpus.ann import IVFIndex, index_path
+from tps.corpus.embeddings import export_vectors, load_vectors, query, vectors_path
+
+MODELS = [
+    'tps/tp3/word2vec_w3_mc3.model',
+    'tps/tp3/word2vec_w5_mc5.model',
+    'tps/tp3/word2vec_w7_mc3.model',
+    'tp3/word2vec_w3_mc3.model',
+]
+words = ['president','paris','guerre']
+pairs = [('paris','france'), ('guerre','paix'), ('president','france')]
+
+for model_path in [Path(p) for p in (sys.argv[1:] or MODELS)]:
+    kv_path = vectors_path(model_path)
+    if model_path.exists() and (not kv_path.exists() or kv_path.stat().st_mtime < model_path.stat().st_mtime):
+        from gensim.models import Word2Vec
+        export_vectors(Word2Vec.load(str(model_path)), kv_path, ann_index=index_path(kv_path).exists())
+        print('Exported vectors to', kv_path)
+    if not kv_path.exists():
+        print('Model not found at', model_path)
+        continue
+
+    wv = load_vectors(kv_path)
+    print('\nLoaded vectors:', kv_path)
+    print('Vocab size:', len(wv.key_to_index))
+    print('Top 20 tokens:', wv.index_to_key[:20])
+
+    ann = IVFIndex.load(wv, index_path(kv_path)) if index_path(kv_path).exists() else None
+    res = query(wv, words=words, pairs=pairs, topn=3, index=ann)
+    for w in words:
+        print('\nMost similar to', w)
+        if res['neighbours'][w] is None:
+            print('  OOV')
+            continue
+        for t, score in res['neighbours'][w]:
+            print(f'  {t}: {score:.4f}')
+
+    print('\nSimilarity scores:')
+    for a, b in pairs:
+        sc = res['similarity'][(a, b)]
+        print(f'  similarity({a},{b}) = ' + ('OOV' if sc is None else f'{sc:.4f}'))
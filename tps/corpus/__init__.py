@@ -0,0 +1,3 @@
+"""Shared corpus helpers for the CAMille text files (data/txt)."""
+
+__all__ = ["loader", "index", "convert", "stream", "ner", "language", "keywords", "clustering", "wordclouds", "embeddings", "ann", "phrases", "sentiment", "inverted", "termfreq", "fuzzy", "ocr", "pipeline"]
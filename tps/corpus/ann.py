@@ -0,0 +1,238 @@
+"""Approximate nearest-neighbour (IVF) index over Word2Vec vectors.
+
+most_similar() scans the whole vocabulary for every query; with phrase models
+(bigrams/trigrams) the vocabulary gets large. This index clusters the unit
+vectors into nlist cells (MiniBatchKMeans, a coarse quantizer) and keeps an
+inverted list of word rows per cell. A query only scores the words of its
+nprobe closest cells, reading those rows from the (memory-mapped) KeyedVectors.
+
+The index is persisted next to the model as <model>.ivf.npz and only stores
+centroids and inverted lists: the vectors themselves stay in the .kv export of
+tps/corpus/embeddings.py. It also implements gensim's indexer protocol, so
+wv.most_similar('ministre', indexer=index) works. report() measures recall@k
+and per-query latency against exact search for several nprobe values.
+
+Usage (from the repository root):
+    python -m tps.corpus.ann build tps/tp3/word2vec_w3_mc3.kv
+    python -m tps.corpus.ann report tps/tp3/word2vec_w3_mc3.kv --nprobe 1 4 16 64
+    python -m tps.corpus.ann query tps/tp3/word2vec_w3_mc3.kv --positive paris londres --negative belgique
+"""
+import argparse
+import math
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .clustering import top_k
+
+NPROBE = 16
+CHUNK = 65536
+
+
+def index_path(path) -> Path:
+    """<name>.ivf.npz next to a <name>.model or <name>.kv file."""
+    return Path(path).with_suffix('.ivf.npz')
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def _safe_norms(wv) -> np.ndarray:
+    wv.fill_norms()
+    return np.where(wv.norms > 0, wv.norms, 1.0)
+
+
+class IVFIndex:
+    """Inverted-file index: word rows grouped by their closest centroid."""
+
+    def __init__(self, wv, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray, nprobe: int = NPROBE):
+        self.wv = wv
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.nprobe = nprobe
+        self.norms = _safe_norms(wv)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, wv, nlist: int = None, nprobe: int = NPROBE, train_size: int = 100_000,
+              random_state: int = 42) -> 'IVFIndex':
+        """Cluster the unit vectors of wv (default nlist: 4 * sqrt(vocabulary size))."""
+        from sklearn.cluster import MiniBatchKMeans
+
+        n = len(wv)
+        nlist = max(1, min(nlist or int(4 * math.sqrt(n)), n))
+        rng = np.random.default_rng(random_state)
+        sample = np.sort(rng.choice(n, size=min(n, max(train_size, nlist)), replace=False))
+        km = MiniBatchKMeans(n_clusters=nlist, random_state=random_state, batch_size=4096, n_init=1)
+        km.fit(_unit(np.asarray(wv.vectors[sample], dtype=np.float32)))
+        centroids = _unit(km.cluster_centers_.astype(np.float32))
+
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, CHUNK):
+            block = _unit(np.asarray(wv.vectors[start:start + CHUNK], dtype=np.float32))
+            assign[start:start + CHUNK] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assign, kind='stable').astype(np.int64)
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1)).astype(np.int64)
+        return cls(wv, centroids, order, offsets, nprobe)
+
+    def save(self, path):
+        path = Path(path)
+        tmp = path.with_name(path.name + '.part')
+        with tmp.open('wb') as f:
+            np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                     nprobe=self.nprobe, n_vectors=len(self.wv))
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, wv, path) -> 'IVFIndex':
+        with np.load(str(path)) as data:
+            if int(data['n_vectors']) != len(wv):
+                raise ValueError(f'{path} was built for {int(data["n_vectors"])} vectors, not {len(wv)}: rebuild it')
+            return cls(wv, data['centroids'], data['order'], data['offsets'], int(data['nprobe']))
+
+    def search(self, queries: np.ndarray, topn: int = 10, exclude: Sequence[Iterable[int]] = None,
+               nprobe: int = None) -> List[List[Tuple[int, float]]]:
+        """Top-n (row, cosine) per query vector, scoring only the nprobe closest cells."""
+        queries = _unit(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        cell_scores = queries @ self.centroids.T
+        results = []
+        for i, q in enumerate(queries):
+            cells = top_k(cell_scores[i], nprobe)
+            cand = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in cells])
+            if exclude is not None and exclude[i]:
+                cand = cand[~np.isin(cand, list(exclude[i]))]
+            cand.sort()  # sequential reads from the memory-mapped vectors
+            scores = (self.wv.vectors[cand] @ q) / self.norms[cand]
+            results.append([(int(cand[j]), float(scores[j])) for j in top_k(scores, topn)])
+        return results
+
+    def most_similar(self, vector, num_neighbors: int) -> List[Tuple[str, float]]:
+        """gensim indexer protocol (KeyedVectors.most_similar(..., indexer=index))."""
+        return [(self.wv.index_to_key[i], s) for i, s in self.search(vector, num_neighbors)[0]]
+
+    def neighbours(self, words: Iterable[str], topn: int = 10, nprobe: int = None) -> Dict[str, Optional[List]]:
+        """Approximate most_similar for several words at once (None for OOV words)."""
+        words = list(words)
+        known = [w for w in words if w in self.wv.key_to_index]
+        result = {w: None for w in words}
+        if known:
+            rows = [self.wv.key_to_index[w] for w in known]
+            hits = self.search(self.wv.vectors[rows], topn, exclude=[[r] for r in rows], nprobe=nprobe)
+            for w, h in zip(known, hits):
+                result[w] = [(self.wv.index_to_key[i], s) for i, s in h]
+        return result
+
+    def analogy(self, positive: Iterable[str], negative: Iterable[str] = (), topn: int = 10,
+                nprobe: int = None) -> List[Tuple[str, float]]:
+        """Approximate most_similar(positive=..., negative=...); raises KeyError for OOV words."""
+        positive, negative = list(positive), list(negative)
+        rows = [self.wv.key_to_index[w] for w in positive + negative]
+        unit = self.wv.vectors[rows] / self.norms[rows, None]
+        weights = np.array([1.0] * len(positive) + [-1.0] * len(negative))[:, None]
+        target = (unit * weights).mean(axis=0)
+        hits = self.search(target, topn, exclude=[rows], nprobe=nprobe)[0]
+        return [(self.wv.index_to_key[i], s) for i, s in hits]
+
+
+def build(wv, path, **params) -> IVFIndex:
+    """Build the index of wv and persist it at path."""
+    start = time.perf_counter()
+    index = IVFIndex.build(wv, **params)
+    index.save(path)
+    print(f'Saved ANN index to {path} ({index.nlist} cells, {len(wv)} vectors, {time.perf_counter() - start:.1f}s)')
+    return index
+
+
+def report(index: IVFIndex, n_queries: int = 200, topn: int = 10, nprobes: Sequence[int] = (1, 4, 16, 64),
+           random_state: int = 42) -> List[Dict]:
+    """Recall@topn and mean per-query latency of the index against exact search."""
+    wv = index.wv
+    rng = np.random.default_rng(random_state)
+    rows = rng.choice(len(wv), size=min(n_queries, len(wv)), replace=False)
+    norms = index.norms
+
+    start = time.perf_counter()
+    exact = []
+    for r in rows:
+        scores = (wv.vectors @ (wv.vectors[r] / norms[r])) / norms
+        scores[r] = -np.inf
+        exact.append(set(top_k(scores, topn).tolist()))
+    out = [{'method': 'exact', 'nprobe': '', 'recall': 1.0,
+            'ms_per_query': round(1000 * (time.perf_counter() - start) / len(rows), 3)}]
+
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        hits = index.search(wv.vectors[rows], topn, exclude=[[r] for r in rows], nprobe=nprobe)
+        elapsed = time.perf_counter() - start
+        recall = np.mean([len(exact[i] & {j for j, _ in h}) / max(len(exact[i]), 1) for i, h in enumerate(hits)])
+        out.append({'method': 'ivf', 'nprobe': min(nprobe, index.nlist), 'recall': round(float(recall), 4),
+                    'ms_per_query': round(1000 * elapsed / len(rows), 3)})
+    for row in out:
+        print(f"{row['method']:>5} nprobe={str(row['nprobe']):>4} recall@{topn}={row['recall']:.3f} "
+              f"{row['ms_per_query']:.3f} ms/query")
+    return out
+
+
+def _load(path):
+    from .embeddings import load_vectors, vectors_path
+
+    path = Path(path)
+    return load_vectors(vectors_path(path) if path.suffix == '.model' else path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IVF approximate nearest-neighbour index for .kv vectors.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('build', help='Build and save <name>.ivf.npz next to each .kv/.model')
+    p.add_argument('vectors', nargs='+')
+    p.add_argument('--nlist', type=int, default=None)
+    p.add_argument('--nprobe', type=int, default=NPROBE)
+    p = sub.add_parser('report', help='Recall/latency against exact search')
+    p.add_argument('vectors')
+    p.add_argument('--queries', type=int, default=200)
+    p.add_argument('--topn', type=int, default=10)
+    p.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 16, 64])
+    p.add_argument('--out', default=None, help='Optional CSV output')
+    p = sub.add_parser('query', help='Approximate neighbours / analogies')
+    p.add_argument('vectors')
+    p.add_argument('--words', nargs='*', default=[])
+    p.add_argument('--positive', nargs='*', default=[])
+    p.add_argument('--negative', nargs='*', default=[])
+    p.add_argument('--topn', type=int, default=10)
+    p.add_argument('--nprobe', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        for path in args.vectors:
+            build(_load(path), index_path(path), nlist=args.nlist, nprobe=args.nprobe)
+        return
+    wv = _load(args.vectors)
+    index = IVFIndex.load(wv, index_path(args.vectors))
+    if args.command == 'report':
+        rows = report(index, n_queries=args.queries, topn=args.topn, nprobes=args.nprobe)
+        if args.out:
+            import pandas as pd
+            pd.DataFrame(rows).to_csv(args.out, index=False, encoding='utf-8')
+            print('Saved', args.out)
+        return
+    for w, sims in index.neighbours(args.words, args.topn, args.nprobe).items():
+        print(w, '->', 'OOV' if sims is None else '; '.join(f'{t}:{s:.3f}' for t, s in sims))
+    if args.positive:
+        sims = index.analogy(args.positive, args.negative, args.topn, args.nprobe)
+        print(' + '.join(args.positive), '-', ' - '.join(args.negative) or '()', '->',
+              '; '.join(f'{t}:{s:.3f}' for t, s in sims))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""Sparse, out-of-core TF-IDF + MiniBatchKMeans clustering for multi-decade runs.
+
+run_tp3.py fits TfidfVectorizer + KMeans on a whole decade held in memory. This
+module streams documents in batches instead:
+
+1. a stateless HashingVectorizer (1-2 grams) turns each batch into sparse counts;
+   a first pass only accumulates document frequencies (one vector of n_features)
+   and remembers one term per hashed feature for the top-terms output;
+2. a second pass applies idf (with run_tp3's max_df/min_df pruning) and l2
+   normalisation per batch and feeds MiniBatchKMeans.partial_fit; the centroids
+   are initialised from a buffered sample of at least init_size documents
+   (default 3 * n_clusters, or one batch), and the pass can be repeated (epochs);
+3. a last pass assigns labels and, optionally, 2-D TruncatedSVD coordinates
+   (SVD fitted on a bounded sample, never on a dense matrix).
+
+Memory is bounded by batch_size documents plus O(n_features), whatever the
+number of years selected (e.g. 1939-1969).
+
+Usage (from the repository root):
+    python -m tps.corpus.clustering --start 1939 --end 1969 -k 6 --out tp3
+"""
+import argparse
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.utils import murmurhash3_32
+
+from .loader import DATA_TXT, iter_documents
+
+N_FEATURES = 2 ** 20
+BATCH_SIZE = 500
+
+
+def iter_batches(paths: List[Path], batch_size: int = BATCH_SIZE,
+                 variants=None) -> Iterator[Tuple[List[str], List[str]]]:
+    """Yield (names, whitespace-normalised texts) batches of at most batch_size documents."""
+    names, texts = [], []
+    for doc in iter_documents(paths, tokenized=False, variants=variants):
+        names.append(doc['name'])
+        texts.append(re.sub(r'\s+', ' ', doc['text']))
+        if len(names) == batch_size:
+            yield names, texts
+            names, texts = [], []
+    if names:
+        yield names, texts
+
+
+class StreamingTfidf:
+    """TF-IDF over a HashingVectorizer, fitted from a stream of text batches."""
+
+    def __init__(self, n_features: int = N_FEATURES, ngram_range=(1, 2), max_df: float = 0.6, min_df: int = 2,
+                 stop_words='english'):
+        self.hasher = HashingVectorizer(n_features=n_features, ngram_range=ngram_range, stop_words=stop_words,
+                                        alternate_sign=False, norm=None)
+        self.n_features = n_features
+        self.max_df = max_df
+        self.min_df = min_df
+        self.df = np.zeros(n_features, dtype=np.int64)
+        self.n_docs = 0
+        self.terms = np.empty(n_features, dtype=object)
+        self.idf_ = None
+
+    def partial_fit(self, texts: List[str]):
+        X = self.hasher.transform(texts)
+        X.sum_duplicates()
+        seen_before = self.df > 0
+        self.df += np.bincount(X.indices, minlength=self.n_features)
+        self.n_docs += X.shape[0]
+        # remember one surface form per newly seen hashed feature, for top-terms output
+        new = (self.df > 0) & ~seen_before
+        if new.any():
+            analyzer = self.hasher.build_analyzer()
+            uniq = set()
+            for text in texts:
+                uniq.update(analyzer(text))
+            for term in uniq:
+                idx = hash_index(term, self.n_features)
+                if new[idx]:
+                    self.terms[idx] = term
+                    new[idx] = False
+        return self
+
+    def finalize(self):
+        """Compute smoothed idf, zeroing features outside [min_df, max_df * n_docs]."""
+        idf = np.log((1 + self.n_docs) / (1 + self.df)) + 1.0
+        keep = (self.df >= self.min_df) & (self.df <= self.max_df * self.n_docs)
+        self.idf_ = np.where(keep, idf, 0.0)
+        return self
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        X = self.hasher.transform(texts)
+        X = X @ sp.diags(self.idf_)
+        X.eliminate_zeros()
+        return normalize(X, norm='l2', copy=False)
+
+
+def hash_index(term: str, n_features: int = N_FEATURES) -> int:
+    """Column of term in HashingVectorizer output (signed murmurhash3, seed 0, alternate_sign=False)."""
+    return abs(murmurhash3_32(term, seed=0)) % n_features
+
+
+def top_k(values: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest values, in decreasing order (argpartition, not a full sort)."""
+    k = min(k, len(values))
+    if k <= 0:
+        return np.array([], dtype=int)
+    top = np.argpartition(-values, k - 1)[:k]
+    return top[np.argsort(-values[top], kind='stable')]
+
+
+def top_terms(centers: np.ndarray, terms, n: int = 15) -> Dict[int, List[str]]:
+    """Map cluster id -> its n highest-weighted terms (terms indexable by feature id)."""
+    return {i: [str(terms[idx]) for idx in top_k(center, n) if center[idx] > 0 and terms[idx] is not None]
+            for i, center in enumerate(centers)}
+
+
+def cluster_members(labels, n_clusters: int) -> List[np.ndarray]:
+    """Map cluster id -> row indices of its documents, in one pass over labels."""
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind='stable')
+    bounds = np.searchsorted(labels[order], np.arange(n_clusters + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(n_clusters)]
+
+
+def cluster_frequencies(counts: sp.spmatrix, members: List[np.ndarray], terms,
+                        max_words: int = 200) -> List[Dict[str, float]]:
+    """Per cluster, the max_words most frequent terms of a sparse doc x term count matrix.
+
+    Suitable for WordCloud.generate_from_frequencies(), so wordclouds need neither the
+    raw text nor a second tokenization.
+    """
+    counts = sp.csr_matrix(counts)
+    freqs = []
+    for rows in members:
+        totals = np.asarray(counts[rows].sum(axis=0)).ravel()
+        freqs.append({str(terms[idx]): float(totals[idx]) for idx in top_k(totals, max_words)
+                      if totals[idx] > 0 and terms[idx] is not None})
+    return freqs
+
+
+def cluster_paths(paths: Iterable, n_clusters: int = 6, batch_size: int = BATCH_SIZE, top_n: int = 15,
+                  svd_sample: int = 5000, random_state: int = 42, variants=None, epochs: int = 1,
+                  init_size: int = None, **tfidf_params) -> Dict:
+    """Cluster documents out-of-core (OCR variants normalized when variants, an ocr.VariantMap, is given).
+
+    The first init_size documents (default max(3 * n_clusters, batch_size)) are buffered
+    to initialise the centroids; epochs is the number of partial_fit passes over the stream.
+    Returns names, labels, members (cluster id -> row indices), top_terms, coords (2-D SVD) and the models.
+    """
+    if batch_size < 1 or epochs < 1:
+        raise ValueError(f'batch_size ({batch_size}) and epochs ({epochs}) must be at least 1')
+    paths = [Path(p) for p in paths]
+    tfidf = StreamingTfidf(**tfidf_params)
+    for _, texts in iter_batches(paths, batch_size, variants):
+        tfidf.partial_fit(texts)
+    tfidf.finalize()
+    print(f'Pass 1: {tfidf.n_docs} documents, {int((tfidf.idf_ > 0).sum())} active features')
+    if tfidf.n_docs < n_clusters:
+        raise ValueError(f'{tfidf.n_docs} documents cannot form {n_clusters} clusters; '
+                         f'select more documents or lower n_clusters')
+
+    init_size = min(init_size or max(3 * n_clusters, batch_size), tfidf.n_docs)
+    if init_size < n_clusters:
+        raise ValueError(f'init_size ({init_size}) must be at least n_clusters ({n_clusters})')
+    km = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, batch_size=batch_size, n_init=3,
+                         init_size=init_size)
+    sample = []
+    sample_size = 0
+    for epoch in range(epochs):
+        buffered = []  # until the centroids exist, batches are buffered up to init_size documents
+        for _, texts in iter_batches(paths, batch_size, variants):
+            X = tfidf.transform(texts)
+            if epoch == 0 and sample_size < svd_sample:
+                sample.append(X[:svd_sample - sample_size])
+                sample_size += sample[-1].shape[0]
+            if not hasattr(km, 'cluster_centers_'):
+                buffered.append(X)
+                if sum(b.shape[0] for b in buffered) < init_size:
+                    continue
+                X = sp.vstack(buffered)
+                buffered = []
+            km.partial_fit(X)
+        if buffered:
+            km.partial_fit(sp.vstack(buffered))
+    print(f'Pass 2: MiniBatchKMeans fitted ({epochs} epoch(s), initialised on {init_size} documents)')
+
+    svd = None
+    if sample_size > 2:
+        svd = TruncatedSVD(n_components=2, random_state=random_state).fit(sp.vstack(sample))
+
+    names, labels, coords = [], [], []
+    for batch_names, texts in iter_batches(paths, batch_size, variants):
+        X = tfidf.transform(texts)
+        names.extend(batch_names)
+        labels.append(km.predict(X))
+        if svd is not None:
+            coords.append(svd.transform(X))
+    labels = np.concatenate(labels) if labels else np.array([], dtype=int)
+
+    return {
+        'names': names,
+        'labels': labels,
+        'members': cluster_members(labels, n_clusters),
+        'top_terms': top_terms(km.cluster_centers_, tfidf.terms, top_n),
+        'coords': np.vstack(coords) if coords else None,
+        'kmeans': km,
+        'tfidf': tfidf,
+        'svd': svd,
+    }
+
+
+def main():
+    from .index import CorpusIndex
+    from .ocr import VARIANTS_TSV, load_variants
+
+    parser = argparse.ArgumentParser(description='Out-of-core TF-IDF + MiniBatchKMeans over a range of years.')
+    parser.add_argument('--txt-dir', default=str(DATA_TXT))
+    parser.add_argument('--start', type=int, required=True)
+    parser.add_argument('--end', type=int, required=True)
+    parser.add_argument('--newspaper', default=None)
+    parser.add_argument('--clusters', '-k', type=int, default=6)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--epochs', type=int, default=1, help='partial_fit passes over the documents')
+    parser.add_argument('--top-n', type=int, default=15)
+    parser.add_argument('--out', default='tp3')
+    parser.add_argument('--ocr-map', default=str(VARIANTS_TSV), help='OCR variant map (ignored if missing)')
+    args = parser.parse_args()
+
+    index = CorpusIndex.open(args.txt_dir)
+    paths = index.paths(index.years(args.start, args.end, args.newspaper))
+    print(f'Found {len(paths)} files for {args.start}-{args.end}')
+    if not paths:
+        return
+    res = cluster_paths(paths, n_clusters=args.clusters, batch_size=args.batch_size, top_n=args.top_n,
+                        variants=load_variants(args.ocr_map), epochs=args.epochs)
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    df = pd.DataFrame({'filename': res['names'], 'cluster': res['labels']})
+    if res['coords'] is not None:
+        df['x'], df['y'] = res['coords'][:, 0], res['coords'][:, 1]
+    clusters_csv = out_dir / f'clusters_{args.start}_{args.end}.csv'
+    df.to_csv(clusters_csv, index=False, encoding='utf-8')
+    print('Saved', clusters_csv)
+    top_terms_csv = out_dir / f'cluster_top_terms_{args.start}_{args.end}.csv'
+    pd.DataFrame.from_dict(res['top_terms'], orient='index').to_csv(top_terms_csv, header=False, encoding='utf-8')
+    print('Saved', top_terms_csv)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Incremental, parallel PDF -> text conversion for the CAMille archive.
+
+Replaces the serial loop of module2/s1_convert.ipynb: PDFs are fanned out over a
+process pool, each page is streamed straight to the output file (no quadratic
+`text += page.extract_text()`), and a manifest (data/cache/convert.json) records
+the size/mtime/SHA-1 of every converted PDF so only new or changed PDFs are
+re-extracted. Throughput is reported in pages/sec.
+
+Usage (from the repository root):
+    python -m tps.corpus.convert --pdf-dir data/pdf --txt-dir data/txt --workers 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from .index import CorpusIndex
+
+PDF_DIR = Path('data') / 'pdf'
+TXT_DIR = Path('data') / 'txt'
+MANIFEST_NAME = 'convert.json'
+SAVE_EVERY = 50
+
+
+def file_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with path.open('rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def convert_pdf(pdf_path: str, txt_path: str) -> Tuple[int, str]:
+    """Extract pdf_path page by page into txt_path; returns (pages, sha1 of the PDF)."""
+    import PyPDF2
+
+    tmp_path = txt_path + '.part'
+    pages = 0
+    with open(pdf_path, 'rb') as pdf_file, open(tmp_path, 'w', encoding='utf-8') as out:
+        reader = PyPDF2.PdfReader(pdf_file)
+        for page in reader.pages:
+            out.write(page.extract_text() or '')
+            pages += 1
+    os.replace(tmp_path, txt_path)
+    return pages, file_hash(Path(pdf_path))
+
+
+def load_manifest(path: Path) -> Dict:
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest: Dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def plan(pdf_dir: Path, txt_dir: Path, manifest: Dict, force: bool = False) -> List[Tuple[Path, Path, List]]:
+    """Return (pdf, txt, stamp) for every PDF that is new, changed or missing its .txt.
+
+    A PDF whose size/mtime changed but whose content hash did not is only
+    re-stamped in the manifest, not re-extracted. A PDF with no manifest entry
+    whose .txt already exists (converted by the notebook or before the
+    manifest existed) is stamped into the manifest as is; use force to
+    re-extract it.
+    """
+    todo = []
+    for pdf in sorted(p for p in pdf_dir.iterdir() if p.is_file() and p.suffix.lower() == '.pdf'):
+        txt = txt_dir / (pdf.stem + '.txt')
+        st = pdf.stat()
+        stamp = [st.st_size, st.st_mtime_ns]
+        known = manifest.get(pdf.name)
+        if not force and known is None and txt.exists():
+            manifest[pdf.name] = {'stamp': stamp, 'sha1': file_hash(pdf), 'pages': None}
+            continue
+        if not force and known and txt.exists():
+            if known['stamp'] == stamp:
+                continue
+            digest = file_hash(pdf)
+            if known['sha1'] == digest:
+                known['stamp'] = stamp
+                continue
+        todo.append((pdf, txt, stamp))
+    return todo
+
+
+def run(pdf_dir=PDF_DIR, txt_dir=TXT_DIR, workers: int = None, force: bool = False) -> Dict:
+    pdf_dir, txt_dir = Path(pdf_dir), Path(txt_dir)
+    txt_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = txt_dir.parent / 'cache' / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+
+    known = len(manifest)
+    todo = plan(pdf_dir, txt_dir, manifest, force=force)
+    if len(manifest) > known:
+        print(f'{len(manifest) - known} existing .txt file(s) added to the manifest')
+        save_manifest(manifest, manifest_path)
+    print(f'{len(todo)} PDF(s) to convert in {pdf_dir}')
+    stats = {'pdfs': 0, 'pages': 0, 'failed': []}
+    start = time.perf_counter()
+    converted = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(convert_pdf, str(pdf), str(txt)): (pdf, txt, stamp) for pdf, txt, stamp in todo}
+            for fut in as_completed(futures):
+                pdf, txt, stamp = futures[fut]
+                try:
+                    pages, digest = fut.result()
+                except Exception as e:
+                    print('Failed to convert', pdf.name, ':', e)
+                    stats['failed'].append(pdf.name)
+                    continue
+                manifest[pdf.name] = {'stamp': stamp, 'sha1': digest, 'pages': pages}
+                converted.append(txt.name)
+                stats['pdfs'] += 1
+                stats['pages'] += pages
+                if stats['pdfs'] % SAVE_EVERY == 0:
+                    save_manifest(manifest, manifest_path)
+                    elapsed = time.perf_counter() - start
+                    print(f"{stats['pdfs']}/{len(todo)} PDFs, {stats['pages'] / elapsed:.1f} pages/sec")
+    finally:
+        save_manifest(manifest, manifest_path)
+
+    elapsed = time.perf_counter() - start
+    stats['seconds'] = elapsed
+    stats['pages_per_sec'] = stats['pages'] / elapsed if elapsed > 0 else 0.0
+    print(f"Converted {stats['pdfs']} PDF(s), {stats['pages']} pages in {elapsed:.1f}s "
+          f"({stats['pages_per_sec']:.1f} pages/sec), {len(stats['failed'])} failed")
+
+    if converted:
+        index = CorpusIndex.open(txt_dir)
+        index.add(converted)
+        index.save()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert CAMille PDFs to text (incremental, parallel).')
+    parser.add_argument('--pdf-dir', default=str(PDF_DIR), help='Directory containing the PDFs')
+    parser.add_argument('--txt-dir', default=str(TXT_DIR), help='Output directory for .txt files')
+    parser.add_argument('--workers', '-j', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Re-extract every PDF')
+    args = parser.parse_args()
+    run(args.pdf_dir, args.txt_dir, workers=args.workers, force=args.force)
+
+
+if __name__ == '__main__':
+    main()
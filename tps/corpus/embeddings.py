@@ -0,0 +1,294 @@
+"""Word2Vec training from a LineSentence file (gensim corpus_file mode), and vector queries.
+
+Sentences are streamed to disk once (one sentence per line, tokens separated by
+a space) while documents are loaded, instead of being kept as a list of token
+lists. Word2Vec then reads that file with corpus_file=..., where every worker
+thread parses its own slice of the file in C, so training scales with cores
+and memory no longer grows with the corpus.
+
+Trained models are also exported as vectors-only KeyedVectors (<model>.kv, with
+vectors and norms in separate .npy files) that load with mmap='r': no training
+state is unpickled and every process reading the same file shares one
+page-cached copy. query() answers a batch of neighbour and similarity requests
+with a single matrix multiply against the vocabulary.
+
+Usage (from the repository root):
+    from tps.corpus.embeddings import SentenceFile, train
+    with SentenceFile('tp3/sents_1950_1959.txt') as out:
+        for doc in iter_documents(paths):
+            for sent in doc['sents']:
+                out.write([w.lower() for w in sent if w.isalpha()])
+    model = train(out.path, vector_size=100, window=5, min_count=5)
+
+    export_vectors(model, 'tp3/word2vec_1950_1959.kv')
+    wv = load_vectors('tp3/word2vec_1950_1959.kv')
+    query(wv, words=['paris', 'guerre'], pairs=[('paris', 'france')], topn=5)
+
+    # or several (window, min_count) variants at once, one comparison table
+    python -m tps.corpus.embeddings sweep tps/tp3/sents_1950_1959.txt --variants 3:3 5:5 7:3
+    python -m tps.corpus.embeddings query tps/tp3/word2vec_w3_mc3.kv --words paris guerre --pairs paris:france
+"""
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .clustering import top_k
+
+WORKERS = os.cpu_count() or 1
+PAIRS = [('paris', 'france'), ('guerre', 'paix'), ('president', 'france')]
+COMPARISON_CSV = Path('tp3') / 'w2v_model_comparison.csv'
+
+
+class SentenceFile:
+    """Write tokenized sentences in LineSentence format, atomically on close."""
+
+    def __init__(self, path, min_tokens: int = 1):
+        self.path = Path(path)
+        self.min_tokens = min_tokens
+        self.n_sents = 0
+        self.n_words = 0
+        self._tmp = self.path.with_name(self.path.name + '.part')
+        self._f = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = self._tmp.open('w', encoding='utf-8')
+        return self
+
+    def write(self, tokens: List[str]) -> bool:
+        """Append one sentence; returns False when it is shorter than min_tokens."""
+        # a token must not contain whitespace, LineSentence splits on it
+        tokens = [t for t in (''.join(t.split()) for t in tokens) if t]
+        if len(tokens) < self.min_tokens:
+            return False
+        self._f.write(' '.join(tokens))
+        self._f.write('\n')
+        self.n_sents += 1
+        self.n_words += len(tokens)
+        return True
+
+    def __exit__(self, exc_type, exc, tb):
+        self._f.close()
+        if exc_type is None:
+            os.replace(self._tmp, self.path)
+        else:
+            self._tmp.unlink(missing_ok=True)
+        return False
+
+
+def train(corpus_file, workers: int = WORKERS, **params):
+    """Train gensim Word2Vec on a LineSentence file with corpus_file mode.
+
+    params are passed to Word2Vec (vector_size, window, min_count, epochs, ...).
+    """
+    from gensim.models import Word2Vec
+
+    start = time.perf_counter()
+    model = Word2Vec(corpus_file=str(corpus_file), workers=workers, **params)
+    elapsed = time.perf_counter() - start
+    words = model.corpus_total_words * model.epochs
+    print(f'Word2Vec trained on {corpus_file} in {elapsed:.1f}s '
+          f'({len(model.wv)} words in vocab, {words / max(elapsed, 1e-9):,.0f} words/s, {workers} workers)')
+    return model
+
+
+def vectors_path(model_path) -> Path:
+    """Where the vectors-only export of a .model file lives (same name, .kv suffix)."""
+    return Path(model_path).with_suffix('.kv')
+
+
+def export_vectors(model, path, ann_index: bool = False) -> Path:
+    """Save model.wv (or a KeyedVectors) without training state, mmap-able vectors and norms.
+
+    With ann_index, an approximate nearest-neighbour index (tps.corpus.ann) is built next to it.
+    """
+    wv = getattr(model, 'wv', model)
+    wv.fill_norms()
+    path = Path(path)
+    wv.save(str(path), separately=['vectors', 'norms'])
+    if ann_index:
+        from .ann import build, index_path
+        build(wv, index_path(path))
+    return path
+
+
+def load_vectors(path, mmap: str = 'r'):
+    """Load an export_vectors() file; with mmap='r' the arrays stay on disk and are shared."""
+    from gensim.models import KeyedVectors
+
+    return KeyedVectors.load(str(path), mmap=mmap)
+
+
+def query(wv, words: Iterable[str] = (), pairs: Iterable[Tuple[str, str]] = (), topn: int = 10,
+          index=None) -> Dict:
+    """Nearest neighbours of `words` and cosine similarity of `pairs`, in one matrix multiply.
+
+    Returns {'neighbours': {word: [(key, score), ...] or None}, 'similarity': {(a, b): score or None}};
+    None marks out-of-vocabulary words. With an ann.IVFIndex as `index`, neighbours are
+    approximate and only the pair similarities are computed exactly.
+    """
+    words, pairs = list(words), list(pairs)
+    if index is not None:
+        result = query(wv, pairs=pairs)
+        result['neighbours'] = index.neighbours(words, topn)
+        return result
+    keys = []
+    for w in words + [a for a, _ in pairs]:
+        if w in wv.key_to_index and w not in keys:
+            keys.append(w)
+    result = {'neighbours': {w: None for w in words}, 'similarity': {p: None for p in pairs}}
+    if not keys:
+        return result
+
+    wv.fill_norms()
+    rows = np.array([wv.key_to_index[k] for k in keys])
+    norms = np.where(wv.norms > 0, wv.norms, 1.0)
+    unit = wv.vectors[rows] / norms[rows, None]
+    scores = (wv.vectors @ unit.T) / norms[:, None]  # vocabulary x queries cosine similarities
+    col = {k: j for j, k in enumerate(keys)}
+
+    for a, b in pairs:
+        if a in col and b in wv.key_to_index:
+            result['similarity'][(a, b)] = float(scores[wv.key_to_index[b], col[a]])
+    for w in words:
+        if w not in col:
+            continue
+        s = scores[:, col[w]]
+        s[wv.key_to_index[w]] = -np.inf  # a word is not its own neighbour
+        result['neighbours'][w] = [(wv.index_to_key[i], float(s[i])) for i in top_k(s, topn)]
+    return result
+
+
+def scan(corpus_file) -> Tuple[Dict[str, int], int, int]:
+    """Count words of a LineSentence file once: (raw word counts, sentences, total words)."""
+    from gensim.models import Word2Vec
+
+    start = time.perf_counter()
+    probe = Word2Vec()
+    total_words, corpus_count = probe.scan_vocab(corpus_file=str(corpus_file))
+    print(f'Scanned {corpus_file} in {time.perf_counter() - start:.1f}s '
+          f'({corpus_count} sentences, {total_words} words, {len(probe.raw_vocab)} distinct)')
+    return dict(probe.raw_vocab), corpus_count, total_words
+
+
+def _train_variant(corpus_file, vocab, name: str, workers: int, pairs, out_dir, ann_index, params):
+    from gensim.models import Word2Vec
+
+    raw_vocab, corpus_count, total_words = vocab
+    model = Word2Vec(workers=workers, **params)
+    # vocabulary from the shared scan: no re-reading of the corpus per variant
+    model.build_vocab_from_freq(dict(raw_vocab), corpus_count=corpus_count)
+    model.corpus_total_words = total_words
+    start = time.perf_counter()
+    _, raw_words = model.train(corpus_file=str(corpus_file), total_words=total_words, epochs=model.epochs)
+    elapsed = time.perf_counter() - start
+    row = {'model': name, **params, 'workers': workers, 'vocab_size': len(model.wv),
+           'train_seconds': round(elapsed, 2), 'words_per_sec': int(raw_words / max(elapsed, 1e-9))}
+    if out_dir is not None:
+        path = Path(out_dir) / f'word2vec_{name}.model'
+        model.save(str(path))
+        row['path'] = str(path)
+        row['vectors'] = str(export_vectors(model, vectors_path(path), ann_index=ann_index))
+    sims = query(model.wv, pairs=pairs)['similarity']
+    for a, b in pairs:
+        row[f'sim_{a}_{b}'] = 'OOV' if sims[(a, b)] is None else f'{sims[(a, b)]:.4f}'
+    print(f"  {name}: vocab={row['vocab_size']} {elapsed:.1f}s {row['words_per_sec']:,} words/s ({workers} workers)")
+    return row, model
+
+
+def sweep(corpus_file, variants: Sequence[Dict], cpu_budget: int = WORKERS, parallel: int = None,
+          out_dir=None, pairs=PAIRS, out_csv=COMPARISON_CSV, ann_index: bool = False) -> Tuple[List[Dict], Dict]:
+    """Train several Word2Vec variants of one LineSentence file concurrently.
+
+    variants are Word2Vec parameter dicts, optionally with a 'name'
+    (default w<window>_mc<min_count>). The corpus vocabulary is scanned once and
+    shared; `parallel` variants train at the same time with cpu_budget // parallel
+    worker threads each. Models are saved to out_dir (if given) as
+    word2vec_<name>.model (plus .kv vectors, and an ANN index with ann_index), and one row per variant (parameters, vocab size,
+    training time, words/sec, similarity of `pairs`) is written to out_csv.
+    Returns (rows, {name: trained model}).
+    """
+    vocab = scan(corpus_file)
+    parallel = max(1, min(parallel or cpu_budget, len(variants)))
+    workers = max(1, cpu_budget // parallel)
+    jobs = []
+    for v in variants:
+        params = dict(v)
+        name = params.pop('name', None) or f"w{params.get('window', 5)}_mc{params.get('min_count', 5)}"
+        jobs.append((name, params))
+    print(f'Training {len(jobs)} variant(s), {parallel} at a time, {workers} worker(s) each')
+    # gensim releases the GIL while training, so threads are enough to overlap variants
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        futures = [pool.submit(_train_variant, corpus_file, vocab, name, workers, pairs, out_dir, ann_index, params)
+                   for name, params in jobs]
+        results = [f.result() for f in futures]
+    rows = [row for row, _ in results]
+
+    if out_csv is not None:
+        out_csv = Path(out_csv)
+        out_csv.parent.mkdir(parents=True, exist_ok=True)
+        fieldnames = []
+        for row in rows:
+            fieldnames += [k for k in row if k not in fieldnames]
+        with out_csv.open('w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        print('Wrote', out_csv)
+    return rows, {row['model']: model for row, model in results}
+
+
+def _parse_variant(spec: str) -> Dict:
+    window, _, min_count = spec.partition(':')
+    return {'window': int(window), 'min_count': int(min_count or 5)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Word2Vec helpers over LineSentence files.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('sweep', help='Train (window, min_count) variants concurrently and compare them')
+    p.add_argument('corpus_file')
+    p.add_argument('--variants', nargs='+', default=['3:3', '5:5', '7:3'], help='window:min_count')
+    p.add_argument('--vector-size', type=int, default=100)
+    p.add_argument('--epochs', type=int, default=5)
+    p.add_argument('--sg', type=int, default=0)
+    p.add_argument('--cpus', type=int, default=WORKERS, help='Total worker threads for the whole sweep')
+    p.add_argument('--parallel', type=int, default=None, help='Variants trained at the same time')
+    p.add_argument('--out-dir', default=None, help='Save word2vec_<name>.model files here')
+    p.add_argument('--out', default=str(COMPARISON_CSV))
+    p.add_argument('--ann', action='store_true', help='Also build an ANN index next to each model')
+    p = sub.add_parser('export', help='Write the vectors-only .kv file of saved Word2Vec models')
+    p.add_argument('models', nargs='+')
+    p.add_argument('--ann', action='store_true', help='Also build an ANN index next to each model')
+    p = sub.add_parser('query', help='Neighbours and pair similarities from a .kv file (memory-mapped)')
+    p.add_argument('vectors')
+    p.add_argument('--words', nargs='*', default=[])
+    p.add_argument('--pairs', nargs='*', default=[], help='a:b')
+    p.add_argument('--topn', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == 'sweep':
+        variants = [dict(_parse_variant(v), vector_size=args.vector_size, epochs=args.epochs, sg=args.sg)
+                    for v in args.variants]
+        sweep(args.corpus_file, variants, cpu_budget=args.cpus, parallel=args.parallel,
+              out_dir=args.out_dir, out_csv=args.out, ann_index=args.ann)
+    elif args.command == 'export':
+        from gensim.models import Word2Vec
+        for path in args.models:
+            print('Saved', export_vectors(Word2Vec.load(path), vectors_path(path), ann_index=args.ann))
+    else:
+        res = query(load_vectors(args.vectors), args.words, [tuple(p.split(':', 1)) for p in args.pairs], args.topn)
+        for w, sims in res['neighbours'].items():
+            print(w, '->', 'OOV' if sims is None else '; '.join(f'{t}:{s:.3f}' for t, s in sims))
+        for (a, b), s in res['similarity'].items():
+            print(f'similarity({a},{b}) =', 'OOV' if s is None else f'{s:.4f}')
+
+
+if __name__ == '__main__':
+    main()
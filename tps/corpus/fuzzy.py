@@ -0,0 +1,220 @@
+"""Fuzzy vocabulary lookup (symmetric-delete index) for OCR variants.
+
+module6/s2_fuzzy_matching.ipynb ran process.extract(word, vocab): one
+Levenshtein computation per vocabulary form and per query. This index follows
+SymSpell: every vocabulary term is stored under all the strings obtained by
+deleting up to max_distance characters from its prefix_length-character
+prefix. A query generates the same deletions of its own prefix; the terms
+sharing one of them are the only candidates, and only those get a real
+Levenshtein distance. Lookups therefore cost a few dozen hash probes plus a
+handful of distance computations, whatever the vocabulary size.
+
+The vocabulary and its counts come from the document x term store
+(termfreq.py): alphabetic terms of at least MIN_LEN characters seen at least
+MIN_COUNT times. The deletion keys (64-bit hashes, sorted) and term ids are
+persisted in data/cache/fuzzy_<dir>/ and memory-mapped; the index is rebuilt
+when the corpus fingerprint changes. lookup_many() resolves a batch of words
+with one vectorised search over all their deletion keys.
+
+Usage (from the repository root):
+    python -m tps.corpus.fuzzy bruxelles anvers liège --limit 15
+    python -m tps.corpus.fuzzy --build --min-count 1
+"""
+import argparse
+import json
+import os
+import time
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from Levenshtein import distance
+
+from .loader import CACHE_DIR, DATA_TXT, file_hashes, list_files
+
+INDEX_VERSION = 1
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+MIN_COUNT = 2
+MIN_LEN = 3
+
+# (term, edit distance, corpus count)
+Match = Tuple[str, int, int]
+
+
+def default_path(data_dir=DATA_TXT) -> Path:
+    data_dir = Path(data_dir)
+    return data_dir.parent / 'cache' / f'fuzzy_{data_dir.name}'
+
+
+def key(text: str) -> int:
+    """Stable 64-bit hash of a deletion string (collisions only add candidates)."""
+    raw = text.encode('utf-8')
+    return (zlib.crc32(raw) << 32) | zlib.adler32(raw)
+
+
+def deletes(word: str, max_distance: int) -> Set[str]:
+    """word and every string obtained by deleting up to max_distance of its characters."""
+    out = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - out
+        out |= frontier
+    return out
+
+
+class FuzzyIndex:
+    """Symmetric-delete index: sorted deletion keys -> vocabulary term ids."""
+
+    def __init__(self, terms: List[str], counts: np.ndarray, keys: np.ndarray, ids: np.ndarray,
+                 max_distance: int = MAX_DISTANCE, prefix_length: int = PREFIX_LENGTH, fingerprint: str = None):
+        self.terms = terms
+        self.counts = counts
+        self.keys = keys
+        self.ids = ids
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return len(self.terms)
+
+    @classmethod
+    def build(cls, terms: Iterable[str], counts: Iterable[int], max_distance: int = MAX_DISTANCE,
+              prefix_length: int = PREFIX_LENGTH, fingerprint: str = None) -> 'FuzzyIndex':
+        terms = list(terms)
+        keys, ids = array('Q'), array('i')
+        for i, term in enumerate(terms):
+            ds = deletes(term[:prefix_length], max_distance)
+            keys.extend(key(d) for d in ds)
+            ids.extend([i] * len(ds))
+        keys = np.frombuffer(keys, dtype=np.uint64)
+        ids = np.frombuffer(ids, dtype=np.int32)
+        order = np.argsort(keys, kind='stable')
+        return cls(terms, np.asarray(list(counts), dtype=np.int64), keys[order], ids[order],
+                   max_distance, prefix_length, fingerprint)
+
+    def save(self, path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name, values in [('keys', self.keys), ('ids', self.ids), ('counts', self.counts)]:
+            tmp = path / f'{name}.part.npy'
+            np.save(str(tmp), values, allow_pickle=False)
+            os.replace(tmp, path / f'{name}.npy')
+        meta = path / 'meta.json'
+        meta.with_suffix('.tmp').write_text(json.dumps({
+            'version': INDEX_VERSION,
+            'fingerprint': self.fingerprint,
+            'max_distance': self.max_distance,
+            'prefix_length': self.prefix_length,
+            'terms': self.terms,
+        }), encoding='utf-8')
+        os.replace(meta.with_suffix('.tmp'), meta)
+        return path
+
+    @classmethod
+    def load(cls, path) -> 'FuzzyIndex':
+        path = Path(path)
+        meta = json.loads((path / 'meta.json').read_text(encoding='utf-8'))
+        if meta.get('version') != INDEX_VERSION:
+            raise ValueError(f'{path} has index version {meta.get("version")}, expected {INDEX_VERSION}')
+        load = lambda name: np.load(str(path / f'{name}.npy'), mmap_mode='r')
+        return cls(meta['terms'], load('counts'), load('keys'), load('ids'),
+                   meta['max_distance'], meta['prefix_length'], meta['fingerprint'])
+
+    @classmethod
+    def open(cls, data_dir=DATA_TXT, path=None, cache_dir=CACHE_DIR, min_count: int = MIN_COUNT,
+             min_len: int = MIN_LEN, max_distance: int = MAX_DISTANCE) -> 'FuzzyIndex':
+        """Load the index of the corpus vocabulary, (re)building it when the files or parameters changed."""
+        from .inverted import fingerprint
+        from .termfreq import TermCounts
+
+        path = Path(path) if path else default_path(data_dir)
+        current = fingerprint(file_hashes(list_files(data_dir), cache_dir))
+        try:
+            index = cls.load(path)
+            if index.fingerprint == f'{current}:{min_count}:{min_len}' and index.max_distance == max_distance:
+                return index
+            print(f'{path} is out of date, rebuilding')
+        except (OSError, ValueError, KeyError):
+            print(f'No usable fuzzy index at {path}, building it')
+        start = time.perf_counter()
+        counts = TermCounts.open(data_dir, cache_dir=cache_dir)
+        totals = counts.totals()
+        keep = np.flatnonzero(counts.vocab_mask(min_len, alpha=True) & (totals >= min_count))
+        index = cls.build(counts.terms[keep].tolist(), totals[keep], max_distance,
+                          fingerprint=f'{counts.fingerprint}:{min_count}:{min_len}')
+        index.save(path)
+        print(f'Saved fuzzy index of {len(index)} terms ({len(index.keys)} keys) to {path} '
+              f'({time.perf_counter() - start:.1f}s)')
+        return cls.load(path)
+
+    def lookup_many(self, words: Iterable[str], max_distance: int = None,
+                    limit: Optional[int] = None) -> Dict[str, List[Match]]:
+        """word -> vocabulary terms within max_distance edits, closest then most frequent first."""
+        max_distance = self.max_distance if max_distance is None else max_distance
+        if max_distance > self.max_distance:
+            raise ValueError(f'max_distance {max_distance} exceeds the index max_distance {self.max_distance}')
+        words = list(dict.fromkeys(words))
+        queries = [w.lower() for w in words]
+        q_keys, q_rows = array('Q'), array('i')
+        for row, q in enumerate(queries):
+            ds = deletes(q[:self.prefix_length], max_distance)
+            q_keys.extend(key(d) for d in ds)
+            q_rows.extend([row] * len(ds))
+        q_keys = np.frombuffer(q_keys, dtype=np.uint64)
+        lo = np.searchsorted(self.keys, q_keys, side='left')
+        sizes = np.searchsorted(self.keys, q_keys, side='right') - lo
+        total = int(sizes.sum())
+        starts = np.repeat(lo - np.cumsum(sizes) + sizes, sizes) + np.arange(total)
+        rows = np.repeat(np.frombuffer(q_rows, dtype=np.int32), sizes).astype(np.int64)
+        pairs = np.unique((rows << 32) | np.asarray(self.ids[starts], dtype=np.int64))
+
+        results = {w: [] for w in words}
+        for pair in pairs.tolist():
+            row, term_id = pair >> 32, pair & 0xFFFFFFFF
+            q, term = queries[row], self.terms[term_id]
+            if abs(len(q) - len(term)) > max_distance:
+                continue
+            d = distance(q, term)
+            if d <= max_distance:
+                results[words[row]].append((term, d, int(self.counts[term_id])))
+        for w, matches in results.items():
+            matches.sort(key=lambda m: (m[1], -m[2], m[0]))
+            if limit is not None:
+                del matches[limit:]
+        return results
+
+    def lookup(self, word: str, max_distance: int = None, limit: Optional[int] = None) -> List[Match]:
+        return self.lookup_many([word], max_distance, limit)[word]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fuzzy (edit distance) lookup of words in the corpus vocabulary.')
+    parser.add_argument('words', nargs='*')
+    parser.add_argument('--txt-dir', default=str(DATA_TXT))
+    parser.add_argument('--path', default=None, help='Default: data/cache/fuzzy_<txt dir name>')
+    parser.add_argument('--max-distance', type=int, default=MAX_DISTANCE)
+    parser.add_argument('--min-count', type=int, default=MIN_COUNT, help='Ignore rarer vocabulary forms')
+    parser.add_argument('--limit', type=int, default=15)
+    parser.add_argument('--build', action='store_true', help='Rebuild the index even if it is up to date')
+    args = parser.parse_args()
+
+    if args.build:
+        import shutil
+        shutil.rmtree(args.path or default_path(args.txt_dir), ignore_errors=True)
+    index = FuzzyIndex.open(args.txt_dir, args.path, min_count=args.min_count, max_distance=args.max_distance)
+    if not args.words:
+        return
+    t0 = time.perf_counter()
+    results = index.lookup_many(args.words, limit=args.limit)
+    elapsed = time.perf_counter() - t0
+    for word, matches in results.items():
+        print(word, '->', '; '.join(f'{t} (d={d}, n={n})' for t, d, n in matches) or 'no match')
+    print(f'({1000 * elapsed:.1f} ms for {len(results)} words)')
+
+
+if __name__ == '__main__':
+    main()
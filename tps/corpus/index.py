@@ -0,0 +1,179 @@
+"""Filename-metadata index for selecting corpus files by year/decade/month/newspaper.
+
+CAMille files follow the KB_<newspaper>_<YYYY-MM-DD>_<page>.txt naming scheme
+(e.g. KB_JB838_1887-12-22_01-00001.txt, see module2/s2_explore.ipynb). The index
+parses every name once, keeps (date, name) keys sorted globally and per
+newspaper, and answers range queries with bisection instead of substring scans
+(so '1955' inside a page number no longer matches). It is persisted to
+<data_dir>/../cache/index.json (data/cache/index.json by default) and updated incrementally when files are added/removed.
+
+Usage (from the repository root):
+    from tps.corpus.index import CorpusIndex
+    idx = CorpusIndex.open()
+    files = idx.paths(idx.decade(1950, newspaper='JB838'))
+"""
+import json
+import os
+import re
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .loader import DATA_TXT
+
+INDEX_VERSION = 1
+
+_name_re = re.compile(r'^KB_(?P<newspaper>[^_]+)_(?P<date>(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2}))_(?P<page>.+)\.txt$')
+
+
+def parse_name(name: str) -> Optional[Dict]:
+    """Parse a KB_<newspaper>_<date>_<page>.txt file name, or None if anomalous."""
+    m = _name_re.match(name)
+    if not m:
+        return None
+    return {
+        'name': name,
+        'newspaper': m.group('newspaper'),
+        'date': m.group('date'),
+        'year': int(m.group('year')),
+        'month': int(m.group('month')),
+        'day': int(m.group('day')),
+        'page': m.group('page'),
+    }
+
+
+def _bounds(start, end):
+    """Turn year/'YYYY-MM'/'YYYY-MM-DD' bounds into inclusive string keys."""
+    lo = '' if start is None else str(start)
+    hi = '\uffff' if end is None else str(end) + '\uffff'
+    return (lo,), (hi,)
+
+
+class CorpusIndex:
+    """Sorted (date, name) keys over the corpus file names, global and per newspaper."""
+
+    def __init__(self, data_dir=DATA_TXT, path=None):
+        self.data_dir = Path(data_dir)
+        self.path = Path(path) if path else self.data_dir.parent / 'cache' / 'index.json'
+        self.entries: Dict[str, Dict] = {}
+        self.anomalies: List[str] = []
+        self.dir_mtime_ns = None
+        self._keys = []
+        self._by_paper: Dict[str, List] = {}
+
+    @classmethod
+    def open(cls, data_dir=DATA_TXT, path=None) -> 'CorpusIndex':
+        """Load the persisted index (if any) and bring it up to date with data_dir."""
+        idx = cls(data_dir, path)
+        idx._load()
+        if idx.update():
+            idx.save()
+        return idx
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            state = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        if state.get('version') != INDEX_VERSION or state.get('data_dir') != str(self.data_dir.resolve()):
+            return
+        for name in state.get('names', []):
+            meta = parse_name(name)
+            if meta:
+                self.entries[name] = meta
+        self.anomalies = state.get('anomalies', [])
+        self.dir_mtime_ns = state.get('dir_mtime_ns')
+        self._rebuild()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            'version': INDEX_VERSION,
+            'data_dir': str(self.data_dir.resolve()),
+            'dir_mtime_ns': self.dir_mtime_ns,
+            'names': [name for _, name in self._keys],
+            'anomalies': self.anomalies,
+        }
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(state), encoding='utf-8')
+        os.replace(tmp, self.path)
+
+    def update(self) -> bool:
+        """Add new files / drop removed ones. Returns True if the index changed.
+
+        The directory is only listed when its mtime changed since the last update.
+        """
+        if not self.data_dir.exists():
+            return False
+        mtime = self.data_dir.stat().st_mtime_ns
+        if mtime == self.dir_mtime_ns:
+            return False
+        names = {e.name for e in os.scandir(self.data_dir) if e.is_file() and e.name.endswith('.txt')}
+        added = names - self.entries.keys() - set(self.anomalies)
+        removed = self.entries.keys() - names
+        for name in removed:
+            del self.entries[name]
+        anomalies = [a for a in self.anomalies if a in names]
+        for name in added:
+            meta = parse_name(name)
+            if meta:
+                self.entries[name] = meta
+            else:
+                anomalies.append(name)
+        self.anomalies = sorted(anomalies)
+        self.dir_mtime_ns = mtime
+        self._rebuild()
+        return True
+
+    def add(self, names: Iterable[str]):
+        """Register files explicitly (e.g. right after a conversion run)."""
+        for name in names:
+            meta = parse_name(name)
+            if meta:
+                self.entries[name] = meta
+            elif name not in self.anomalies:
+                self.anomalies.append(name)
+        self._rebuild()
+
+    def _rebuild(self):
+        self._keys = sorted((m['date'], name) for name, m in self.entries.items())
+        self._by_paper = {}
+        for key in self._keys:
+            self._by_paper.setdefault(self.entries[key[1]]['newspaper'], []).append(key)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def newspapers(self) -> List[str]:
+        return sorted(self._by_paper)
+
+    def select(self, start=None, end=None, newspaper: Optional[str] = None) -> List[str]:
+        """File names whose date falls in [start, end] (inclusive).
+
+        start/end may be a year (1955), a month ('1955-03') or a full date ('1955-03-14').
+        """
+        keys = self._keys if newspaper is None else self._by_paper.get(newspaper, [])
+        lo, hi = _bounds(start, end)
+        return [name for _, name in keys[bisect_left(keys, lo):bisect_right(keys, hi)]]
+
+    def year(self, year: int, newspaper: Optional[str] = None) -> List[str]:
+        return self.select(year, year, newspaper)
+
+    def years(self, start: int, end: int, newspaper: Optional[str] = None) -> List[str]:
+        return self.select(start, end, newspaper)
+
+    def decade(self, decade: int, newspaper: Optional[str] = None) -> List[str]:
+        start = decade - decade % 10
+        return self.select(start, start + 9, newspaper)
+
+    def month(self, year: int, month: int, newspaper: Optional[str] = None) -> List[str]:
+        key = f'{year:04d}-{month:02d}'
+        return self.select(key, key, newspaper)
+
+    def meta(self, name: str) -> Optional[Dict]:
+        return self.entries.get(name)
+
+    def paths(self, names: Iterable[str]) -> List[Path]:
+        return [self.data_dir / name for name in names]
@@ -0,0 +1,450 @@
+"""Persistent positional inverted index over data/txt: term/phrase/proximity queries, KWIC, df per year.
+
+utils/filter_corpus.ipynb and the tps/tp4 analyses read, sentence-split and
+regex-scan every file for each query. This index tokenizes the corpus once
+(lowercased \\w+ tokens, numbered per document) and stores, in
+data/cache/inverted_<dir>/:
+
+- lexicon.bin + lexicon_offsets.npy: the sorted vocabulary as one utf-8 blob,
+  looked up by bisection (prefix queries like 'aviat*' are a range);
+- term_post.npy -> post_docs.npy / post_ptr.npy -> positions.npy: for each
+  term its documents, and for each (term, document) its token positions;
+- forward.npy + doc_ptr.npy: the term ids of every document in order (used
+  for collocates and to bound contexts);
+- docs.json: file names and a fingerprint of their content hashes. Document
+  metadata (newspaper, date) comes from the file names (see index.py).
+
+Every array is memory-mapped, so opening the index is cheap and a query only
+touches the postings it needs. The build is out-of-core: term ids are streamed
+to disk in blocks, then each block is sorted by term and scattered into its
+final place. Phrases are matched by intersecting (document, position - i)
+keys, proximity by a sorted search over the second term's positions; KWIC and
+sentence extraction only re-read the documents that contain a hit.
+
+Usage (from the repository root):
+    python -m tps.corpus.inverted build
+    python -m tps.corpus.inverted search '"aviation allemande"' --kwic 20 --from 1940 --to 1945
+    python -m tps.corpus.inverted search 'aviation NEAR/5 anglaise' --newspaper JB838
+    python -m tps.corpus.inverted years aviation
+    python -m tps.corpus.inverted collocates aviation --window 5
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .index import _bounds, parse_name
+from .loader import CACHE_DIR, DATA_TXT, file_hashes, iter_documents, list_files, load_document, load_manifest, \
+    save_manifest, sentence_texts
+
+INDEX_VERSION = 1
+BLOCK_TOKENS = 5_000_000
+CHUNK = 1 << 22
+SHIFT = np.int64(32)
+
+_token_re = re.compile(r'\w+')
+_query_re = re.compile(r'\w+\*?')
+_near_re = re.compile(r'\s+NEAR/(\d+)\s+')
+
+
+def tokens(text: str) -> List[str]:
+    """The indexed tokens of a text: lowercased runs of word characters."""
+    return [m.group().lower() for m in _token_re.finditer(text)]
+
+
+def default_path(data_dir=DATA_TXT) -> Path:
+    data_dir = Path(data_dir)
+    return data_dir.parent / 'cache' / f'inverted_{data_dir.name}'
+
+
+def fingerprint(hashes: Dict[str, str]) -> str:
+    return hashlib.sha1(json.dumps(sorted(hashes.items())).encode('utf-8')).hexdigest()
+
+
+class Lexicon(Sequence):
+    """Sorted terms stored as one utf-8 blob plus offsets; supports bisect."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i) -> str:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def id(self, term: str) -> Optional[int]:
+        i = bisect_left(self, term)
+        return i if i < len(self) and self[i] == term else None
+
+    def prefix(self, prefix: str) -> range:
+        return range(bisect_left(self, prefix), bisect_left(self, prefix + '\U0010ffff'))
+
+
+def _save(path: Path, array: np.ndarray):
+    np.save(str(path), array, allow_pickle=False)
+
+
+def build(paths: Iterable, out_dir, block_tokens: int = BLOCK_TOKENS, cache_dir=CACHE_DIR) -> Path:
+    """Index the documents of paths into out_dir (replaced atomically); returns out_dir."""
+    paths = [Path(p) for p in paths]
+    out_dir = Path(out_dir)
+    tmp_dir = out_dir.with_name(out_dir.name + '.part')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    start = time.perf_counter()
+
+    # 1. stream the term ids of every document (first-seen ids) to a raw file
+    vocab: Dict[str, int] = {}
+    names, lengths = [], []
+    raw_path = tmp_dir / 'forward.raw'
+    with raw_path.open('wb') as raw:
+        for doc in iter_documents(paths, cache_dir=cache_dir, tokenized=False):
+            ids = np.fromiter((vocab.setdefault(t, len(vocab)) for t in tokens(doc['text'])), dtype=np.int32)
+            raw.write(ids.tobytes())
+            names.append(doc['name'])
+            lengths.append(len(ids))
+    doc_ptr = np.zeros(len(names) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=doc_ptr[1:])
+    n_tokens = int(doc_ptr[-1])
+    print(f'Tokenized {len(names)} documents ({n_tokens} tokens, {len(vocab)} terms) '
+          f'in {time.perf_counter() - start:.1f}s')
+
+    # 2. sorted lexicon and first-seen id -> rank
+    terms = sorted(vocab)
+    rank = np.empty(len(terms), dtype=np.int32)
+    rank[np.fromiter((vocab[t] for t in terms), dtype=np.int64, count=len(terms))] = np.arange(len(terms))
+    del vocab
+    encoded = [t.encode('utf-8') for t in terms]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    (tmp_dir / 'lexicon.bin').write_bytes(b''.join(encoded))
+    _save(tmp_dir / 'lexicon_offsets.npy', offsets)
+    _save(tmp_dir / 'doc_ptr.npy', doc_ptr)
+    del encoded, terms
+
+    # 3. forward index with final ids, and term counts
+    raw = np.memmap(raw_path, dtype=np.int32, mode='r', shape=(n_tokens,)) if n_tokens else np.zeros(0, np.int32)
+    forward = np.lib.format.open_memmap(str(tmp_dir / 'forward.npy'), mode='w+', dtype=np.int32, shape=(n_tokens,))
+    counts = np.zeros(len(rank), dtype=np.int64)
+    for a in range(0, n_tokens, block_tokens):
+        block = rank[raw[a:a + block_tokens]]
+        forward[a:a + block_tokens] = block
+        counts += np.bincount(block, minlength=len(rank))
+    forward.flush()
+    del raw
+    os.remove(raw_path)
+    term_ptr = np.zeros(len(rank) + 1, dtype=np.int64)
+    np.cumsum(counts, out=term_ptr[1:])
+
+    # 4. scatter each block, sorted by term, into its place: (term, doc, position) order
+    positions = np.lib.format.open_memmap(str(tmp_dir / 'positions.npy'), mode='w+', dtype=np.int32,
+                                          shape=(n_tokens,))
+    occ_docs = np.lib.format.open_memmap(str(tmp_dir / 'occ_docs.npy'), mode='w+', dtype=np.int32,
+                                         shape=(n_tokens,))
+    filled = term_ptr[:-1].copy()
+    for a in range(0, n_tokens, block_tokens):
+        block = np.asarray(forward[a:a + block_tokens])
+        order = np.argsort(block, kind='stable')
+        sorted_terms = block[order]
+        g = order + a
+        docs = np.searchsorted(doc_ptr, g, side='right') - 1
+        block_counts = np.bincount(sorted_terms, minlength=len(rank))
+        block_start = np.zeros(len(rank), dtype=np.int64)
+        np.cumsum(block_counts[:-1], out=block_start[1:])
+        dest = filled[sorted_terms] + (np.arange(len(order)) - block_start[sorted_terms])
+        positions[dest] = g - doc_ptr[docs]
+        occ_docs[dest] = docs
+        filled += block_counts
+    positions.flush()
+
+    # 5. (term, document) postings: one entry where the term or the document changes
+    starts = []
+    for a in range(0, n_tokens, CHUNK):
+        b = min(a + CHUNK, n_tokens)
+        idx = np.arange(a, b, dtype=np.int64)
+        d = np.asarray(occ_docs[a:b])
+        prev_d = np.concatenate([[occ_docs[a - 1] if a else -1], d[:-1]])
+        new = (d != prev_d) | np.isin(idx, term_ptr)
+        starts.append(idx[new])
+    starts = np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64)
+    _save(tmp_dir / 'post_docs.npy', np.asarray(occ_docs[starts]) if len(starts) else np.zeros(0, np.int32))
+    _save(tmp_dir / 'post_ptr.npy', np.append(starts, n_tokens).astype(np.int64))
+    _save(tmp_dir / 'term_post.npy', np.searchsorted(starts, term_ptr).astype(np.int64))
+    del occ_docs, positions, forward
+    os.remove(tmp_dir / 'occ_docs.npy')
+
+    hashes = file_hashes(paths, cache_dir)
+    (tmp_dir / 'docs.json').write_text(json.dumps({
+        'version': INDEX_VERSION,
+        'fingerprint': fingerprint(hashes),
+        'names': names,
+    }), encoding='utf-8')
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+    print(f'Saved inverted index to {out_dir} ({len(starts)} postings, {time.perf_counter() - start:.1f}s)')
+    return out_dir
+
+
+class InvertedIndex:
+    """Memory-mapped positional index; queries are phrases ('a b', 'aviat*') or 'a NEAR/k b'."""
+
+    def __init__(self, path, data_dir=DATA_TXT, cache_dir=CACHE_DIR):
+        self.path = Path(path)
+        self.data_dir = Path(data_dir)
+        self.cache_dir = cache_dir
+        state = json.loads((self.path / 'docs.json').read_text(encoding='utf-8'))
+        if state.get('version') != INDEX_VERSION:
+            raise ValueError(f'{self.path} has index version {state.get("version")}, expected {INDEX_VERSION}')
+        self.fingerprint = state['fingerprint']
+        self.names: List[str] = state['names']
+        load = lambda name: np.load(str(self.path / name), mmap_mode='r')
+        blob = np.memmap(self.path / 'lexicon.bin', dtype=np.uint8, mode='r') \
+            if (self.path / 'lexicon.bin').stat().st_size else np.zeros(0, np.uint8)
+        self.lexicon = Lexicon(blob, load('lexicon_offsets.npy'))
+        self.term_post = load('term_post.npy')
+        self.post_docs = load('post_docs.npy')
+        self.post_ptr = load('post_ptr.npy')
+        self.positions = load('positions.npy')
+        self.forward = load('forward.npy')
+        self.doc_ptr = load('doc_ptr.npy')
+        metas = [parse_name(n) or {} for n in self.names]
+        self.dates = np.array([m.get('date', '') for m in metas], dtype=str)
+        self.years = np.array([m.get('year', 0) for m in metas], dtype=np.int32)
+        self.newspapers = np.array([m.get('newspaper', '') for m in metas], dtype=str)
+
+    @classmethod
+    def open(cls, data_dir=DATA_TXT, path=None, cache_dir=CACHE_DIR) -> 'InvertedIndex':
+        """Load the index of data_dir, (re)building it when the files changed."""
+        path = Path(path) if path else default_path(data_dir)
+        paths = list_files(data_dir)
+        current = fingerprint(file_hashes(paths, cache_dir))
+        try:
+            index = cls(path, data_dir, cache_dir)
+            if index.fingerprint == current:
+                return index
+            print(f'{path} is out of date, rebuilding')
+        except (OSError, ValueError, KeyError):
+            print(f'No usable index at {path}, building it')
+        build(paths, path, cache_dir=cache_dir)
+        return cls(path, data_dir, cache_dir)
+
+    def __len__(self):
+        return len(self.names)
+
+    # -- postings ---------------------------------------------------------
+
+    def _term_ids(self, term: str) -> Sequence[int]:
+        if term.endswith('*'):
+            return self.lexicon.prefix(term[:-1])
+        i = self.lexicon.id(term)
+        return [] if i is None else [i]
+
+    def occurrences(self, term: str) -> np.ndarray:
+        """Sorted keys (document << 32 | position) of a term ('word' or 'prefix*')."""
+        parts = []
+        for t in self._term_ids(term):
+            a, b = int(self.term_post[t]), int(self.term_post[t + 1])
+            ptr = np.asarray(self.post_ptr[a:b + 1])
+            docs = np.repeat(np.asarray(self.post_docs[a:b], dtype=np.int64), np.diff(ptr))
+            parts.append((docs << SHIFT) | np.asarray(self.positions[ptr[0]:ptr[-1]], dtype=np.int64))
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+
+    def doc_mask(self, start=None, end=None, newspaper: Optional[str] = None) -> Optional[np.ndarray]:
+        """Boolean mask over documents for a date range (as in CorpusIndex.select) and newspaper."""
+        if start is None and end is None and newspaper is None:
+            return None
+        (lo,), (hi,) = _bounds(start, end)
+        mask = (self.dates >= lo) & (self.dates <= hi)
+        if newspaper is not None:
+            mask &= self.newspapers == newspaper
+        return mask
+
+    def phrase(self, words: List[str]) -> np.ndarray:
+        """Keys of the first token of every occurrence of consecutive words."""
+        keys = self.occurrences(words[0])
+        for i, w in enumerate(words[1:], 1):
+            if not len(keys):
+                break
+            keys = keys[np.isin(keys + i, self.occurrences(w), assume_unique=True)]
+        return keys
+
+    def near(self, a: List[str], b: List[str], window: int = 5, ordered: bool = False) -> np.ndarray:
+        """Keys of phrase a when phrase b starts within window tokens (after a only if ordered)."""
+        ka, kb = self.phrase(a), self.phrase(b)
+        if not len(ka) or not len(kb):
+            return np.zeros(0, dtype=np.int64)
+        # keys of different documents are 2**32 apart, so each window is one key range
+        after = np.searchsorted(kb, ka + len(a) - 1 + window, side='right') - np.searchsorted(kb, ka + len(a))
+        found = after > 0
+        if not ordered:
+            before = np.searchsorted(kb, ka - len(b), side='right') - np.searchsorted(kb, ka - len(b) + 1 - window)
+            found |= before > 0
+        return ka[found]
+
+    def search(self, query: str, start=None, end=None, newspaper: Optional[str] = None) -> Tuple[np.ndarray, int]:
+        """(keys, span in tokens) of a query: 'word', 'a phrase', 'prefix*' or 'a NEAR/5 b'."""
+        parts = _near_re.split(query.lower().replace('near/', 'NEAR/'))
+        words = [_query_re.findall(p) for p in parts[::2]]
+        if not all(words):
+            return np.zeros(0, dtype=np.int64), 0
+        if len(words) == 1:
+            keys = self.phrase(words[0])
+        else:
+            keys = self.near(words[0], words[1], window=int(parts[1]))
+        mask = self.doc_mask(start, end, newspaper)
+        if mask is not None and len(keys):
+            keys = keys[mask[keys >> SHIFT]]
+        return keys, len(words[0])
+
+    # -- results ----------------------------------------------------------
+
+    def count(self, query: str, **filters) -> int:
+        return len(self.search(query, **filters)[0])
+
+    def documents(self, query: str, **filters) -> List[str]:
+        """File names of the documents matching query."""
+        keys, _ = self.search(query, **filters)
+        return [self.names[d] for d in np.unique(keys >> SHIFT)]
+
+    def df_by_year(self, query: str, newspaper: Optional[str] = None) -> List[Dict]:
+        """Per year: documents, documents matching query (df), their share and the number of hits."""
+        keys, _ = self.search(query, newspaper=newspaper)
+        docs = keys >> SHIFT
+        scope = np.ones(len(self), dtype=bool) if newspaper is None else self.newspapers == newspaper
+        matched = np.zeros(len(self), dtype=bool)
+        matched[docs] = True
+        hits = np.bincount(docs, minlength=len(self))
+        rows = []
+        for year in np.unique(self.years[scope & (self.years > 0)]):
+            in_year = scope & (self.years == year)
+            n, df = int(in_year.sum()), int((matched & in_year).sum())
+            rows.append({'year': int(year), 'documents': n, 'df': df, 'share': round(df / n, 4),
+                         'hits': int(hits[in_year].sum())})
+        return rows
+
+    def collocates(self, query: str, window: int = 5, **filters) -> Counter:
+        """Counts of the terms within window tokens of each hit (hit tokens excluded)."""
+        keys, span = self.search(query, **filters)
+        if not len(keys):
+            return Counter()
+        docs = keys >> SHIFT
+        g = self.doc_ptr[docs] + (keys & 0xFFFFFFFF)
+        offs = np.concatenate([np.arange(-window, 0), np.arange(span, span + window)])
+        idx = g[:, None] + offs
+        valid = (idx >= self.doc_ptr[docs][:, None]) & (idx < self.doc_ptr[docs + 1][:, None])
+        counts = np.bincount(self.forward[idx[valid]], minlength=len(self.lexicon))
+        return Counter({self.lexicon[int(t)]: int(counts[t]) for t in np.flatnonzero(counts)})
+
+    def _texts(self, docs: Iterable[int]):
+        manifest = load_manifest(self.cache_dir)
+        try:
+            for d in docs:
+                yield d, load_document(self.data_dir / self.names[d], self.cache_dir, manifest, tokenized=False)['text']
+        finally:
+            save_manifest(manifest, self.cache_dir)
+
+    def kwic(self, query: str, width: int = 60, limit: Optional[int] = None, **filters) -> List[Dict]:
+        """Keyword-in-context lines (filename, date, left, match, right), reading only matching documents."""
+        keys, span = self.search(query, **filters)
+        if limit is not None:
+            keys = keys[:limit]
+        docs = keys >> SHIFT
+        pos = keys & 0xFFFFFFFF
+        rows = []
+        for d, text in self._texts(np.unique(docs)):
+            spans = [m.span() for m in _token_re.finditer(text)]
+            for p in pos[docs == d]:
+                a, b = spans[p][0], spans[p + span - 1][1]
+                rows.append({
+                    'filename': self.names[d],
+                    'date': str(self.dates[d]),
+                    'left': ' '.join(text[max(0, a - width):a].split()),
+                    'match': ' '.join(text[a:b].split()),
+                    'right': ' '.join(text[b:b + width].split()),
+                })
+        return rows
+
+    def sentences(self, queries: Union[str, List[str]], **filters) -> Dict[str, List[str]]:
+        """file name -> sentences containing a hit of any query (what utils/filter_corpus.ipynb extracts)."""
+        queries = [queries] if isinstance(queries, str) else queries
+        keys = np.unique(np.concatenate([self.search(q, **filters)[0] for q in queries] or [np.zeros(0, np.int64)]))
+        docs = keys >> SHIFT
+        pos = keys & 0xFFFFFFFF
+        out = {}
+        for d, text in self._texts(np.unique(docs)):
+            sents = sentence_texts(text)
+            ends = np.cumsum([len(_token_re.findall(s)) for s in sents])
+            hit = np.unique(np.searchsorted(ends, pos[docs == d], side='right'))
+            out[self.names[d]] = [sents[i] for i in hit if i < len(sents)]
+        return out
+
+
+def _print_rows(rows: List[Dict]):
+    import pandas as pd
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.max_colwidth', 80):
+        print(pd.DataFrame(rows).to_string(index=False) if rows else '(no hits)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Positional inverted index over the corpus.')
+    parser.add_argument('--txt-dir', default=str(DATA_TXT))
+    parser.add_argument('--path', default=None, help='Default: data/cache/inverted_<txt dir name>')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help='(Re)build the index')
+    for name, help_ in [('search', 'Count hits, list documents or print a KWIC concordance'),
+                        ('years', 'Document frequency per year'),
+                        ('collocates', 'Most frequent terms around the hits')]:
+        p = sub.add_parser(name, help=help_)
+        p.add_argument('query', help="e.g. aviation, '\"aviation allemande\"', 'aviat*', 'aviation NEAR/5 anglaise'")
+        p.add_argument('--from', dest='start', default=None, help='Year, YYYY-MM or YYYY-MM-DD')
+        p.add_argument('--to', dest='end', default=None)
+        p.add_argument('--newspaper', default=None, help='e.g. JB838 (Le Soir) or JB427 (La Libre Belgique)')
+        if name == 'search':
+            p.add_argument('--kwic', type=int, default=0, help='Print up to N concordance lines')
+            p.add_argument('--width', type=int, default=60)
+        if name == 'collocates':
+            p.add_argument('--window', type=int, default=5)
+            p.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build(list_files(args.txt_dir), args.path or default_path(args.txt_dir))
+        return
+    index = InvertedIndex.open(args.txt_dir, args.path)
+    query = args.query.replace('"', '')
+    t0 = time.perf_counter()
+    if args.command == 'years':
+        rows = index.df_by_year(query, newspaper=args.newspaper)
+        elapsed = time.perf_counter() - t0
+        _print_rows(rows)
+    elif args.command == 'collocates':
+        counts = index.collocates(query, args.window, start=args.start, end=args.end, newspaper=args.newspaper)
+        elapsed = time.perf_counter() - t0
+        for term, c in counts.most_common(args.top):
+            print(f'{term}\t{c}')
+    else:
+        filters = dict(start=args.start, end=args.end, newspaper=args.newspaper)
+        keys, _ = index.search(query, **filters)
+        elapsed = time.perf_counter() - t0
+        print(f'{len(keys)} hits in {len(np.unique(keys >> SHIFT))} documents')
+        if args.kwic:
+            _print_rows(index.kwic(query, args.width, args.kwic, **filters))
+    print(f'({1000 * elapsed:.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Parallel YAKE keyword extraction with a per-document result cache.
+
+Keyword lists are extracted over a process pool (one yake.KeywordExtractor per
+worker) and persisted per document under data/cache/keywords/<params>/, keyed by
+the content hash of the file. Aggregations for any year, decade or newspaper
+(e.g. the N_TOP_WORDS bigram table of tps/tp2/generate_keywords.py) are then
+computed from the cache without re-running YAKE.
+
+Usage (from the repository root):
+    python -m tps.corpus.keywords --year 1955 --ngram 2 --top 200
+    python -m tps.corpus.keywords --decade 1950 --newspaper JB838
+"""
+import argparse
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .loader import DATA_TXT, file_hashes, load_document
+
+CACHE_DIR = Path('data') / 'cache' / 'keywords'
+LANGUAGE = 'fr'
+TOP = 50
+
+_extractor = None
+
+
+def _params_key(lan: str, top: int) -> str:
+    return f'yake-{lan}-top{top}'
+
+
+def _cache_path(cache_dir: Path, digest: str) -> Path:
+    return cache_dir / digest[:2] / f'{digest}.json'
+
+
+def read_cached(cache_dir: Path, digest: str) -> Optional[List]:
+    try:
+        return json.loads(_cache_path(cache_dir, digest).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached(cache_dir: Path, digest: str, keywords: List):
+    path = _cache_path(cache_dir, digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(keywords, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def _init_worker(lan: str, top: int):
+    global _extractor
+    import yake
+    _extractor = yake.KeywordExtractor(lan=lan, top=top)
+
+
+def _extract_file(args: Tuple[str, str, str]) -> Tuple[str, List]:
+    path, digest, cache_dir = args
+    doc = load_document(path, tokenized=False)
+    keywords = [[kw, float(score)] for kw, score in _extractor.extract_keywords(doc['text'])]
+    _write_cached(Path(cache_dir), digest, keywords)
+    return os.path.basename(path), keywords
+
+
+def extract(paths: Iterable, workers: int = None, lan: str = LANGUAGE, top: int = TOP,
+            cache_dir=CACHE_DIR) -> Dict[str, List]:
+    """Return {file name: [[keyword, score], ...]}, running YAKE only on uncached files."""
+    paths = [Path(p) for p in paths]
+    cache_dir = Path(cache_dir) / _params_key(lan, top)
+    hashes = file_hashes(paths)
+    results = {}
+    todo = []
+    for p in paths:
+        cached = read_cached(cache_dir, hashes[p.name])
+        if cached is None:
+            todo.append((str(p), hashes[p.name], str(cache_dir)))
+        else:
+            results[p.name] = cached
+    print(f'{len(results)} document(s) from cache, {len(todo)} to extract')
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(lan, top)) as pool:
+            for i, (name, keywords) in enumerate(pool.map(_extract_file, todo, chunksize=4), 1):
+                results[name] = keywords
+                if i % 100 == 0:
+                    print(f'{i}/{len(todo)} document(s) extracted...')
+    return results
+
+
+def aggregate(results: Dict[str, List], ngram: Optional[int] = 2) -> Counter:
+    """Count, per lowercased keyword, the documents it was extracted from.
+
+    ngram restricts to keywords of that many words (None keeps all).
+    """
+    agg = Counter()
+    for keywords in results.values():
+        for kw, _ in keywords:
+            if ngram is None or len(kw.split()) == ngram:
+                agg[kw.lower()] += 1
+    return agg
+
+
+def main():
+    from .index import CorpusIndex
+
+    parser = argparse.ArgumentParser(description='YAKE keywords aggregated over a corpus selection.')
+    parser.add_argument('--txt-dir', default=str(DATA_TXT))
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--year', type=int)
+    group.add_argument('--decade', type=int)
+    parser.add_argument('--newspaper', default=None, help='e.g. JB838 (Le Soir) or JB427 (La Libre Belgique)')
+    parser.add_argument('--ngram', type=int, default=2, help='Keep keywords of this many words (0: all)')
+    parser.add_argument('--top', type=int, default=200, help='Number of aggregated keywords to print')
+    parser.add_argument('--workers', '-j', type=int, default=None)
+    parser.add_argument('--out', default=None, help='Optional CSV output (keyword,count)')
+    args = parser.parse_args()
+
+    index = CorpusIndex.open(args.txt_dir)
+    if args.year is not None:
+        names = index.year(args.year, args.newspaper)
+    elif args.decade is not None:
+        names = index.decade(args.decade, args.newspaper)
+    else:
+        names = index.select(newspaper=args.newspaper)
+    results = extract(index.paths(names), workers=args.workers)
+    top = aggregate(results, args.ngram or None).most_common(args.top)
+    if args.out:
+        import pandas as pd
+        pd.DataFrame(top, columns=['keyword', 'count']).to_csv(args.out, index=False, encoding='utf-8')
+        print('Saved aggregated keywords to', args.out)
+    else:
+        for kw, c in top:
+            print(f'{c}\t{kw}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Corpus-scale language identification with per-document confidence output.
+
+Replaces the one-file-at-a-time loop of module5/s1_language_detection.ipynb:
+documents are spread over a process pool (one langid identifier per worker),
+and instead of classifying megabyte pages whole, each document is sampled with
+a few bounded windows whose language probabilities are averaged. The result is
+a per-file table (data/langid.csv: filename, lang, confidence, chars, size,
+mtime) that is updated incrementally and that other stages can use to drop
+Dutch/German pages before expensive NLP (see filter_paths()).
+
+Usage (from the repository root):
+    python -m tps.corpus.language --workers 8 --languages fr nl de en
+"""
+import argparse
+import csv
+import os
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from .loader import DATA_TXT, list_files, read_text
+
+TABLE_PATH = Path('data') / 'langid.csv'
+LANGUAGES = ('fr', 'nl', 'de', 'en')
+WINDOW = 2000
+N_WINDOWS = 5
+MIN_CHARS = 20
+FIELDS = ['filename', 'lang', 'confidence', 'chars', 'size', 'mtime']
+
+_identifier = None
+
+
+def _init_worker(languages: Optional[Sequence[str]]):
+    global _identifier
+    from langid.langid import LanguageIdentifier, model
+    _identifier = LanguageIdentifier.from_modelstring(model, norm_probs=True)
+    if languages:
+        _identifier.set_languages(list(languages))
+
+
+def windows(text: str, size: int = WINDOW, n: int = N_WINDOWS) -> List[str]:
+    """Up to n evenly spaced windows of `size` characters covering the text."""
+    if len(text) <= size * n:
+        return [text[i:i + size] for i in range(0, len(text), size)][:n] or ['']
+    step = (len(text) - size) // (n - 1) if n > 1 else 0
+    return [text[k * step:k * step + size] for k in range(n)]
+
+
+def classify(text: str, size: int = WINDOW, n: int = N_WINDOWS):
+    """Return (lang, confidence) averaged over the sampled windows of text."""
+    if len(text.strip()) <= MIN_CHARS:
+        return 'n/a', 0.0
+    scores = defaultdict(float)
+    wins = [w for w in windows(text, size, n) if w.strip()]
+    if not wins:  # text only inside unsampled stretches (long blank runs)
+        return 'n/a', 0.0
+    for w in wins:
+        for lang, prob in _identifier.rank(w):
+            scores[lang] += prob
+    lang, total = max(scores.items(), key=lambda kv: kv[1])
+    return lang, total / len(wins)
+
+
+def _classify_file(path: str) -> Optional[Dict]:
+    """Table row for path, or None when it cannot be read or classified (retried on the next run)."""
+    try:
+        text = read_text(path)
+        lang, conf = classify(text)
+        st = os.stat(path)
+    except Exception as e:
+        print(f'Could not classify {path}: {e}')
+        return None
+    return {
+        'filename': os.path.basename(path),
+        'lang': lang,
+        'confidence': round(conf, 4),
+        'chars': len(text),
+        'size': st.st_size,
+        'mtime': st.st_mtime_ns,
+    }
+
+
+def load_table(path=TABLE_PATH) -> Dict[str, Dict]:
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with path.open(encoding='utf-8', newline='') as f:
+        rows = {}
+        for row in csv.DictReader(f):
+            row['confidence'] = float(row['confidence'])
+            for key in ('chars', 'size', 'mtime'):
+                row[key] = int(row[key])
+            rows[row['filename']] = row
+        return rows
+
+
+def save_table(rows: Dict[str, Dict], path=TABLE_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with tmp.open('w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for name in sorted(rows):
+            writer.writerow(rows[name])
+    os.replace(tmp, path)
+
+
+def run(paths: Iterable, table_path=TABLE_PATH, workers: int = None,
+        languages: Optional[Sequence[str]] = LANGUAGES) -> Dict[str, Dict]:
+    """Classify every new/changed file of paths and return the full table."""
+    rows = load_table(table_path)
+    todo = []
+    for p in paths:
+        p = Path(p)
+        st = p.stat()
+        known = rows.get(p.name)
+        if known and known['size'] == st.st_size and known['mtime'] == st.st_mtime_ns:
+            continue
+        todo.append(str(p))
+    print(f'{len(todo)} document(s) to classify ({len(rows)} already in {table_path})')
+    if todo:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(languages,)) as pool:
+                for i, row in enumerate(pool.map(_classify_file, todo, chunksize=32), 1):
+                    if row is not None:
+                        rows[row['filename']] = row
+                    if i % 500 == 0:
+                        print(f'{i} document(s) processed...')
+        finally:
+            save_table(rows, table_path)
+    return rows
+
+
+def filter_paths(paths: Iterable, langs: Sequence[str] = ('fr',), min_confidence: float = 0.0,
+                 table_path=TABLE_PATH, keep_unknown: bool = True) -> List[Path]:
+    """Keep paths whose detected language is in langs (files missing from the table are kept if keep_unknown)."""
+    rows = load_table(table_path)
+    kept = []
+    for p in paths:
+        row = rows.get(Path(p).name)
+        if row is None:
+            if keep_unknown:
+                kept.append(Path(p))
+        elif row['lang'] in langs and row['confidence'] >= min_confidence:
+            kept.append(Path(p))
+    return kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-document language identification over data/txt.')
+    parser.add_argument('--txt-dir', default=str(DATA_TXT))
+    parser.add_argument('--out', default=str(TABLE_PATH))
+    parser.add_argument('--workers', '-j', type=int, default=None)
+    parser.add_argument('--languages', nargs='*', default=list(LANGUAGES), help='Restrict langid to these languages (empty: all)')
+    args = parser.parse_args()
+    rows = run(list_files(args.txt_dir), args.out, workers=args.workers, languages=args.languages or None)
+    for lang, n in Counter(r['lang'] for r in rows.values()).most_common():
+        print(f'{lang}\t{n}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""Single-pass corpus loader with a tokenized on-disk cache.
+
+Every KB_JBxxx_YYYY-MM-DD_pp-nnnnn.txt file is decoded (utf-8, falling back to
+latin-1), normalised and split into sentences/words once. The result is pickled
+under data/cache/tokens, keyed by the SHA-1 of the raw file content, so later
+runs skip decoding and NLTK tokenization entirely. A small manifest maps
+(name, size, mtime) to the content hash so unchanged files are not even re-read.
+
+Usage (from the repository root):
+    from tps.corpus.loader import iter_documents, list_files, words
+    for doc in iter_documents(list_files()):
+        print(doc['name'], len(doc['text']), len(words(doc)))
+"""
+import hashlib
+import json
+import os
+import pickle
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import nltk
+from nltk.tokenize import sent_tokenize, word_tokenize
+
+DATA_TXT = Path('data') / 'txt'
+CACHE_DIR = Path('data') / 'cache' / 'tokens'
+# Bump when normalize() or tokenize() change so stale cache entries are ignored
+CACHE_VERSION = 1
+
+_ws_re = re.compile(r'[ \t\r\f\v]+')
+_punkt_ready = False
+
+
+def list_files(data_dir=DATA_TXT) -> List[Path]:
+    """Return the sorted list of .txt files in data_dir (empty if missing)."""
+    data_dir = Path(data_dir)
+    if not data_dir.exists():
+        return []
+    return sorted(p for p in data_dir.glob('*.txt') if p.is_file())
+
+
+def decode(raw: bytes) -> str:
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('latin-1')
+
+
+def read_text(path) -> str:
+    """Read a corpus file with the usual utf-8 -> latin-1 fallback."""
+    return decode(Path(path).read_bytes())
+
+
+def normalize(text: str) -> str:
+    """NFC-normalise, drop NUL bytes and collapse runs of blanks on each line."""
+    text = unicodedata.normalize('NFC', text).replace('\x00', '')
+    return '\n'.join(_ws_re.sub(' ', line).strip() for line in text.splitlines())
+
+
+def _ensure_punkt():
+    global _punkt_ready
+    if not _punkt_ready:
+        for pkg in ('punkt', 'punkt_tab'):
+            try:
+                nltk.download(pkg, quiet=True)
+            except Exception:
+                pass
+        _punkt_ready = True
+
+
+def tokenize(text: str) -> List[List[str]]:
+    """Split text into sentences of word tokens (French punkt model)."""
+    _ensure_punkt()
+    return [word_tokenize(s, language='french', preserve_line=True)
+            for s in sent_tokenize(text, language='french')]
+
+
+def sentence_texts(text: str) -> List[str]:
+    """Split text into sentence strings (French punkt model), each on a single line."""
+    _ensure_punkt()
+    return [' '.join(s.split()) for s in sent_tokenize(text, language='french')]
+
+
+def words(doc: Dict) -> List[str]:
+    """Flatten the sentence token lists of a loaded document."""
+    return [w for sent in doc['sents'] for w in sent]
+
+
+def content_hash(raw: bytes) -> str:
+    return hashlib.sha1(raw).hexdigest()
+
+
+def _cache_path(cache_dir: Path, digest: str) -> Path:
+    return cache_dir / digest[:2] / f'{digest}.pkl'
+
+
+def _read_cache(cache_dir: Path, digest: str) -> Optional[Dict]:
+    path = _cache_path(cache_dir, digest)
+    try:
+        with path.open('rb') as f:
+            entry = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if entry.get('version') != CACHE_VERSION:
+        return None
+    return entry
+
+
+def _write_cache(cache_dir: Path, digest: str, entry: Dict):
+    path = _cache_path(cache_dir, digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with tmp.open('wb') as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_manifest(cache_dir=CACHE_DIR) -> Dict:
+    path = Path(cache_dir) / 'manifest.json'
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest: Dict, cache_dir=CACHE_DIR):
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = cache_dir / 'manifest.json.tmp'
+    tmp.write_text(json.dumps(manifest), encoding='utf-8')
+    os.replace(tmp, cache_dir / 'manifest.json')
+
+
+def file_hashes(paths: Iterable, cache_dir=CACHE_DIR) -> Dict[str, str]:
+    """Map file name -> content hash, re-hashing only files whose size/mtime changed."""
+    manifest = load_manifest(cache_dir)
+    hashes = {}
+    changed = False
+    for p in paths:
+        p = Path(p)
+        st = p.stat()
+        stamp = [st.st_size, st.st_mtime_ns]
+        known = manifest.get(p.name)
+        if not known or known[:2] != stamp:
+            known = stamp + [content_hash(p.read_bytes())]
+            manifest[p.name] = known
+            changed = True
+        hashes[p.name] = known[2]
+    if changed:
+        save_manifest(manifest, cache_dir)
+    return hashes
+
+
+def load_document(path, cache_dir=CACHE_DIR, manifest: Optional[Dict] = None, tokenized: bool = True,
+                  variants=None) -> Dict:
+    """Load one corpus file as {'name', 'path', 'hash', 'text', 'sents'}.
+
+    When tokenized is False and the file is not cached yet, 'sents' is None and
+    nothing is written to the cache (decoding only, no NLTK cost). variants (an
+    ocr.VariantMap) rewrites OCR variants in the text before tokenization; those
+    documents are cached under the content hash combined with the map digest.
+    """
+    path = Path(path)
+    cache_dir = Path(cache_dir)
+    st = path.stat()
+    stamp = [st.st_size, st.st_mtime_ns]
+    digest = None
+    if manifest is not None:
+        known = manifest.get(path.name)
+        if known and known[:2] == stamp:
+            digest = known[2]
+
+    raw = None
+    if digest is None:
+        raw = path.read_bytes()
+        digest = content_hash(raw)
+        if manifest is not None:
+            manifest[path.name] = stamp + [digest]
+
+    key = digest if variants is None else content_hash(f'{digest}:{variants.digest}'.encode('ascii'))
+    entry = _read_cache(cache_dir, key)
+    if entry is None:
+        if raw is None:
+            raw = path.read_bytes()
+        text = normalize(decode(raw))
+        if variants is not None:
+            text = variants.apply(text)
+        if not tokenized:
+            return {'name': path.name, 'path': path, 'hash': digest, 'text': text, 'sents': None}
+        entry = {'version': CACHE_VERSION, 'text': text, 'sents': tokenize(text)}
+        _write_cache(cache_dir, key, entry)
+
+    return {'name': path.name, 'path': path, 'hash': digest, 'text': entry['text'], 'sents': entry['sents']}
+
+
+def iter_documents(paths: Iterable, cache_dir=CACHE_DIR, tokenized: bool = True, variants=None) -> Iterator[Dict]:
+    """Yield loaded documents for paths, refreshing the cache manifest at the end."""
+    manifest = load_manifest(cache_dir)
+    try:
+        for p in paths:
+            yield load_document(p, cache_dir=cache_dir, manifest=manifest, tokenized=tokenized, variants=variants)
+    finally:
+        save_manifest(manifest, cache_dir)
+
+
+def load_corpus(paths: Iterable, cache_dir=CACHE_DIR, tokenized: bool = True, variants=None) -> List[Dict]:
+    return list(iter_documents(paths, cache_dir=cache_dir, tokenized=tokenized, variants=variants))
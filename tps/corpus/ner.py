@@ -0,0 +1,161 @@
+"""Batched, multi-process spaCy NER over corpus documents.
+
+Per-document texts are streamed through a single `nlp.pipe(..., n_process=N)`
+call with every pipe except NER (and the tok2vec it listens to) disabled. Long
+pages are cut into chunks below nlp.max_length and re-assembled per document.
+Entity counts are cached per document under data/cache/ner/<model>-<version>/,
+keyed by the content hash from the loader, so years can be processed
+incrementally and re-runs only pay for new or changed files.
+
+Usage (from the repository root):
+    from tps.corpus.ner import load_model, extract, merge, to_rows
+    nlp = load_model()
+    merged = merge(c for _, c in extract(iter_documents(paths, tokenized=False), nlp, n_process=4))
+"""
+import json
+import os
+from collections import Counter, deque
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import spacy
+
+MODEL = 'fr_core_news_md'
+CACHE_DIR = Path('data') / 'cache' / 'ner'
+MAX_CHARS = 200000
+ENTITY_TYPES = {'PER': 'PER', 'ORG': 'ORG', 'MISC': 'ORG', 'LOC': 'LOC', 'GPE': 'LOC'}
+
+
+def load_model(name: str = MODEL):
+    """Load a spaCy model (installing it if missing) with only NER enabled."""
+    try:
+        nlp = spacy.load(name)
+    except Exception:
+        print(f'{name} not found, attempting to install via pip...')
+        import subprocess, sys
+        subprocess.check_call([sys.executable, '-m', 'pip', 'install', name])
+        nlp = spacy.load(name)
+    keep = {'ner'}
+    if 'tok2vec' in nlp.pipe_names:
+        listeners = getattr(nlp.get_pipe('tok2vec'), 'listening_components', [])
+        if 'ner' in listeners:
+            keep.add('tok2vec')
+    nlp.select_pipes(disable=[p for p in nlp.pipe_names if p not in keep])
+    return nlp
+
+
+def split_text(text: str, max_chars: int = MAX_CHARS) -> List[str]:
+    """Cut text into chunks of at most max_chars, preferably on a newline or space."""
+    chunks = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + max_chars, length)
+        if end < length:
+            nxt = text.rfind('\n', start, end)
+            if nxt == -1:
+                nxt = text.rfind(' ', start, end)
+            if nxt > start:
+                end = nxt
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+def doc_entities(doc) -> Counter:
+    """Count (type, text) pairs of a spaCy Doc, with the filters of generate_entities.py."""
+    counts = Counter()
+    for ent in doc.ents:
+        etype = ENTITY_TYPES.get(ent.label_)
+        txt = ent.text.strip()
+        if etype is None or len(txt) <= 1:
+            continue
+        if etype == 'PER' and len(txt) <= 2:
+            continue
+        counts[(etype, txt)] += 1
+    return counts
+
+
+def _cache_path(cache_dir: Path, digest: str) -> Path:
+    return cache_dir / digest[:2] / f'{digest}.json'
+
+
+def _read_cache(cache_dir: Path, digest: str):
+    try:
+        rows = json.loads(_cache_path(cache_dir, digest).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    return Counter({(etype, txt): c for etype, txt, c in rows})
+
+
+def _write_cache(cache_dir: Path, digest: str, counts: Counter):
+    path = _cache_path(cache_dir, digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps([[etype, txt, c] for (etype, txt), c in counts.items()], ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def extract(docs: Iterable[Dict], nlp, n_process: int = 1, batch_size: int = 32,
+            cache_dir=CACHE_DIR, max_chars: int = MAX_CHARS) -> Iterator[Tuple[str, Counter]]:
+    """Yield (name, entity Counter) per loader document, in input order.
+
+    docs are dicts with 'name', 'hash' and 'text' (see loader.iter_documents).
+    Cached documents are yielded without running the model.
+    """
+    meta = nlp.meta
+    cache_dir = Path(cache_dir) / f"{meta.get('lang', '')}_{meta.get('name', MODEL)}-{meta.get('version', '0')}"
+    max_chars = min(nlp.max_length, max_chars)
+    order = deque()  # document indices not yielded yet, in input order
+    info = {}        # index -> (name, hash, fresh)
+    remaining = {}   # index -> chunks still to come back from the model
+    counts = {}      # index -> Counter
+
+    def chunks():
+        for i, doc in enumerate(docs):
+            digest = doc.get('hash')
+            cached = _read_cache(cache_dir, digest) if digest else None
+            order.append(i)
+            info[i] = (doc['name'], digest, cached is None)
+            if cached is not None:
+                counts[i] = cached
+                remaining[i] = 0
+                continue
+            parts = split_text(doc['text'], max_chars) or ['']
+            counts[i] = Counter()
+            remaining[i] = len(parts)
+            for part in parts:
+                yield part, i
+
+    def flush():
+        while order and remaining[order[0]] == 0:
+            i = order.popleft()
+            name, digest, fresh = info.pop(i)
+            del remaining[i]
+            result = counts.pop(i)
+            if fresh and digest:
+                _write_cache(cache_dir, digest, result)
+            yield name, result
+
+    for spacy_doc, i in nlp.pipe(chunks(), as_tuples=True, n_process=n_process, batch_size=batch_size):
+        counts[i].update(doc_entities(spacy_doc))
+        remaining[i] -= 1
+        yield from flush()
+    yield from flush()
+
+
+def merge(counters: Iterable[Counter]) -> Dict[str, Counter]:
+    """Merge per-document (type, text) counters into {'PER': Counter, 'ORG': ..., 'LOC': ...}."""
+    merged = {'PER': Counter(), 'ORG': Counter(), 'LOC': Counter()}
+    for counts in counters:
+        for (etype, txt), c in counts.items():
+            merged[etype][txt] += c
+    return merged
+
+
+def to_rows(merged: Dict[str, Counter]) -> List[Dict]:
+    rows = []
+    for etype in ('PER', 'ORG', 'LOC'):
+        for e, c in sorted(merged[etype].items(), key=lambda kv: kv[1], reverse=True):
+            rows.append({'entity': e, 'type': etype, 'count': c})
+    return rows
@@ -0,0 +1,233 @@
+"""OCR-noise normalization: a learned variant -> canonical map applied while loading documents.
+
+OCR errors ('bruxeiles', 'gouvernernent') and file-name artefacts ('kb_jb838',
+'jb838', see the manual set in tp3/expand_stopwords.py) each become their own
+vocabulary entry in the TF-IDF matrices, wordclouds and Word2Vec models.
+
+learn() builds the map from the corpus vocabulary (termfreq.py):
+
+- canonical forms are the alphabetic terms seen at least min_canonical times;
+- any alphabetic term of min_len+ characters is a variant of its closest
+  canonical form (fuzzy.py, edit distance 1, or 2 for terms of 8+ characters)
+  when that form is at least ratio times more frequent, the match is not
+  ambiguous and the two do not only differ by an inflection (-s, -x, -e, -es);
+  chains (a -> b -> c) are resolved to the final form;
+- file-name artefacts ('kb_jb838') map to '' (dropped), and so do rare
+  (at most MAX_MIXED_COUNT occurrences) words with digits inside letters
+  ('l9l5'); times, units and decades ('14h30', '100km', '1940s', 'v2') are kept.
+
+The map is saved as a reviewable TSV (data/ocr_variants.tsv). VariantMap.apply()
+rewrites a text in one regex pass: the variants are compiled into a trie-shaped
+alternation, so the scan costs the same whatever the number of variants and only
+matches trigger a lookup. The loader applies it when given variants=, caching the
+normalized documents under a key that includes the map digest.
+
+Usage (from the repository root):
+    python -m tps.corpus.ocr learn --min-canonical 20 --ratio 20
+    python -m tps.corpus.ocr apply "Le gouvernernent de Bruxeiles"
+"""
+import argparse
+import csv
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .loader import CACHE_DIR, DATA_TXT
+
+VARIANTS_TSV = Path('data') / 'ocr_variants.tsv'
+MIN_CANONICAL = 20
+RATIO = 20
+MIN_LEN = 5
+LONG_WORD = 8
+MAX_MIXED_COUNT = 5
+INFLECTIONS = ('s', 'x', 'e', 'es')
+FIELDS = ['variant', 'canonical', 'distance', 'variant_count', 'canonical_count']
+
+_artefact_re = re.compile(r'^(?:kb|kb_jb\d+|jb\d+)$')
+# digits between letters ('l9l5', 'gouv3rnement'): OCR confusions of l/1, o/0, e/3...
+_mixed_re = re.compile(r'[^\W\d_]\d+[^\W\d_]')
+# times, units, decades and ordinals are real content ('14h30', '100km', '1940s', '2e')
+_measure_re = re.compile(r'^\d+(?:h\d*|km|kg|kw|mm|cm|m|g|t|l|fr|frs|f|s|e|er|re|me|eme|ème|es|ères?|ers|bis)$')
+
+
+def is_artefact(term: str, count: int = 0) -> bool:
+    """File-name residue, or a rare word with digits inside letters (times and units are kept)."""
+    if _artefact_re.match(term):
+        return True
+    return count <= MAX_MIXED_COUNT and bool(_mixed_re.search(term)) and not _measure_re.match(term)
+
+
+def _inflection(a: str, b: str) -> bool:
+    short, long_ = sorted((a, b), key=len)
+    return long_.startswith(short) and long_[len(short):] in INFLECTIONS
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """Regex alternation of words factored as a trie ('ab|ac' -> 'a(?:b|c)')."""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def walk(node: Dict) -> str:
+        alts = [re.escape(ch) + walk(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ''
+        body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+        if '' in node:
+            return body + '?' if len(alts) == 1 and len(alts[0]) == 1 else '(?:' + '|'.join(alts) + ')?'
+        return body
+
+    return walk(trie)
+
+
+class VariantMap:
+    """variant (lowercase) -> canonical form ('' drops the token)."""
+
+    def __init__(self, mapping: Dict[str, str]):
+        self.mapping = mapping
+        self.digest = hashlib.sha1(json.dumps(sorted(mapping.items())).encode('utf-8')).hexdigest()
+        self._regex = None
+
+    def __len__(self):
+        return len(self.mapping)
+
+    @property
+    def regex(self):
+        if self._regex is None:
+            self._regex = re.compile(r'(?<!\w)(?:' + trie_pattern(self.mapping) + r')(?!\w)', re.IGNORECASE)
+        return self._regex
+
+    def _replace(self, m) -> str:
+        word = m.group()
+        canonical = self.mapping.get(word.lower())
+        if canonical is None:  # case-insensitive match of a form that is not in the map
+            return word
+        if len(word) > 1 and word.isupper():
+            return canonical.upper()
+        return canonical[:1].upper() + canonical[1:] if word[:1].isupper() else canonical
+
+    def apply(self, text: str) -> str:
+        """Rewrite every variant of text in a single regex pass (case of the first letter kept)."""
+        if not self.mapping:
+            return text
+        return self.regex.sub(self._replace, text)
+
+    def apply_tokens(self, tokens: Iterable[str]) -> List[str]:
+        """Map already lowercased tokens, dropping the artefacts."""
+        out = []
+        for t in tokens:
+            t = self.mapping.get(t, t)
+            if t:
+                out.append(t)
+        return out
+
+    def save(self, path=VARIANTS_TSV, rows: Optional[List[Dict]] = None):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rows = rows or [{'variant': v, 'canonical': c} for v, c in sorted(self.mapping.items())]
+        tmp = path.with_name(path.name + '.part')
+        with tmp.open('w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS, delimiter='\t', restval='')
+            writer.writeheader()
+            writer.writerows(rows)
+        tmp.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path=VARIANTS_TSV) -> 'VariantMap':
+        with Path(path).open(encoding='utf-8', newline='') as f:
+            return cls({row['variant']: row['canonical'] or '' for row in csv.DictReader(f, delimiter='\t')})
+
+
+def load_variants(path=VARIANTS_TSV) -> Optional[VariantMap]:
+    """The saved map, or None when it has not been learned yet."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    variants = VariantMap.load(path)
+    print(f'Normalizing {len(variants)} OCR variants from {path}')
+    return variants
+
+
+def learn(terms: np.ndarray, totals: np.ndarray, min_canonical: int = MIN_CANONICAL, ratio: float = RATIO,
+          min_len: int = MIN_LEN) -> Tuple[VariantMap, List[Dict]]:
+    """Learn the variant map from a vocabulary and its corpus counts; returns (map, TSV rows)."""
+    from .fuzzy import FuzzyIndex
+
+    rows = []
+    for i in np.flatnonzero(totals > 0):
+        if is_artefact(terms[i], int(totals[i])):
+            rows.append({'variant': terms[i], 'canonical': '', 'variant_count': int(totals[i])})
+
+    alpha = np.fromiter((t.isalpha() for t in terms), dtype=bool, count=len(terms))
+    canonical = np.flatnonzero(alpha & (totals >= min_canonical))
+    # a variant is at least ratio times rarer than its canonical form
+    rare = np.flatnonzero(alpha & (totals > 0) & (totals * ratio <= totals.max())
+                          & np.fromiter((len(t) >= min_len for t in terms), dtype=bool, count=len(terms)))
+    index = FuzzyIndex.build([terms[i] for i in canonical], totals[canonical], max_distance=2)
+    rare_terms = [terms[i] for i in rare]
+    matches = index.lookup_many(rare_terms)
+    for term, count in zip(rare_terms, totals[rare]):
+        allowed = 1 if len(term) < LONG_WORD else 2
+        cands = [m for m in matches[term] if 0 < m[1] <= allowed and not _inflection(term, m[0])]
+        if not cands:
+            continue
+        best = cands[0]
+        # ambiguous: another form at the same distance with a comparable frequency
+        if len(cands) > 1 and cands[1][1] == best[1] and cands[1][2] * 2 > best[2]:
+            continue
+        if best[2] < ratio * count:
+            continue
+        rows.append({'variant': term, 'canonical': best[0], 'distance': best[1],
+                     'variant_count': int(count), 'canonical_count': best[2]})
+    mapping = {r['variant']: r['canonical'] for r in rows}
+    for r in rows:
+        seen = {r['variant']}
+        while r['canonical'] in mapping and r['canonical'] not in seen:
+            seen.add(r['canonical'])
+            r['canonical'] = mapping[r['canonical']]
+    rows.sort(key=lambda r: (r['canonical'], r['variant']))
+    return VariantMap({r['variant']: r['canonical'] for r in rows}), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Learn / apply the OCR variant normalization map.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('learn', help='Learn the map from the corpus vocabulary')
+    p.add_argument('--txt-dir', default=str(DATA_TXT))
+    p.add_argument('--min-canonical', type=int, default=MIN_CANONICAL)
+    p.add_argument('--ratio', type=float, default=RATIO, help='Canonical form at least this many times more frequent')
+    p.add_argument('--min-len', type=int, default=MIN_LEN)
+    p.add_argument('--out', default=str(VARIANTS_TSV))
+    p = sub.add_parser('apply', help='Normalize a text given on the command line')
+    p.add_argument('text')
+    p.add_argument('--map', default=str(VARIANTS_TSV))
+    args = parser.parse_args()
+
+    if args.command == 'apply':
+        print(VariantMap.load(args.map).apply(args.text))
+        return
+    from .termfreq import TermCounts
+
+    start = time.perf_counter()
+    counts = TermCounts.open(args.txt_dir, cache_dir=CACHE_DIR)
+    totals = counts.totals()
+    variants, rows = learn(counts.terms, totals, args.min_canonical, args.ratio, args.min_len)
+    variants.save(args.out, rows)
+    vocab = int(np.count_nonzero(totals))
+    dropped = sum(r['variant_count'] for r in rows if not r['canonical'])
+    merged = sum(r['variant_count'] for r in rows if r['canonical'])
+    print(f'{len(rows)} variants: vocabulary {vocab} -> {vocab - len(rows)} terms, {merged} tokens normalized, '
+          f'{dropped} artefact tokens dropped ({time.perf_counter() - start:.1f}s). Saved {args.out}')
+
+
+if __name__ == '__main__':
+    main()
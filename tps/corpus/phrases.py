@@ -0,0 +1,131 @@
+"""Streaming bigram/trigram detection (gensim Phrases) that writes the phrased corpus to disk.
+
+module4/s3_word_embeddings.ipynb re-ran unidecode + wordpunct_tokenize on every
+line for each Phrases pass and then built list(trigram[bigram[sentences]]) in
+RAM. Here:
+
+1. the sentences file is normalised once; the token stream is cached under
+   data/cache/phrases/<name>-<path hash>.tokens.txt (one cache per input file,
+   even for homonyms such as data/sents.txt and tp3/sents.txt) and the bigram
+   Phrases are learned in that same pass (reused while the source file is unchanged);
+2. trigrams are learned from the cached tokens (split only, no re-tokenizing);
+3. trigram[bigram[...]] is streamed to <out_dir>/<name>.phrased.txt, a
+   LineSentence file to train Word2Vec with corpus_file=... (see embeddings.py).
+
+The frozen phrasers are saved next to it (<name>.bigrams.phr, <name>.trigrams.phr).
+
+Usage (from the repository root):
+    python -m tps.corpus.phrases data/txt/sents.txt --out-dir data/phrases
+"""
+import argparse
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from gensim.models.phrases import Phrases
+from gensim.models.word2vec import LineSentence
+from nltk.tokenize import wordpunct_tokenize
+from unidecode import unidecode
+
+from .embeddings import SentenceFile
+
+CACHE_DIR = Path('data') / 'cache' / 'phrases'
+OUT_DIR = Path('data') / 'phrases'
+MIN_COUNT = 5
+THRESHOLD = 10.0
+
+
+def tokenize_line(line: str) -> List[str]:
+    """Lowercase, wordpunct-tokenize and transliterate one line (as MySentences did)."""
+    return [unidecode(w.lower()) for w in wordpunct_tokenize(line)]
+
+
+def _stamp(path: Path) -> List[int]:
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def token_cache(infile: Path, cache_dir=CACHE_DIR) -> Path:
+    """Token cache of infile, keyed by its name and a hash of its resolved path."""
+    digest = hashlib.sha1(str(Path(infile).resolve()).encode('utf-8')).hexdigest()[:12]
+    return Path(cache_dir) / f'{Path(infile).stem}-{digest}.tokens.txt'
+
+
+def _normalized(infile: Path, out: SentenceFile) -> Iterator[List[str]]:
+    """Yield the tokens of each line of infile, writing them to out on the way."""
+    with infile.open(encoding='utf-8', errors='backslashreplace') as f:
+        for line in f:
+            tokens = tokenize_line(line)
+            if out.write(tokens):
+                yield tokens
+
+
+def learn_bigrams(infile, cache_dir=CACHE_DIR, min_count: int = MIN_COUNT, threshold: float = THRESHOLD):
+    """Learn bigram Phrases; returns (Phrases, cached tokens file).
+
+    The token cache is written during the same pass, or read instead of infile
+    when it is up to date.
+    """
+    infile = Path(infile)
+    tokens_file = token_cache(infile, cache_dir)
+    stamp_file = tokens_file.with_suffix('.json')
+    try:
+        fresh = json.loads(stamp_file.read_text(encoding='utf-8')) == _stamp(infile) and tokens_file.exists()
+    except (OSError, ValueError):
+        fresh = False
+    if fresh:
+        print('Using cached tokens', tokens_file)
+        return Phrases(LineSentence(str(tokens_file)), min_count=min_count, threshold=threshold), tokens_file
+    with SentenceFile(tokens_file) as out:
+        bigrams = Phrases(_normalized(infile, out), min_count=min_count, threshold=threshold)
+    stamp_file.write_text(json.dumps(_stamp(infile)), encoding='utf-8')
+    print(f'Cached {out.n_sents} tokenized sentences ({out.n_words} tokens) to {tokens_file}')
+    return bigrams, tokens_file
+
+
+def build(infile, out_dir=OUT_DIR, cache_dir=CACHE_DIR, min_count: int = MIN_COUNT,
+          threshold: float = THRESHOLD) -> Dict[str, Path]:
+    """Detect bigrams and trigrams of infile and write the phrased corpus; returns the output paths."""
+    infile = Path(infile)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    bigrams, tokens_file = learn_bigrams(infile, cache_dir, min_count, threshold)
+    bigram_phraser = bigrams.freeze()
+    del bigrams
+    print(f'Bigrams: {len(bigram_phraser.phrasegrams)} phrases ({time.perf_counter() - start:.1f}s)')
+
+    trigram_phraser = Phrases(bigram_phraser[LineSentence(str(tokens_file))],
+                              min_count=min_count, threshold=threshold).freeze()
+    print(f'Trigrams: {len(trigram_phraser.phrasegrams)} phrases ({time.perf_counter() - start:.1f}s)')
+
+    paths = {
+        'tokens': tokens_file,
+        'bigrams': out_dir / f'{infile.stem}.bigrams.phr',
+        'trigrams': out_dir / f'{infile.stem}.trigrams.phr',
+        'phrased': out_dir / f'{infile.stem}.phrased.txt',
+    }
+    bigram_phraser.save(str(paths['bigrams']))
+    trigram_phraser.save(str(paths['trigrams']))
+    with SentenceFile(paths['phrased']) as out:
+        for sent in LineSentence(str(tokens_file)):
+            out.write(trigram_phraser[bigram_phraser[sent]])
+    print(f"Wrote {out.n_sents} phrased sentences to {paths['phrased']} ({time.perf_counter() - start:.1f}s)")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bigram/trigram detection writing a phrased LineSentence corpus.')
+    parser.add_argument('infile', help='One sentence per line, e.g. data/txt/sents.txt')
+    parser.add_argument('--out-dir', default=str(OUT_DIR))
+    parser.add_argument('--min-count', type=int, default=MIN_COUNT)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args()
+    build(args.infile, args.out_dir, min_count=args.min_count, threshold=args.threshold)
+
+
+if __name__ == '__main__':
+    main()
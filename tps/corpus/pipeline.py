@@ -0,0 +1,190 @@
+"""Content-addressed DAG runner: stages rerun only when their inputs or parameters change.
+
+A Stage declares its dependencies, its parameters and a function
+fn(inputs, params, out_dir) -> dict. Its key is the SHA-1 of (stage name,
+version, parameters, keys of its dependencies, and an optional fingerprint of
+external inputs such as the content hashes of the selected corpus files), so
+keys are known before anything runs. Outputs live in
+<cache>/<stage>/<key>/ (written to a .part directory, renamed on success)
+together with result.json, the dict returned by fn; a stage whose directory
+exists is up to date and is skipped. Results list the files worth keeping
+under 'outputs'; for published stages these are copied to an output directory
+(e.g. tp3/) after the run.
+
+Stages are scheduled as soon as their dependencies finish, up to `jobs` at a
+time in a thread pool (the heavy work -- sklearn, gensim, wordcloud process
+pools -- releases the GIL). A failing stage only skips its dependents.
+
+Usage: see tps/tp3/pipeline.py.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+CACHE_DIR = Path('data') / 'cache' / 'pipeline'
+RESULT = 'result.json'
+
+
+class Stage:
+    """One node of the pipeline."""
+
+    def __init__(self, name: str, fn: Callable[[Dict, Dict, Path], Dict], deps: Iterable[str] = (),
+                 params: Optional[Dict] = None, version: int = 1, fingerprint: Callable[[Dict], str] = None,
+                 publish: bool = False):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.params = params or {}
+        self.version = version
+        self.fingerprint = fingerprint
+        self.publish = publish
+
+
+def _digest(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class Pipeline:
+    """A DAG of stages with content-addressed outputs under cache_dir."""
+
+    def __init__(self, stages: Iterable[Stage], cache_dir=CACHE_DIR):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f'Duplicate stage {stage.name!r}')
+            missing = [d for d in stage.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f'Stage {stage.name!r} depends on undeclared {missing} (declare stages in order)')
+            self.stages[stage.name] = stage
+        self.cache_dir = Path(cache_dir)
+        self._keys: Dict[str, str] = {}
+
+    def keys(self) -> Dict[str, str]:
+        """Key of every stage, computed from parameters and dependency keys (nothing is run)."""
+        if not self._keys:
+            for name, stage in self.stages.items():
+                self._keys[name] = _digest({
+                    'stage': name,
+                    'version': stage.version,
+                    'params': stage.params,
+                    'deps': {d: self._keys[d] for d in stage.deps},
+                    'external': stage.fingerprint(stage.params) if stage.fingerprint else None,
+                })
+        return self._keys
+
+    def path(self, name: str) -> Path:
+        return self.cache_dir / name / self.keys()[name][:16]
+
+    def done(self, name: str) -> bool:
+        return (self.path(name) / RESULT).exists()
+
+    def result(self, name: str) -> Dict:
+        """Result dict of a finished stage; '_dir' points at its output directory."""
+        result = json.loads((self.path(name) / RESULT).read_text(encoding='utf-8'))
+        result['_dir'] = str(self.path(name))
+        return result
+
+    def needed(self, targets: Iterable[str] = None) -> List[str]:
+        """targets (default: every stage) and all their ancestors, in declaration order."""
+        needed, stack = set(), list(targets or self.stages)
+        while stack:
+            name = stack.pop()
+            if name not in self.stages:
+                raise KeyError(f'Unknown stage {name!r}, expected one of {list(self.stages)}')
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.stages[name].deps)
+        return [n for n in self.stages if n in needed]
+
+    def plan(self, targets: Iterable[str] = None, force: Iterable[str] = ()) -> List[str]:
+        """Stages that must run to produce targets: missing, forced, or downstream of one that reruns."""
+        force = set(force)
+        stale = []
+        for name in self.needed(targets):
+            if name in force or not self.done(name) or any(d in stale for d in self.stages[name].deps):
+                stale.append(name)
+        return stale
+
+    def _run_stage(self, name: str) -> float:
+        stage = self.stages[name]
+        out = self.path(name)
+        tmp = out.with_name(out.name + '.part')
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        start = time.perf_counter()
+        inputs = {d: self.result(d) for d in stage.deps}
+        result = stage.fn(inputs, dict(stage.params), tmp) or {}
+        (tmp / RESULT).write_text(json.dumps(result, default=str, indent=1), encoding='utf-8')
+        shutil.rmtree(out, ignore_errors=True)
+        os.replace(tmp, out)
+        return time.perf_counter() - start
+
+    def run(self, targets: Iterable[str] = None, force: Iterable[str] = (), jobs: int = None) -> Dict[str, str]:
+        """Run the stale stages, independent ones in parallel; returns name -> 'cached' | 'ran' | 'failed' | 'skipped'."""
+        todo = self.plan(targets, force)
+        status = {n: 'cached' for n in self.needed(targets) if n not in todo}
+        for name in status:
+            print(f'[{name}] up to date ({self.path(name)})')
+        pending = list(todo)
+        running = {}
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = self.stages[name].deps
+                    if any(status.get(d) in ('failed', 'skipped') for d in deps):
+                        status[name] = 'skipped'
+                        pending.remove(name)
+                        print(f'[{name}] skipped (a dependency failed)')
+                    elif all(status.get(d) in ('cached', 'ran') for d in deps):
+                        pending.remove(name)
+                        print(f'[{name}] running')
+                        running[pool.submit(self._run_stage, name)] = name
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        elapsed = future.result()
+                        status[name] = 'ran'
+                        print(f'[{name}] done in {elapsed:.1f}s')
+                    except Exception:
+                        status[name] = 'failed'
+                        print(f'[{name}] failed:\n{traceback.format_exc()}')
+        return status
+
+    def publish(self, out_dir, names: Iterable[str] = None) -> List[Path]:
+        """Copy the 'outputs' of finished published stages to out_dir (unless already identical)."""
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        copied = []
+        for name in names or self.stages:
+            if not self.stages[name].publish or not self.done(name):
+                continue
+            for output in self.result(name).get('outputs', []):
+                src, dst = self.path(name) / output, out_dir / output
+                if dst.exists() and dst.stat().st_size == src.stat().st_size \
+                        and dst.stat().st_mtime_ns == src.stat().st_mtime_ns:
+                    continue
+                shutil.copy2(src, dst)
+                copied.append(dst)
+        return copied
+
+    def prune(self) -> List[Path]:
+        """Delete cached outputs of earlier keys (other parameter sets / corpus states)."""
+        removed = []
+        for name in self.stages:
+            keep = self.path(name).name
+            stage_dir = self.cache_dir / name
+            if stage_dir.exists():
+                for d in stage_dir.iterdir():
+                    if d.name != keep:
+                        shutil.rmtree(d, ignore_errors=True)
+                        removed.append(d)
+        return removed
@@ -0,0 +1,286 @@
+"""Corpus-level sentiment: every sentence of a selection, batched, cached and timed.
+
+module3/s4_sentiment.ipynb scores single strings and tps/tp2/sentiment_1955.csv
+used to come from a 10-sentence sample. This stage scores all sentences of the
+selected documents with one of two backends:
+
+- 'transformer': tblard/tf-allocine (TF CamemBERT fine-tuned on Allociné).
+  Sentences are sorted by length and batched so that each padded batch holds
+  sentences of similar length (length buckets), and truncated to max_length tokens.
+- 'pattern': textblob-fr's PatternAnalyzer (lexicon based) over a process pool,
+  much faster, used as the fallback when transformers/tensorflow are missing.
+
+Scores are memoised per sentence in data/cache/sentiment.sqlite (keyed by
+backend + sentence), so re-running a year or an overlapping selection only
+scores new sentences. Documents are processed in chunks and rows are appended
+to the output CSV, so memory does not grow with the selection; a per-document
+summary (mean polarity, positive/negative shares) is written next to it.
+
+Usage (from the repository root):
+    python -m tps.corpus.sentiment --year 1955 --backend pattern
+    python -m tps.corpus.sentiment --year 1955 --backend transformer --batch-size 64 --max-length 128
+"""
+import argparse
+import csv
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from .loader import DATA_TXT, iter_documents, sentence_texts
+
+MODEL = 'tblard/tf-allocine'
+CACHE_PATH = Path('data') / 'cache' / 'sentiment.sqlite'
+BATCH_SIZE = 32
+MAX_LENGTH = 128
+MIN_CHARS = 3
+CHUNK_SENTENCES = 20000
+FIELDS = ['filename', 'sentence_id', 'sentence', 'label', 'score', 'polarity', 'subjectivity']
+DOC_FIELDS = ['filename', 'sentences', 'mean_polarity', 'positive_share', 'negative_share']
+
+# (label, score, polarity, subjectivity); subjectivity is None for the transformer
+Score = Tuple[str, float, float, object]
+
+_transformer = None
+_analyzer = None
+
+
+class SentimentCache:
+    """SQLite memo of sentence scores keyed by sha1(backend + sentence)."""
+
+    def __init__(self, path=CACHE_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path))
+        self.db.execute('CREATE TABLE IF NOT EXISTS scores '
+                        '(key TEXT PRIMARY KEY, label TEXT, score REAL, polarity REAL, subjectivity REAL)')
+        self.db.commit()
+
+    @staticmethod
+    def key(backend: str, text: str) -> str:
+        return hashlib.sha1(f'{backend}\x00{text}'.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Score]:
+        found = {}
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ','.join('?' * len(chunk))
+            for row in self.db.execute(f'SELECT * FROM scores WHERE key IN ({marks})', chunk):
+                found[row[0]] = tuple(row[1:])
+        return found
+
+    def put_many(self, items: Dict[str, Score]):
+        self.db.executemany('INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)',
+                            [(k, *v) for k, v in items.items()])
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+def _backend_key(backend: str, max_length: int) -> str:
+    return f'{MODEL}@{max_length}' if backend == 'transformer' else 'pattern'
+
+
+def resolve_backend(backend: str = 'auto') -> str:
+    """'auto' picks the transformer when transformers + tensorflow are importable, else pattern."""
+    if backend != 'auto':
+        return backend
+    try:
+        import tensorflow  # noqa: F401
+        import transformers  # noqa: F401
+        return 'transformer'
+    except ImportError:
+        print('transformers/tensorflow not available, falling back to PatternAnalyzer')
+        return 'pattern'
+
+
+def _load_transformer():
+    global _transformer
+    if _transformer is None:
+        from transformers import AutoTokenizer, TFAutoModelForSequenceClassification
+        tokenizer = AutoTokenizer.from_pretrained(MODEL, use_pt=False)
+        model = TFAutoModelForSequenceClassification.from_pretrained(MODEL)
+        labels = {i: str(l).upper() for i, l in model.config.id2label.items()}
+        pos = next((i for i, l in labels.items() if l.startswith('POS')), 1)
+        neg = next((i for i, l in labels.items() if l.startswith('NEG')), 0)
+        _transformer = (tokenizer, model, pos, neg)
+    return _transformer
+
+
+def _transformer_scores(texts: List[str], batch_size: int, max_length: int) -> List[Score]:
+    """Score texts in length-sorted padded batches; output aligned with texts."""
+    import tensorflow as tf
+    tokenizer, model, pos, neg = _load_transformer()
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    out = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        enc = tokenizer([texts[i] for i in idx], padding=True, truncation=True,
+                        max_length=max_length, return_tensors='tf')
+        probs = tf.nn.softmax(model(enc, training=False).logits, axis=-1).numpy()
+        for i, p in zip(idx, probs):
+            polarity = float(p[pos] - p[neg])
+            out[i] = ('POSITIVE' if polarity >= 0 else 'NEGATIVE', float(p.max()), polarity, None)
+    return out
+
+
+def _init_pattern():
+    global _analyzer
+    from textblob_fr import PatternAnalyzer
+    _analyzer = PatternAnalyzer()
+
+
+def _pattern_chunk(texts: List[str]) -> List[Score]:
+    out = []
+    for text in texts:
+        polarity, subjectivity = _analyzer.analyze(text)[:2]
+        label = 'POSITIVE' if polarity > 0 else 'NEGATIVE' if polarity < 0 else 'NEUTRAL'
+        out.append((label, abs(float(polarity)), float(polarity), float(subjectivity)))
+    return out
+
+
+def pattern_pool(workers: int = None) -> ProcessPoolExecutor:
+    """Process pool for the pattern backend; each worker loads PatternAnalyzer once."""
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_pattern)
+
+
+def score(texts: List[str], backend: str, cache: SentimentCache = None, batch_size: int = BATCH_SIZE,
+          max_length: int = MAX_LENGTH, workers: int = None,
+          pool: ProcessPoolExecutor = None) -> Tuple[List[Score], int]:
+    """Score texts with backend ('transformer' or 'pattern'); returns (scores, number computed).
+
+    With the pattern backend, pass a pattern_pool() to reuse it across calls
+    (otherwise a pool is started, and its analyzers loaded, for this call only).
+    """
+    bkey = _backend_key(backend, max_length)
+    keys = [SentimentCache.key(bkey, t) for t in texts]
+    known = cache.get_many(list(set(keys))) if cache is not None else {}
+    todo = {}
+    for k, t in zip(keys, texts):
+        if k not in known and k not in todo:
+            todo[k] = t
+    if todo:
+        todo_keys, todo_texts = list(todo), list(todo.values())
+        if backend == 'transformer':
+            new = _transformer_scores(todo_texts, batch_size, max_length)
+        else:
+            step = max(1, len(todo_texts) // (4 * (workers or os.cpu_count() or 1)) + 1)
+            chunks = [todo_texts[i:i + step] for i in range(0, len(todo_texts), step)]
+            if pool is None:
+                with pattern_pool(workers) as own:
+                    new = [s for part in own.map(_pattern_chunk, chunks) for s in part]
+            else:
+                new = [s for part in pool.map(_pattern_chunk, chunks) for s in part]
+        fresh = dict(zip(todo_keys, new))
+        if cache is not None:
+            cache.put_many(fresh)
+        known.update(fresh)
+    return [known[k] for k in keys], len(todo)
+
+
+def iter_sentences(paths: Iterable, min_chars: int = MIN_CHARS) -> Iterator[Tuple[str, int, str]]:
+    """Yield (file name, sentence number, sentence) for every sentence of the documents."""
+    for doc in iter_documents(paths, tokenized=False):
+        for i, sent in enumerate(sentence_texts(doc['text'])):
+            if len(sent) >= min_chars:
+                yield doc['name'], i, sent
+
+
+def _fmt(value):
+    return '' if value is None else round(value, 4)
+
+
+def run(paths: Iterable, out_csv, backend: str = 'auto', batch_size: int = BATCH_SIZE,
+        max_length: int = MAX_LENGTH, min_chars: int = MIN_CHARS, workers: int = None,
+        cache_path=CACHE_PATH) -> Dict[str, Dict]:
+    """Score every sentence of paths into out_csv (+ <out>_docs.csv); returns the per-document summary."""
+    backend = resolve_backend(backend)
+    out_csv = Path(out_csv)
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    docs_csv = out_csv.with_name(out_csv.stem + '_docs.csv')
+    cache = SentimentCache(cache_path)
+    # one pool for the whole run: the analyzers are loaded once per worker, not once per chunk
+    pool = pattern_pool(workers) if backend == 'pattern' else None
+    summary = {}
+    total = computed = 0
+    start = time.perf_counter()
+
+    def flush(rows, writer):
+        nonlocal total, computed
+        scores, n_new = score([r[2] for r in rows], backend, cache, batch_size, max_length, workers, pool)
+        for (name, sid, sent), (label, sc, polarity, subjectivity) in zip(rows, scores):
+            writer.writerow([name, sid, sent, label, _fmt(sc), _fmt(polarity), _fmt(subjectivity)])
+            doc = summary.setdefault(name, {'filename': name, 'sentences': 0, 'polarity': 0.0, 'pos': 0, 'neg': 0})
+            doc['sentences'] += 1
+            doc['polarity'] += polarity
+            doc['pos'] += label == 'POSITIVE'
+            doc['neg'] += label == 'NEGATIVE'
+        total += len(rows)
+        computed += n_new
+        elapsed = time.perf_counter() - start
+        print(f'{total} sentences scored ({computed} computed, {total - computed} cached), '
+              f'{total / max(elapsed, 1e-9):,.0f} sentences/s')
+
+    try:
+        with out_csv.open('w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            rows = []
+            for row in iter_sentences(paths, min_chars):
+                rows.append(row)
+                if len(rows) >= CHUNK_SENTENCES:
+                    flush(rows, writer)
+                    rows = []
+            if rows:
+                flush(rows, writer)
+    finally:
+        cache.close()
+        if pool is not None:
+            pool.shutdown()
+
+    with docs_csv.open('w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(DOC_FIELDS)
+        for name in sorted(summary):
+            d = summary[name]
+            n = d['sentences']
+            writer.writerow([name, n, round(d['polarity'] / n, 4), round(d['pos'] / n, 4), round(d['neg'] / n, 4)])
+    elapsed = time.perf_counter() - start
+    print(f'[{backend}] {total} sentences from {len(summary)} documents in {elapsed:.1f}s '
+          f'({total / max(elapsed, 1e-9):,.0f} sentences/s). Saved {out_csv} and {docs_csv}')
+    return summary
+
+
+def main():
+    from .index import CorpusIndex
+
+    parser = argparse.ArgumentParser(description='Sentiment of every sentence of a corpus selection.')
+    parser.add_argument('--txt-dir', default=str(DATA_TXT))
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--year', type=int)
+    group.add_argument('--decade', type=int)
+    parser.add_argument('--newspaper', default=None, help='e.g. JB838 (Le Soir) or JB427 (La Libre Belgique)')
+    parser.add_argument('--backend', choices=['auto', 'transformer', 'pattern'], default='auto')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--max-length', type=int, default=MAX_LENGTH, help='Transformer truncation, in tokens')
+    parser.add_argument('--min-chars', type=int, default=MIN_CHARS)
+    parser.add_argument('--workers', '-j', type=int, default=None, help='PatternAnalyzer processes')
+    parser.add_argument('--out', default=None, help='Default: tps/tp2/sentiment_<year or decade>.csv')
+    args = parser.parse_args()
+
+    index = CorpusIndex.open(args.txt_dir)
+    if args.year is not None:
+        names, label = index.year(args.year, args.newspaper), str(args.year)
+    else:
+        names, label = index.decade(args.decade, args.newspaper), f'{args.decade}s'
+    out = args.out or Path('tps') / 'tp2' / f'sentiment_{label}.csv'
+    run(index.paths(names), out, backend=args.backend, batch_size=args.batch_size,
+        max_length=args.max_length, min_chars=args.min_chars, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Streaming, memory-bounded construction of data/all.txt and data/sents.txt.
+
+build_all_txt() concatenates corpus files in fixed-size chunks (utf-8 with a
+latin-1 fallback decided per file) instead of reading whole files into memory.
+split_sentences() reads all.txt line by line and writes one sentence per line
+through a buffered writer, so memory stays constant whatever the input size
+(the LIMIT of utils/sentence_tokenizer.ipynb becomes optional). With workers > 1
+the input is cut into newline-aligned byte ranges that are sentence-split in
+parallel and then concatenated in order.
+
+Usage (from the repository root):
+    python -m tps.corpus.stream all --year 1955
+    python -m tps.corpus.stream sents --workers 4
+"""
+import argparse
+import codecs
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+from .loader import DATA_TXT, list_files
+
+ALL_TXT = Path('data') / 'all.txt'
+SENTS_TXT = Path('data') / 'sents.txt'
+CHUNK_SIZE = 1 << 20
+WRITE_BUFFER = 1 << 20
+
+
+def _copy_decoded(src, out, encoding: str, chunk_size: int):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in iter(lambda: src.read(chunk_size), b''):
+        out.write(decoder.decode(chunk).encode('utf-8'))
+    out.write(decoder.decode(b'', final=True).encode('utf-8'))
+
+
+def append_file(path, out, chunk_size: int = CHUNK_SIZE) -> str:
+    """Append path to the binary stream out as utf-8; returns the source encoding used.
+
+    Files that are not valid utf-8 are rewound and re-copied as latin-1, like the
+    read_text() fallback of the loader.
+    """
+    start = out.tell()
+    with open(path, 'rb') as src:
+        try:
+            _copy_decoded(src, out, 'utf-8', chunk_size)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            out.seek(start)
+            out.truncate()
+            src.seek(0)
+            _copy_decoded(src, out, 'latin-1', chunk_size)
+            return 'latin-1'
+
+
+def build_all_txt(paths: Iterable, out_path=ALL_TXT, chunk_size: int = CHUNK_SIZE) -> int:
+    """Concatenate paths into out_path, one newline between files. Returns the file count."""
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with open(out_path, 'wb') as out:
+        for p in paths:
+            try:
+                append_file(p, out, chunk_size)
+            except OSError as e:
+                print('Failed to read', p, ':', e)
+                continue
+            out.write(b'\n')
+            count += 1
+    return count
+
+
+def iter_lines(path, start: int = 0, end: int = None) -> Iterator[str]:
+    """Yield the decoded lines of path lying in the byte range [start, end)."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        pos = start
+        for raw in f:
+            if end is not None and pos >= end:
+                break
+            pos += len(raw)
+            yield raw.decode('utf-8', errors='backslashreplace')
+
+
+def iter_sentences(lines: Iterable[str]) -> Iterator[str]:
+    from nltk.tokenize import sent_tokenize
+    from .loader import _ensure_punkt
+
+    _ensure_punkt()
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        for sent in sent_tokenize(line, language='french'):
+            yield sent
+
+
+def _split_range(args: Tuple[str, int, int, str, int]) -> int:
+    in_path, start, end, out_path, limit = args
+    n = 0
+    with open(out_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as out:
+        lines = iter_lines(in_path, start, end)
+        for i, line in enumerate(lines):
+            if limit is not None and i >= limit:
+                break
+            for sent in iter_sentences([line]):
+                out.write(sent + '\n')
+                n += 1
+    return n
+
+
+def shard_offsets(path, n_shards: int) -> List[Tuple[int, int]]:
+    """Cut path into n_shards newline-aligned [start, end) byte ranges."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for k in range(1, n_shards):
+            target = max(size * k // n_shards, bounds[-1])
+            f.seek(target)
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def split_sentences(in_path=ALL_TXT, out_path=SENTS_TXT, workers: int = 1, limit: int = None) -> int:
+    """Write one sentence per line of in_path to out_path. Returns the sentence count.
+
+    limit caps the number of input lines (per shard when workers > 1).
+    """
+    in_path, out_path = Path(in_path), Path(out_path)
+    if workers <= 1:
+        return _split_range((str(in_path), 0, None, str(out_path), limit))
+
+    ranges = shard_offsets(in_path, workers)
+    parts = [f'{out_path}.part{k}' for k in range(len(ranges))]
+    jobs = [(str(in_path), a, b, part, limit) for (a, b), part in zip(ranges, parts)]
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            total = sum(pool.map(_split_range, jobs))
+        with open(out_path, 'wb') as out:
+            for part in parts:
+                with open(part, 'rb') as src:
+                    shutil.copyfileobj(src, out, CHUNK_SIZE)
+    finally:
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build data/all.txt and data/sents.txt with bounded memory.')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_all = sub.add_parser('all', help='Concatenate data/txt files into all.txt')
+    p_all.add_argument('--txt-dir', default=str(DATA_TXT))
+    p_all.add_argument('--out', default=str(ALL_TXT))
+    p_all.add_argument('--year', type=int, default=None, help='Only include files of this year')
+    p_sents = sub.add_parser('sents', help='Split all.txt into one sentence per line')
+    p_sents.add_argument('--infile', default=str(ALL_TXT))
+    p_sents.add_argument('--out', default=str(SENTS_TXT))
+    p_sents.add_argument('--workers', '-j', type=int, default=1)
+    p_sents.add_argument('--limit', type=int, default=None, help='Max input lines (per shard)')
+    args = parser.parse_args()
+
+    if args.cmd == 'all':
+        if args.year is None:
+            paths = list_files(args.txt_dir)
+        else:
+            from .index import CorpusIndex
+            index = CorpusIndex.open(args.txt_dir)
+            paths = index.paths(index.year(args.year))
+        n = build_all_txt(paths, args.out)
+        print(f'Wrote {n} files into {args.out}')
+    else:
+        n = split_sentences(args.infile, args.out, workers=args.workers, limit=args.limit)
+        print(f'Wrote {n} sentences into {args.out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""Compressed document x term count matrix with group-by over the file-name metadata.
+
+module2/s3_freq.ipynb built an nltk.FreqDist over a truncated all.txt, and the
+per-year / per-newspaper frequency charts recount tokens every time. The
+positional index (inverted.py) already holds every (term, document, count):
+its postings are the columns of a CSC matrix. This module turns them into a
+CSR documents x terms matrix and persists it with the vocabulary in
+data/cache/termfreq_<dir>/ (counts.npz, compressed, + meta.json). It is rebuilt
+when the corpus fingerprint changes.
+
+Frequencies, hapaxes and time series are then matrix operations: a boolean
+document mask (date range, newspaper) selects rows, a vocabulary mask (length,
+alphabetic, stopwords) selects columns, and group_by() multiplies by a sparse
+group indicator (year, decade, month, newspaper) to get counts per group.
+
+Usage (from the repository root):
+    python -m tps.corpus.termfreq top -n 20 --from 1940 --to 1945 --stopwords
+    python -m tps.corpus.termfreq series aviation guerre --by year --newspaper JB838
+    python -m tps.corpus.termfreq hapax -n 30
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from .clustering import top_k
+from .index import _bounds, parse_name
+from .inverted import InvertedIndex, fingerprint
+from .loader import CACHE_DIR, DATA_TXT, file_hashes, list_files
+
+STORE_VERSION = 1
+GROUPS = ('year', 'decade', 'month', 'date', 'newspaper')
+
+
+def default_path(data_dir=DATA_TXT) -> Path:
+    data_dir = Path(data_dir)
+    return data_dir.parent / 'cache' / f'termfreq_{data_dir.name}'
+
+
+def from_index(index: InvertedIndex) -> Tuple[sp.csr_matrix, List[str]]:
+    """(documents x terms CSR counts, sorted terms) from the postings of a positional index."""
+    counts = np.diff(np.asarray(index.post_ptr)).astype(np.int32)
+    csc = sp.csc_matrix((counts, np.asarray(index.post_docs, dtype=np.int32), np.asarray(index.term_post)),
+                        shape=(len(index), len(index.lexicon)))
+    terms = [index.lexicon[i] for i in range(len(index.lexicon))]
+    return csc.tocsr(), terms
+
+
+def build(data_dir=DATA_TXT, path=None, cache_dir=CACHE_DIR) -> Path:
+    """Build the store of data_dir from its (up to date) positional index; returns its directory."""
+    path = Path(path) if path else default_path(data_dir)
+    start = time.perf_counter()
+    index = InvertedIndex.open(data_dir, cache_dir=cache_dir)
+    matrix, terms = from_index(index)
+    path.mkdir(parents=True, exist_ok=True)
+    tmp = path / 'counts.part.npz'
+    sp.save_npz(str(tmp), matrix, compressed=True)
+    os.replace(tmp, path / 'counts.npz')
+    meta = path / 'meta.json'
+    meta.with_suffix('.tmp').write_text(json.dumps({
+        'version': STORE_VERSION,
+        'fingerprint': index.fingerprint,
+        'names': index.names,
+        'terms': terms,
+    }), encoding='utf-8')
+    os.replace(meta.with_suffix('.tmp'), meta)
+    print(f'Saved {matrix.shape[0]} x {matrix.shape[1]} counts ({matrix.nnz} non-zero) to {path} '
+          f'({time.perf_counter() - start:.1f}s)')
+    return path
+
+
+class TermCounts:
+    """Documents x terms count matrix with the metadata parsed from the file names."""
+
+    def __init__(self, matrix: sp.csr_matrix, terms: List[str], names: List[str], fingerprint: str = None):
+        self.matrix = matrix
+        self.terms = np.array(terms, dtype=object)  # fixed-width str would pad every term to the longest OCR token
+        self.names = names
+        self.fingerprint = fingerprint
+        metas = [parse_name(n) or {} for n in names]
+        date = np.array([m.get('date', '') for m in metas], dtype=str)
+        year = np.array([m.get('year', 0) for m in metas], dtype=np.int32)
+        self.keys = {
+            'date': date,
+            'month': np.array([d[:7] for d in date], dtype=str),
+            'year': year,
+            'decade': year - year % 10,
+            'newspaper': np.array([m.get('newspaper', '') for m in metas], dtype=str),
+        }
+        self.doc_lengths = np.asarray(matrix.sum(axis=1)).ravel()
+
+    @classmethod
+    def load(cls, path) -> 'TermCounts':
+        path = Path(path)
+        meta = json.loads((path / 'meta.json').read_text(encoding='utf-8'))
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f'{path} has store version {meta.get("version")}, expected {STORE_VERSION}')
+        return cls(sp.load_npz(str(path / 'counts.npz')).tocsr(), meta['terms'], meta['names'], meta['fingerprint'])
+
+    @classmethod
+    def open(cls, data_dir=DATA_TXT, path=None, cache_dir=CACHE_DIR) -> 'TermCounts':
+        """Load the store of data_dir, (re)building it when the files changed."""
+        path = Path(path) if path else default_path(data_dir)
+        current = fingerprint(file_hashes(list_files(data_dir), cache_dir))
+        try:
+            counts = cls.load(path)
+            if counts.fingerprint == current:
+                return counts
+            print(f'{path} is out of date, rebuilding')
+        except (OSError, ValueError, KeyError):
+            print(f'No usable term counts at {path}, building them')
+        build(data_dir, path, cache_dir)
+        return cls.load(path)
+
+    # -- masks ------------------------------------------------------------
+
+    def doc_mask(self, start=None, end=None, newspaper: Optional[str] = None) -> Optional[np.ndarray]:
+        """Boolean mask over documents for a date range (as in CorpusIndex.select) and newspaper."""
+        if start is None and end is None and newspaper is None:
+            return None
+        (lo,), (hi,) = _bounds(start, end)
+        date = self.keys['date']
+        mask = (date >= lo) & (date <= hi)
+        if newspaper is not None:
+            mask &= self.keys['newspaper'] == newspaper
+        return mask
+
+    def vocab_mask(self, min_len: int = 1, alpha: bool = False, stopwords: Iterable[str] = ()) -> np.ndarray:
+        """Boolean mask over terms: at least min_len characters, alphabetic only, not a stopword."""
+        mask = np.fromiter((len(t) >= min_len and (not alpha or t.isalpha()) for t in self.terms),
+                           dtype=bool, count=len(self.terms))
+        stopwords = list(stopwords)
+        if stopwords:
+            mask &= ~np.isin(self.terms, stopwords)
+        return mask
+
+    def term_ids(self, terms: Iterable[str]) -> np.ndarray:
+        """Column of each term (-1 when absent)."""
+        terms = np.array(list(terms), dtype=object)
+        ids = np.searchsorted(self.terms, terms)
+        found = (ids < len(self.terms)) & (self.terms[np.minimum(ids, len(self.terms) - 1)] == terms)
+        return np.where(found, ids, -1)
+
+    # -- queries ----------------------------------------------------------
+
+    def totals(self, docs: Optional[np.ndarray] = None) -> np.ndarray:
+        """Count of every term over the selected documents (all when docs is None)."""
+        m = self.matrix if docs is None else self.matrix[np.flatnonzero(docs)]
+        return np.bincount(m.indices, weights=m.data, minlength=m.shape[1]).astype(np.int64)
+
+    def most_common(self, n: Optional[int] = 10, docs: Optional[np.ndarray] = None,
+                    vocab: Optional[np.ndarray] = None) -> List[Tuple[str, int]]:
+        """The n most frequent terms (all when n is None), like FreqDist.most_common."""
+        totals = self.totals(docs)
+        if vocab is not None:
+            totals = np.where(vocab, totals, 0)
+        nonzero = int(np.count_nonzero(totals))
+        rows = top_k(totals, nonzero if n is None else min(n, nonzero))
+        return [(str(self.terms[i]), int(totals[i])) for i in rows]
+
+    def frequencies(self, n: Optional[int] = None, docs: Optional[np.ndarray] = None,
+                    vocab: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """{term: count} of the n most frequent terms, e.g. for wordclouds.render()."""
+        return dict(self.most_common(n, docs, vocab))
+
+    def hapaxes(self, docs: Optional[np.ndarray] = None, vocab: Optional[np.ndarray] = None) -> List[str]:
+        totals = self.totals(docs)
+        mask = totals == 1 if vocab is None else (totals == 1) & vocab
+        return self.terms[mask].tolist()
+
+    def _groups(self, by: str, docs: Optional[np.ndarray]) -> Tuple[np.ndarray, sp.csr_matrix]:
+        if by not in self.keys:
+            raise ValueError(f'Unknown group {by!r}, expected one of {GROUPS}')
+        keys = self.keys[by]
+        valid = (keys != '') if keys.dtype.kind == 'U' else (keys > 0)
+        if docs is not None:
+            valid &= docs
+        labels, codes = np.unique(keys[valid], return_inverse=True)
+        rows = np.flatnonzero(valid)
+        indicator = sp.csr_matrix((np.ones(len(rows), dtype=np.int64), (codes, rows)),
+                                  shape=(len(labels), len(self.names)))
+        return labels, indicator
+
+    def group_by(self, by: str = 'year', terms: Optional[Iterable[str]] = None, docs: Optional[np.ndarray] = None,
+                 relative: bool = False):
+        """DataFrame of counts (or shares of all tokens) per group x term.
+
+        by is one of 'year', 'decade', 'month', 'date' or 'newspaper'; terms
+        defaults to the whole vocabulary (a sparse frame then).
+        """
+        import pandas as pd
+
+        labels, indicator = self._groups(by, docs)
+        if terms is None:
+            columns, sub = self.terms, self.matrix
+        else:
+            terms = list(terms)
+            ids = self.term_ids(terms)
+            sub = sp.hstack([self.matrix[:, [i]] if i >= 0 else sp.csr_matrix((len(self.names), 1), dtype=np.int32)
+                             for i in ids], format='csr')
+            columns = terms
+        grouped = indicator @ sub
+        tokens = indicator @ self.doc_lengths
+        if relative:
+            grouped = sp.diags(1.0 / np.maximum(tokens, 1)) @ grouped
+        index = pd.Index(labels, name=by)
+        if terms is None:
+            return pd.DataFrame.sparse.from_spmatrix(grouped, index=index, columns=columns)
+        return pd.DataFrame(grouped.toarray(), index=index, columns=columns)
+
+    def series(self, term: str, by: str = 'year', relative: bool = True, docs: Optional[np.ndarray] = None):
+        """Frequency of one term per group (relative to all tokens of the group by default)."""
+        return self.group_by(by, [term], docs, relative)[term]
+
+    def document_frequency(self, term: str, by: str = 'year', docs: Optional[np.ndarray] = None):
+        """Number of documents containing term per group."""
+        import pandas as pd
+
+        labels, indicator = self._groups(by, docs)
+        (i,) = self.term_ids([term])
+        present = np.zeros(len(self.names), dtype=np.int64)
+        if i >= 0:
+            present[self.matrix[:, i].nonzero()[0]] = 1
+        return pd.Series(indicator @ present, index=pd.Index(labels, name=by), name=term)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Document x term count matrix with group-by over metadata.')
+    parser.add_argument('--txt-dir', default=str(DATA_TXT))
+    parser.add_argument('--path', default=None, help='Default: data/cache/termfreq_<txt dir name>')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help='(Re)build the store from the positional index')
+    for name, help_ in [('top', 'Most frequent terms'), ('hapax', 'Terms seen once'),
+                        ('series', 'Relative frequency of terms per group')]:
+        p = sub.add_parser(name, help=help_)
+        if name == 'series':
+            p.add_argument('terms', nargs='+')
+            p.add_argument('--by', choices=GROUPS, default='year')
+            p.add_argument('--counts', action='store_true', help='Raw counts instead of shares')
+        else:
+            p.add_argument('-n', type=int, default=20)
+            p.add_argument('--min-len', type=int, default=3)
+            p.add_argument('--stopwords', action='store_true', help='Drop NLTK French stopwords')
+        p.add_argument('--from', dest='start', default=None, help='Year, YYYY-MM or YYYY-MM-DD')
+        p.add_argument('--to', dest='end', default=None)
+        p.add_argument('--newspaper', default=None, help='e.g. JB838 (Le Soir) or JB427 (La Libre Belgique)')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build(args.txt_dir, args.path)
+        return
+    counts = TermCounts.open(args.txt_dir, args.path)
+    docs = counts.doc_mask(args.start, args.end, args.newspaper)
+    t0 = time.perf_counter()
+    if args.command == 'series':
+        print(counts.group_by(args.by, args.terms, docs, relative=not args.counts).to_string())
+    else:
+        stopwords = ()
+        if args.stopwords:
+            from nltk.corpus import stopwords as nltk_stopwords
+            stopwords = nltk_stopwords.words('french')
+        vocab = counts.vocab_mask(args.min_len, alpha=True, stopwords=stopwords)
+        if args.command == 'top':
+            for term, c in counts.most_common(args.n, docs, vocab):
+                print(f'{term}\t{c}')
+        else:
+            print(' '.join(counts.hapaxes(docs, vocab)[:args.n]))
+    print(f'({1000 * (time.perf_counter() - t0):.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
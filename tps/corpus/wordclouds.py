@@ -0,0 +1,130 @@
+"""Wordcloud rendering from frequency tables, over a process pool, with skip-if-unchanged.
+
+Callers (tps/tp3/run_tp3.py, scripts/regen_tp3_artifacts.py, tp3/expand_stopwords.py,
+module3/s2_wordcloud.ipynb) compute {term: frequency} dictionaries themselves and
+hand them over as {output png: frequencies}. Each table is trimmed to the
+max_words terms WordCloud would keep anyway and hashed together with the
+WordCloud parameters. data/cache/wordclouds.json maps each image (resolved path)
+to [hash, size, mtime_ns] of the file as rendered; images whose hash matches and
+whose file is still exactly that one (not overwritten by another script) are not
+re-rendered. The others are rendered concurrently (WordCloud layout is
+CPU-bound and single-threaded).
+
+Usage (from the repository root):
+    from tps.corpus.wordclouds import render
+    render({'tp3/cluster_0.png': {'bourse': 12.0, 'francs': 9.0}}, width=800, height=400)
+"""
+import hashlib
+import heapq
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Mapping, Tuple
+
+MANIFEST = Path('data') / 'cache' / 'wordclouds.json'
+MAX_WORDS = 200
+
+
+def top_frequencies(freqs: Mapping[str, float], max_words: int = MAX_WORDS) -> Dict[str, float]:
+    """The max_words largest entries of freqs (the only ones WordCloud draws)."""
+    items = freqs.items() if len(freqs) <= max_words else heapq.nlargest(max_words, freqs.items(), key=lambda kv: kv[1])
+    return {str(w): float(n) for w, n in items if n > 0}
+
+
+def frequency_hash(freqs: Mapping[str, float], params: Mapping) -> str:
+    payload = json.dumps([sorted(freqs.items()), sorted(params.items())], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def load_manifest(path=MANIFEST) -> Dict[str, List]:
+    path = Path(path)
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest: Dict[str, List], path=MANIFEST):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def _stamp(path: Path) -> List[int]:
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _key(out) -> str:
+    # one entry per image whatever the path spelling ('tp3/x.png', '/repo/tp3/x.png')
+    return str(Path(out).resolve())
+
+
+def unchanged(entry, digest: str, out: Path) -> bool:
+    """True when the manifest entry has this digest and out is still the file it recorded."""
+    if not isinstance(entry, list) or entry[0] != digest:
+        return False
+    try:
+        return _stamp(out) == entry[1:]
+    except OSError:
+        return False
+
+
+def _render_one(job: Tuple[str, Dict[str, float], Dict]) -> str:
+    from wordcloud import WordCloud
+    out, freqs, params = job
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    image = WordCloud(**params).generate_from_frequencies(freqs).to_image()
+    tmp = out.with_name(out.name + '.part')
+    image.save(tmp, format='PNG', optimize=True)
+    os.replace(tmp, out)
+    return str(out)
+
+
+def render(tables: Mapping, workers: int = None, manifest_path=MANIFEST, force: bool = False,
+           mp_context=None, **params) -> List[str]:
+    """Render {output path: {term: frequency}} to PNG files and return the paths (re-)rendered.
+
+    params are passed to WordCloud (width, height, background_color, ...). Empty
+    tables are skipped, as are outputs whose table and params are unchanged.
+    mp_context is the multiprocessing context of the worker pool; pass
+    multiprocessing.get_context('spawn') when calling from a thread of a
+    multi-threaded process (forking there can deadlock).
+    """
+    params.setdefault('max_words', MAX_WORDS)
+    manifest = load_manifest(manifest_path)
+    jobs = []
+    skipped = 0
+    for out, freqs in tables.items():
+        freqs = top_frequencies(freqs, params['max_words'])
+        if not freqs:
+            continue
+        out = str(Path(out))
+        digest = frequency_hash(freqs, params)
+        if not force and unchanged(manifest.get(_key(out)), digest, Path(out)):
+            skipped += 1
+            continue
+        jobs.append((out, freqs, params, digest))
+    print(f'Wordclouds: {len(jobs)} to render, {skipped} unchanged')
+    if not jobs:
+        return []
+
+    digests = {out: digest for out, _, _, digest in jobs}
+    jobs = [(out, freqs, params) for out, freqs, params, _ in jobs]
+    done = []
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) \
+        if len(jobs) > 1 and workers != 1 else None
+    try:
+        for out in (pool.map(_render_one, jobs) if pool else map(_render_one, jobs)):
+            manifest[_key(out)] = [digests[out]] + _stamp(Path(out))
+            done.append(out)
+            print('Saved', out)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        save_manifest(manifest, manifest_path)
+    return done
@@ -1,3 +1,3 @@
 """API clients package for tp1 demos."""
 
-__all__ = ["gnews_client", "libretranslate_client", "arxiv_client"]
+__all__ = ["gnews_client", "libretranslate_client", "arxiv_client", "local_translate_client", "sessions", "pipeline"]
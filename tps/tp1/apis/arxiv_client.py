@@ -3,11 +3,9 @@
 This client uses arXiv's search API which returns Atom XML; we parse it with feedparser.
 """
 from typing import List, Dict
-import requests
 import xml.etree.ElementTree as ET
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
 from ..logging_config import get_logger
+from .sessions import get_session
 
 logger = get_logger('arxiv_client')
 
@@ -18,12 +16,8 @@ def _ns(tag: str) -> str:
 
 
 def _requests_session(retries: int = 3, backoff: float = 0.5):
-    s = requests.Session()
-    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=False)
-    adapter = HTTPAdapter(max_retries=retry)
-    s.mount('https://', adapter)
-    s.mount('http://', adapter)
-    return s
+    # shared, pooled session (see sessions.py) instead of a new one per call
+    return get_session('arxiv', retries, backoff)
 
 
 def search_arxiv(query: str, max_results: int = 10) -> List[Dict]:
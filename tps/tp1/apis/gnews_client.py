@@ -6,11 +6,9 @@ and normalise results for CAMille.
 It expects the environment variable GNEWS_API_KEY to be set with the API key.
 """
 import os
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
 from typing import List, Dict
 from ..logging_config import get_logger
+from .sessions import get_session
 
 GNEWS_ENDPOINT = "https://gnews.io/api/v4/search"
 
@@ -18,12 +16,8 @@ logger = get_logger('gnews_client')
 
 
 def _requests_session(retries: int = 3, backoff: float = 0.5, status_forcelist=(429, 500, 502, 503, 504)):
-    s = requests.Session()
-    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=status_forcelist, allowed_methods=False)
-    adapter = HTTPAdapter(max_retries=retry)
-    s.mount('https://', adapter)
-    s.mount('http://', adapter)
-    return s
+    # shared, pooled session (see sessions.py) instead of a new one per call
+    return get_session('gnews', retries, backoff, status_forcelist)
 
 
 def search_news(query: str, lang: str = "fr", max_results: int = 10) -> List[Dict]:
@@ -2,25 +2,23 @@
 
 Uses a public LibreTranslate instance by default. No API key required for public instances,
 but you can set LIBRETRANSLATE_URL to point to another instance.
+
+detect_languages() and translate_batch() handle many texts at once: detections run
+concurrently over the shared session, and translations send `q` arrays of up to
+batch_size texts per request instead of one round-trip per text.
 """
 import os
-import requests
-from typing import Optional
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
+from typing import List, Optional
 from ..logging_config import get_logger
+from .sessions import MAX_CONCURRENCY, get_session, map_concurrent
 
 logger = get_logger('libretranslate_client')
 DEFAULT_URL = os.getenv("LIBRETRANSLATE_URL", "https://libretranslate.de")
 
 
 def _requests_session(retries: int = 3, backoff: float = 0.5):
-    s = requests.Session()
-    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=False)
-    adapter = HTTPAdapter(max_retries=retry)
-    s.mount('https://', adapter)
-    s.mount('http://', adapter)
-    return s
+    # shared, pooled session (see sessions.py) instead of a new one per call
+    return get_session('libretranslate', retries, backoff)
 
 
 def detect_language(text: str) -> Optional[str]:
@@ -50,3 +48,39 @@ def translate(text: str, source: str = "auto", target: str = "en") -> str:
     except Exception as e:
         logger.exception('Translation failed: %s', e)
         return ''
+
+
+def detect_languages(texts: List[str], concurrency: int = MAX_CONCURRENCY) -> List[Optional[str]]:
+    """Detect the language of each text, running up to `concurrency` requests in parallel."""
+    return map_concurrent(detect_language, texts, concurrency)
+
+
+def _translate_chunk(args) -> List[str]:
+    chunk, source, target = args
+    session = _requests_session()
+    data = {"q": chunk, "source": source, "target": target, "format": "text"}
+    try:
+        resp = session.post(f"{DEFAULT_URL}/translate", json=data, timeout=60)
+        resp.raise_for_status()
+        translated = resp.json().get("translatedText")
+    except Exception as e:
+        logger.exception('Batch translation failed: %s', e)
+        return [''] * len(chunk)
+    if not isinstance(translated, list) or len(translated) != len(chunk):
+        logger.error('Unexpected batch translation response, falling back to single calls')
+        return [translate(t, source=source, target=target) for t in chunk]
+    return translated
+
+
+def translate_batch(texts: List[str], source: str = "auto", target: str = "en",
+                    batch_size: int = 50, concurrency: int = MAX_CONCURRENCY) -> List[str]:
+    """Translate texts (same source language) with `q` arrays of batch_size texts per request.
+
+    Batches are sent concurrently; the result list is aligned with texts.
+    """
+    texts = list(texts)
+    chunks = [(texts[i:i + batch_size], source, target) for i in range(0, len(texts), batch_size)]
+    out = []
+    for translated in map_concurrent(_translate_chunk, chunks, concurrency):
+        out.extend(translated)
+    return out
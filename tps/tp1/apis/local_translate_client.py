@@ -0,0 +1,213 @@
+"""Local translation backend (MarianMT / Helsinki-NLP opus-mt) with the libretranslate_client API.
+
+Drop-in offline replacement for libretranslate_client.translate()/translate_batch():
+- inputs are split into sentences (tps.corpus.loader.sentence_texts; sentences longer
+  than the model's MAX_LENGTH tokens are further cut on word boundaries), so long texts
+  such as whole newspaper pages are translated completely rather than truncated
+- sentences are sorted by length and translated in padded batches (little padding waste)
+- runs on CPU with a fixed intra/inter-op thread setting (LOCAL_MT_THREADS, LOCAL_MT_INTEROP_THREADS)
+- every sentence translation is memoised in a SQLite cache keyed by a hash of (model, sentence),
+  so re-translating a newspaper year only pays for sentences never seen before
+- a failing batch only blanks the texts it contains (logged), the others are returned;
+  if the model cannot be loaded every text comes back as '' (logged), like the remote backend
+
+Requires `transformers`, `torch` and `sentencepiece` (see module5/s2_machine_translation.ipynb).
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+from ..logging_config import get_logger
+
+logger = get_logger('local_translate_client')
+
+MODEL_TEMPLATE = os.getenv('LOCAL_MT_MODEL', 'Helsinki-NLP/opus-mt-{source}-{target}')
+DEFAULT_SOURCE = os.getenv('LOCAL_MT_SOURCE', 'fr')
+THREADS = int(os.getenv('LOCAL_MT_THREADS', str(os.cpu_count() or 1)))
+INTEROP_THREADS = int(os.getenv('LOCAL_MT_INTEROP_THREADS', '1'))
+CACHE_PATH = os.getenv('LOCAL_MT_CACHE', os.path.join(os.path.dirname(__file__), '..', '..', '..', 'data', 'cache', 'translations.sqlite'))
+MAX_LENGTH = 512
+
+_models: Dict[str, tuple] = {}
+_lock = threading.Lock()
+_torch_configured = False
+
+
+def _configure_torch():
+    global _torch_configured
+    import torch
+    if _torch_configured:
+        return torch
+    torch.set_num_threads(THREADS)
+    try:
+        torch.set_num_interop_threads(INTEROP_THREADS)
+    except RuntimeError:
+        # can only be set once, before any inter-op parallel work started
+        pass
+    _torch_configured = True
+    return torch
+
+
+def model_name(source: str, target: str) -> str:
+    return MODEL_TEMPLATE.format(source=source, target=target)
+
+
+def load_model(source: str, target: str):
+    """Return (tokenizer, model) for the language pair, loaded once per process."""
+    name = model_name(source, target)
+    with _lock:
+        if name not in _models:
+            from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+            _configure_torch()
+            logger.info('Loading translation model %s', name)
+            tokenizer = AutoTokenizer.from_pretrained(name)
+            model = AutoModelForSeq2SeqLM.from_pretrained(name)
+            model.eval()
+            _models[name] = (tokenizer, model)
+        return _models[name]
+
+
+class TranslationCache:
+    """SQLite memo of translations keyed by sha1(model name + source sentence)."""
+
+    def __init__(self, path: str = CACHE_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, translated TEXT)')
+        self.db.commit()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha1(f'{model}\x00{text}'.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        found = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ','.join('?' * len(chunk))
+                for k, v in self.db.execute(f'SELECT key, translated FROM translations WHERE key IN ({marks})', chunk):
+                    found[k] = v
+        return found
+
+    def put_many(self, items: Dict[str, str]):
+        with self.lock:
+            self.db.executemany('INSERT OR REPLACE INTO translations VALUES (?, ?)', list(items.items()))
+            self.db.commit()
+
+
+_cache: Optional[TranslationCache] = None
+
+
+def _get_cache() -> TranslationCache:
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = TranslationCache()
+        return _cache
+
+
+def segments(text: str) -> List[List[str]]:
+    """Lines of text, each split into its sentences (line breaks are kept in the translation)."""
+    from ...corpus.loader import sentence_texts
+    return [sentence_texts(line) for line in text.split('\n')]
+
+
+def _pieces(tokenizer, sentence: str) -> List[str]:
+    """sentence cut on word boundaries into pieces of at most MAX_LENGTH tokens."""
+    if len(tokenizer(sentence, add_special_tokens=True)['input_ids']) <= MAX_LENGTH:
+        return [sentence]
+    pieces, current, size = [], [], 1  # 1: end-of-sequence token
+    for word in sentence.split():
+        n = len(tokenizer(word, add_special_tokens=False)['input_ids'])
+        if current and size + n > MAX_LENGTH:
+            pieces.append(' '.join(current))
+            current, size = [], 1
+        current.append(word)
+        size += n
+    if current:
+        pieces.append(' '.join(current))
+    return pieces
+
+
+def _generate(texts: List[str], source: str, target: str, batch_size: int) -> List[Optional[str]]:
+    """Translate sentences in length-sorted, padded batches; output aligned with texts.
+
+    Sentences longer than MAX_LENGTH tokens are translated piecewise and joined.
+    Entries of a batch that fails are None, as are all entries when the model cannot be loaded.
+    """
+    try:
+        tokenizer, model = load_model(source, target)
+        torch = _configure_torch()
+    except Exception as e:
+        logger.exception('Loading local translation model %s failed: %s', model_name(source, target), e)
+        return [None] * len(texts)
+    owners, pieces = [], []
+    for i, text in enumerate(texts):
+        for piece in _pieces(tokenizer, text):
+            owners.append(i)
+            pieces.append(piece)
+    order = sorted(range(len(pieces)), key=lambda j: len(pieces[j]))
+    out: List[Optional[str]] = [''] * len(pieces)
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            try:
+                batch = tokenizer([pieces[j] for j in idx], return_tensors='pt', padding=True)
+                generated = model.generate(**batch)
+                for j, tr in zip(idx, tokenizer.batch_decode(generated, skip_special_tokens=True)):
+                    out[j] = tr
+            except Exception as e:
+                logger.exception('Local translation of a batch of %d sentences failed: %s', len(idx), e)
+                for j in idx:
+                    out[j] = None
+    joined: List[Optional[str]] = [''] * len(texts)
+    for i, tr in zip(owners, out):
+        if joined[i] is None or tr is None:
+            joined[i] = None
+        else:
+            joined[i] = f'{joined[i]} {tr}' if joined[i] else tr
+    return joined
+
+
+def translate_batch(texts: List[str], source: str = "auto", target: str = "en",
+                    batch_size: int = 16, concurrency: int = None, use_cache: bool = True) -> List[str]:
+    """Translate texts locally. Same signature as libretranslate_client.translate_batch().
+
+    Texts are translated sentence by sentence (and cached per sentence), then
+    reassembled; a text is '' when one of its sentences could not be translated.
+    `concurrency` is accepted for compatibility; parallelism comes from torch threads.
+    """
+    texts = list(texts)
+    source = DEFAULT_SOURCE if source in (None, '', 'auto') else source
+    if source == target:
+        return texts
+    name = model_name(source, target)
+    cache = _get_cache() if use_cache else None
+    layouts = [segments(t) if t else [] for t in texts]
+    sentences = list(dict.fromkeys(s for layout in layouts for line in layout for s in line))
+    keys = {s: TranslationCache.key(name, s) for s in sentences}
+    known = cache.get_many(list(keys.values())) if cache else {}
+
+    todo = [s for s in sentences if keys[s] not in known]
+    if todo:
+        fresh = {keys[s]: tr for s, tr in zip(todo, _generate(todo, source, target, batch_size)) if tr is not None}
+        if cache:
+            cache.put_many({k: v for k, v in fresh.items() if v})
+        known.update(fresh)
+
+    out = []
+    for layout in layouts:
+        if any(keys[s] not in known for line in layout for s in line):
+            out.append('')
+            continue
+        out.append('\n'.join(' '.join(known[keys[s]] for s in line) for line in layout))
+    return out
+
+
+def translate(text: str, source: str = "auto", target: str = "en") -> str:
+    if not text:
+        return ''
+    return translate_batch([text], source=source, target=target)[0]
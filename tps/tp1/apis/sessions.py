@@ -0,0 +1,43 @@
+"""Shared HTTP sessions and concurrency helpers for the tp1 API clients.
+
+Each client gets one long-lived requests.Session (retries + a connection pool
+sized for MAX_CONCURRENCY parallel requests) instead of building a new Session,
+and a new TCP/TLS connection, for every call. Set TP1_MAX_CONCURRENCY to change
+the default number of parallel requests.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+MAX_CONCURRENCY = int(os.getenv('TP1_MAX_CONCURRENCY', '8'))
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def get_session(name: str, retries: int = 3, backoff: float = 0.5,
+                status_forcelist=(429, 500, 502, 503, 504), pool_size: int = MAX_CONCURRENCY) -> requests.Session:
+    """Return the shared session for client `name`, creating it on first use."""
+    with _lock:
+        s = _sessions.get(name)
+        if s is None:
+            s = requests.Session()
+            retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=status_forcelist, allowed_methods=False)
+            adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+            s.mount('https://', adapter)
+            s.mount('http://', adapter)
+            _sessions[name] = s
+        return s
+
+
+def map_concurrent(func: Callable, items: Iterable, concurrency: int = MAX_CONCURRENCY) -> List:
+    """Apply func to items on a thread pool, preserving input order."""
+    items = list(items)
+    if concurrency <= 1 or len(items) <= 1:
+        return [func(it) for it in items]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(func, items))
@@ -2,10 +2,10 @@
 
 Usage:
   set GNEWS_API_KEY=your_key   # Windows PowerShell: $env:GNEWS_API_KEY = 'your_key'
-  python tps\tp1\example_fetch_translate.py
+  python -m tps.tp1.example_fetch_translate
 """
 from tps.tp1.apis.gnews_client import search_news
-from tps.tp1.apis.libretranslate_client import detect_language, translate
+from tps.tp1.apis.pipeline import detect_and_translate
 
 
 def main():
@@ -15,10 +15,11 @@ def main():
         print('Failed to fetch news:', e)
         return
 
+    # detect concurrently, then translate in batches grouped by language
+    detect_and_translate(items, target='en')
     for it in items:
         descr = it.get('description') or ''
-        lang = detect_language(descr) if descr else None
-        translated = translate(descr, source=lang or 'auto', target='en') if descr else ''
+        translated = it.get('translated', '')
         print('TITLE:', it.get('title'))
         print('SOURCE:', it.get('source'))
         print('URL:', it.get('url'))
@@ -1,46 +1,41 @@
 #!/usr/bin/env python3
 """Small script to query news (GNews or arXiv fallback), detect language and translate descriptions.
 
-Usage: python query_api.py --query "your query" --max 5
+Language detection runs concurrently and translations are sent in batches
+(see apis/pipeline.py).
+
+Usage: python -m tps.tp1.query_api --query "your query" --max 5 [--concurrency 8] [--local]
 """
 import argparse
-import os
-from tps.tp1.apis.gnews_client import search_news
-from tps.tp1.apis.arxiv_client import search_arxiv
-from tps.tp1.apis.libretranslate_client import detect_language, translate
+from tps.tp1.apis.pipeline import BACKEND, detect_and_translate, item_text, search
+from tps.tp1.apis.sessions import MAX_CONCURRENCY
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--query', '-q', required=True, help='Search query')
     parser.add_argument('--max', '-n', type=int, default=5, help='Max results')
+    parser.add_argument('--concurrency', '-c', type=int, default=MAX_CONCURRENCY, help='Parallel API requests')
+    parser.add_argument('--batch-size', type=int, default=50, help='Texts per translation request')
+    parser.add_argument('--local', action='store_true', help='Translate offline with the local MarianMT backend')
     args = parser.parse_args()
 
-    api_key = os.environ.get('GNEWS_API_KEY')
-    items = []
-    if api_key:
-        try:
-            items = search_news(args.query, lang='fr', max_results=args.max)
-        except Exception as e:
-            print('GNews search failed, falling back to arXiv:', e)
-
-    if not items:
-        items = search_arxiv(args.query, max_results=args.max)
-
+    items = search(args.query, lang='fr', max_results=args.max)
     if not items:
         print('No items found.')
         return
 
+    backend = 'local' if args.local else BACKEND
+    detect_and_translate(items, target='en', concurrency=args.concurrency, batch_size=args.batch_size, backend=backend)
     for i, it in enumerate(items, 1):
         title = it.get('title')
-        summary = it.get('summary') or it.get('description') or it.get('snippet', '')
+        summary = item_text(it)
         print(f'[{i}] {title}')
         if summary:
-            lang = detect_language(summary)
+            lang = it.get('lang')
             print('  detected language:', lang)
             if lang and lang != 'en':
-                tr = translate(summary, source=lang, target='en')
-                print('  translated (en):', tr[:300])
+                print('  translated (en):', (it.get('translated') or '')[:300])
             else:
                 print('  summary (en?):', summary[:300])
         print('-' * 60)
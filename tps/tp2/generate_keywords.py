@@ -1,35 +1,39 @@
 """Generate aggregated keywords CSV for a given YEAR from data/txt files using YAKE.
 Saves to tps/tp2/keywords_{YEAR}.csv
+
+YAKE runs over a process pool and per-document keyword lists are cached by
+content hash (data/cache/keywords), so other years/decades/newspapers and
+re-runs are aggregated from the cache without re-extraction.
+
+Usage (from the repository root): python -m tps.tp2.generate_keywords
 """
 import os
-from collections import Counter
-import yake
 import pandas as pd
+from tps.corpus.index import CorpusIndex
+from tps.corpus.keywords import aggregate, extract
 
 YEAR = 1955
 DATA_TXT_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'txt')
 OUT_DIR = os.path.join(os.path.dirname(__file__), '')
 N_TOP_WORDS = 200
+N_WORKERS = None  # default: one process per CPU
+
+
+def main():
+    index = CorpusIndex.open(DATA_TXT_DIR)
+    files = index.paths(index.year(YEAR))
+    print(f'Found {len(files)} files for YEAR={YEAR}')
+    results = extract(files, workers=N_WORKERS, lan='fr', top=50)
+    agg = aggregate(results, ngram=2)
+
+    top = agg.most_common(N_TOP_WORDS)
+    if not os.path.exists(OUT_DIR):
+        os.makedirs(OUT_DIR, exist_ok=True)
+    out_path = os.path.join(OUT_DIR, f'keywords_{YEAR}.csv')
+    df = pd.DataFrame(top, columns=['keyword','count'])
+    df.to_csv(out_path, index=False, encoding='utf-8')
+    print('Saved aggregated keywords to', out_path)
+
 
-files = [f for f in os.listdir(DATA_TXT_DIR) if f.endswith('.txt') and str(YEAR) in f]
-print(f'Found {len(files)} files for YEAR={YEAR}')
-kw_extractor = yake.KeywordExtractor(lan='fr', top=50)
-agg = Counter()
-for f in sorted(files):
-    path = os.path.join(DATA_TXT_DIR, f)
-    try:
-        text = open(path, 'r', encoding='utf-8').read()
-    except Exception:
-        text = open(path, 'r', encoding='latin-1').read()
-    kws = kw_extractor.extract_keywords(text)
-    for kw, score in kws:
-        if len(kw.split()) == 2:
-            agg[kw.lower()] += 1
-
-top = agg.most_common(N_TOP_WORDS)
-if not os.path.exists(OUT_DIR):
-    os.makedirs(OUT_DIR, exist_ok=True)
-out_path = os.path.join(OUT_DIR, f'keywords_{YEAR}.csv')
-df = pd.DataFrame(top, columns=['keyword','count'])
-df.to_csv(out_path, index=False, encoding='utf-8')
-print('Saved aggregated keywords to', out_path)
+if __name__ == '__main__':
+    main()
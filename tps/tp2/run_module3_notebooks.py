@@ -1,6 +1,6 @@
 """Headless runner: execute module3 notebooks sequentially using nbclient.
 Saves executed copies (appends .executed.ipynb) and relies on parameter cells already present in notebooks (YEAR, paths).
-Usage: python tps/tp2/run_module3_notebooks.py
+Usage (from the repository root): python -m tps.tp2.run_module3_notebooks
 """
 import nbformat
 from nbclient import NotebookClient
@@ -8,6 +8,8 @@ from nbclient.exceptions import CellExecutionError
 from pathlib import Path
 import sys
 import os
+from tps.corpus.index import CorpusIndex
+from tps.corpus.stream import build_all_txt
 
 ROOT = Path.cwd()
 NOTEBOOKS = [
@@ -25,22 +27,10 @@ data_txt_dir = ROOT / 'data' / 'txt'
 all_txt_path = ROOT / 'data' / 'all.txt'
 if data_txt_dir.exists():
     print(f'Building {all_txt_path} from files for year {YEAR} in {data_txt_dir}')
-    with open(all_txt_path, 'w', encoding='utf-8') as out_f:
-        matched = 0
-        for p in sorted(data_txt_dir.iterdir()):
-            if p.is_file() and str(YEAR) in p.name:
-                try:
-                    out_f.write(p.read_text(encoding='utf-8'))
-                    out_f.write('\n')
-                    matched += 1
-                except Exception:
-                    try:
-                        out_f.write(p.read_text(encoding='latin-1'))
-                        out_f.write('\n')
-                        matched += 1
-                    except Exception:
-                        print('Failed to read', p)
-        print(f'Wrote {matched} files into {all_txt_path}')
+    index = CorpusIndex.open(data_txt_dir)
+    # streamed in fixed-size chunks so a large year never sits in memory
+    matched = build_all_txt(index.paths(index.year(YEAR)), all_txt_path)
+    print(f'Wrote {matched} files into {all_txt_path}')
 else:
     print(f'Data txt dir not found: {data_txt_dir} (continuing)')
 
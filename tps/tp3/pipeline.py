@@ -0,0 +1,378 @@
+"""TP3 as a declarative, content-addressed pipeline (tps/corpus/pipeline.py).
+
+    select -> tokenize -> tfidf -> kmeans -> top_terms ----------.
+                 |                   '-----> wordclouds          |
+                 |------> word2vec -----------------------------> interpretation
+                 '------> w2v_sweep ----------------------------'
+
+Every stage is keyed by its parameters, its upstream keys and, for `select`,
+the content hashes of the selected files (for `tokenize`, the digest of the OCR
+variant map). Changing the number of clusters therefore reruns kmeans,
+top_terms, wordclouds and interpretation only; the tokenized corpus, the TF-IDF
+matrix and the Word2Vec models are reused. wordclouds, top_terms, word2vec and
+w2v_sweep run concurrently once their inputs exist. Finished artifacts keep
+run_tp3's names and are copied to --out (sents_<start>_<end>.txt, clusters_<start>_<end>.csv,
+cluster_top_terms_..., cluster_<i>_wordcloud_....png, word2vec_*.model/.kv,
+w2v_model_comparison.csv, interpretation.txt).
+
+Usage (from the repository root):
+    python -m tps.tp3.pipeline --start 1950 --end 1959
+    python -m tps.tp3.pipeline --set kmeans.n_clusters=8 --set word2vec.window=7
+    python -m tps.tp3.pipeline --dry-run            # which stages are stale
+    python -m tps.tp3.pipeline --force tokenize     # rerun tokenize and everything downstream
+    python -m tps.tp3.pipeline --only word2vec      # a stage and its ancestors only
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from tps.corpus.loader import CACHE_DIR, DATA_TXT, file_hashes
+from tps.corpus.ocr import VARIANTS_TSV, VariantMap
+from tps.corpus.pipeline import CACHE_DIR as PIPELINE_DIR, Pipeline, Stage
+
+OUT_DIR = Path('tp3')  # where run_tp3, regen_tp3_artifacts and tp3/expand_stopwords.py read/write
+TEST_WORDS = ['president', 'france', 'paris', 'guerre', 'paix', 'europe']
+SAMPLE_WORDS = ['president', 'paris', 'guerre']
+PAIRS = [('paris', 'france'), ('guerre', 'paix'), ('president', 'france')]
+
+DEFAULTS = {
+    'select': {'start': 1950, 'end': 1959, 'newspaper': None, 'txt_dir': str(DATA_TXT)},
+    'tokenize': {'ocr_map': str(VARIANTS_TSV), 'min_tokens': 3},
+    'tfidf': {'max_df': 0.6, 'min_df': 2, 'ngram_range': [1, 2], 'stop_words': 'english'},
+    'kmeans': {'n_clusters': 6, 'random_state': 42, 'n_init': 10},
+    'top_terms': {'top_n': 15},
+    'wordclouds': {'width': 600, 'height': 300, 'background_color': 'white', 'max_words': 200},
+    'word2vec': {'vector_size': 64, 'window': 5, 'min_count': 5, 'epochs': 10, 'ann_index': True},
+    'w2v_sweep': {'variants': [{'window': w, 'min_count': mc, 'vector_size': 100, 'epochs': 5}
+                               for w, mc in [(3, 3), (5, 5), (7, 3)]]},
+    'interpretation': {'examples': 2, 'listed_terms': 10},
+}
+
+
+def _selected(params: Dict) -> List[Path]:
+    from tps.corpus.index import CorpusIndex
+
+    index = CorpusIndex.open(params['txt_dir'])
+    return index.paths(index.years(params['start'], params['end'], params['newspaper']))
+
+
+def _decade(inputs: Dict) -> str:
+    """'<start>_<end>' suffix of the artifact names (every stage after select depends on it or on tokenize)."""
+    select = inputs['select'] if 'select' in inputs else inputs['tokenize']
+    return f"{select['start']}_{select['end']}"
+
+
+def _lines(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            yield line.rstrip('\n')
+
+
+# --- fingerprints of the external inputs ---
+
+def select_fingerprint(params: Dict) -> str:
+    from tps.corpus.inverted import fingerprint
+
+    return fingerprint(file_hashes(_selected(params), CACHE_DIR))
+
+
+def ocr_fingerprint(params: Dict) -> str:
+    path = Path(params['ocr_map'])
+    return VariantMap.load(path).digest if path.exists() else ''
+
+
+# --- stages: fn(inputs, params, out_dir) -> result ---
+
+def select(inputs: Dict, params: Dict, out: Path) -> Dict:
+    paths = _selected(params)
+    print(f"Selected {len(paths)} files for {params['start']}-{params['end']}")
+    if not paths:
+        raise ValueError(f"No files in {params['txt_dir']} for {params['start']}-{params['end']}")
+    return {'start': params['start'], 'end': params['end'], 'paths': [str(p) for p in paths]}
+
+
+def tokenize(inputs: Dict, params: Dict, out: Path) -> Dict:
+    """Whitespace-normalized documents (one per line) and the Word2Vec sentences file."""
+    from tps.corpus.embeddings import SentenceFile
+    from tps.corpus.loader import iter_documents
+    from tps.corpus.ocr import load_variants
+
+    variants = load_variants(params['ocr_map'])
+    names = []
+    sents_name = f"sents_{_decade(inputs)}.txt"
+    with SentenceFile(out / sents_name, min_tokens=params['min_tokens']) as sents, \
+            (out / 'docs.txt').open('w', encoding='utf-8') as docs:
+        for doc in iter_documents(inputs['select']['paths'], variants=variants):
+            docs.write(re.sub(r'\s+', ' ', doc['text']).strip() + '\n')
+            names.append(doc['name'])
+            for s in doc['sents']:
+                sents.write([w.lower() for w in s if re.search('[a-zA-Z0-9]', w)])
+    print(f'Tokenized {len(names)} documents ({sents.n_sents} sentences, {sents.n_words} tokens)')
+    return {'start': inputs['select']['start'], 'end': inputs['select']['end'], 'names': names,
+            'docs': 'docs.txt', 'sents': sents_name, 'n_sents': sents.n_sents, 'n_words': sents.n_words,
+            'outputs': [sents_name]}
+
+
+def tfidf(inputs: Dict, params: Dict, out: Path) -> Dict:
+    import scipy.sparse as sp
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+
+    docs = Path(inputs['tokenize']['_dir']) / inputs['tokenize']['docs']
+    counter = CountVectorizer(max_df=params['max_df'], min_df=params['min_df'],
+                              ngram_range=tuple(params['ngram_range']), stop_words=params['stop_words'])
+    counts = counter.fit_transform(_lines(docs))
+    X = TfidfTransformer().fit_transform(counts)
+    print('TF-IDF shape', X.shape)
+    sp.save_npz(out / 'counts.npz', counts.tocsr())
+    sp.save_npz(out / 'tfidf.npz', X.tocsr())
+    (out / 'terms.json').write_text(json.dumps(counter.get_feature_names_out().tolist()), encoding='utf-8')
+    return {'shape': list(X.shape), 'counts': 'counts.npz', 'tfidf': 'tfidf.npz', 'terms': 'terms.json'}
+
+
+def _matrix(result: Dict, name: str):
+    import scipy.sparse as sp
+
+    return sp.load_npz(Path(result['_dir']) / result[name])
+
+
+def _terms(result: Dict) -> np.ndarray:
+    terms = json.loads((Path(result['_dir']) / result['terms']).read_text(encoding='utf-8'))
+    return np.array(terms, dtype=object)
+
+
+def kmeans(inputs: Dict, params: Dict, out: Path) -> Dict:
+    import pandas as pd
+    from sklearn.cluster import KMeans
+
+    X = _matrix(inputs['tfidf'], 'tfidf')
+    model = KMeans(n_clusters=params['n_clusters'], random_state=params['random_state'], n_init=params['n_init'])
+    labels = model.fit_predict(X)
+    np.save(out / 'labels.npy', labels)
+    np.save(out / 'centers.npy', model.cluster_centers_)
+    clusters_csv = f'clusters_{_decade(inputs)}.csv'
+    pd.DataFrame({'filename': inputs['tokenize']['names'], 'cluster': labels}).to_csv(
+        out / clusters_csv, index=False, encoding='utf-8')
+    return {'n_clusters': params['n_clusters'], 'labels': 'labels.npy', 'centers': 'centers.npy',
+            'sizes': np.bincount(labels, minlength=params['n_clusters']).tolist(), 'outputs': [clusters_csv]}
+
+
+def top_terms(inputs: Dict, params: Dict, out: Path) -> Dict:
+    import pandas as pd
+    from tps.corpus.clustering import top_terms as cluster_top_terms
+
+    terms = _terms(inputs['tfidf'])
+    centers = np.load(Path(inputs['kmeans']['_dir']) / inputs['kmeans']['centers'])
+    tops = cluster_top_terms(centers, terms, params['top_n'])
+    top_terms_csv = f'cluster_top_terms_{_decade(inputs)}.csv'
+    pd.DataFrame.from_dict(tops, orient='index').to_csv(out / top_terms_csv, header=False, encoding='utf-8')
+    return {'top_terms': tops, 'outputs': [top_terms_csv]}
+
+
+def wordclouds(inputs: Dict, params: Dict, out: Path) -> Dict:
+    from tps.corpus.clustering import cluster_frequencies, cluster_members
+    from tps.corpus.wordclouds import render
+
+    counts, terms = _matrix(inputs['tfidf'], 'counts'), _terms(inputs['tfidf'])
+    labels = np.load(Path(inputs['kmeans']['_dir']) / inputs['kmeans']['labels'])
+    members = cluster_members(labels, inputs['kmeans']['n_clusters'])
+    tables = {out / f'cluster_{i}_wordcloud_{_decade(inputs)}.png': freqs
+              for i, freqs in enumerate(cluster_frequencies(counts, members, terms, params['max_words']))}
+    # this stage runs in a pipeline thread next to gensim's training threads: fork is not safe here
+    rendered = render(tables, manifest_path=out / 'wordclouds.json', force=True,
+                      mp_context=multiprocessing.get_context('spawn'), **params)
+    return {'outputs': [Path(p).name for p in rendered]}
+
+
+def word2vec(inputs: Dict, params: Dict, out: Path) -> Dict:
+    from tps.corpus.embeddings import export_vectors, train, vectors_path
+
+    params = dict(params)
+    ann_index = params.pop('ann_index')
+    if not inputs['tokenize']['n_sents']:
+        raise ValueError('No sentences to train Word2Vec')
+    model = train(Path(inputs['tokenize']['_dir']) / inputs['tokenize']['sents'], **params)
+    model_path = out / f'word2vec_{_decade(inputs)}.model'
+    model.save(str(model_path))
+    kv = export_vectors(model, vectors_path(model_path), ann_index=ann_index)
+    return {'vocab_size': len(model.wv), 'vectors': kv.name,
+            'outputs': sorted(p.name for p in out.glob(model_path.stem + '.*'))}
+
+
+def w2v_sweep(inputs: Dict, params: Dict, out: Path) -> Dict:
+    from tps.corpus.embeddings import sweep
+
+    rows, _ = sweep(Path(inputs['tokenize']['_dir']) / inputs['tokenize']['sents'], params['variants'],
+                    out_dir=out, pairs=PAIRS, out_csv=None)
+    # paths relative to the stage directory, which is renamed once the stage succeeds
+    for row in rows:
+        row['path'], row['vectors'] = Path(row['path']).name, Path(row['vectors']).name
+    fieldnames = []
+    for row in rows:
+        fieldnames += [k for k in row if k not in fieldnames]
+    with (out / 'w2v_model_comparison.csv').open('w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    return {'models': {row['model']: row['vectors'] for row in rows},
+            'outputs': ['w2v_model_comparison.csv'] + sorted(p.name for p in out.glob('word2vec_*'))}
+
+
+def interpretation(inputs: Dict, params: Dict, out: Path) -> Dict:
+    import pandas as pd
+    from tps.corpus.embeddings import load_vectors
+
+    clusters = pd.read_csv(Path(inputs['kmeans']['_dir']) / f'clusters_{_decade(inputs)}.csv', encoding='utf-8')
+    vectors = {'base': Path(inputs['word2vec']['_dir']) / inputs['word2vec']['vectors']}
+    for name, kv in inputs['w2v_sweep']['models'].items():
+        vectors[name] = Path(inputs['w2v_sweep']['_dir']) / kv
+    models = {}
+    for name, path in vectors.items():
+        try:
+            models[name] = load_vectors(path)
+        except Exception as e:
+            print(f'Could not load {path}: {e}')
+            models[name] = None
+    top = {int(i): terms for i, terms in inputs['top_terms']['top_terms'].items()}
+    text = compose(clusters, top, models, _decade(inputs), params['examples'], params['listed_terms'])
+    (out / 'interpretation.txt').write_text(text, encoding='utf-8')
+    return {'outputs': ['interpretation.txt']}
+
+
+def compose(clusters, top: Dict[int, List[str]], models: Dict, decade: str, examples: int = 2,
+            listed_terms: int = 10) -> str:
+    """The interpretation text: clusters, top terms and the Word2Vec neighbours of each model."""
+    from tps.corpus.embeddings import query
+
+    start, _, end = decade.partition('_')
+    cluster_examples = defaultdict(list)
+    for filename, cluster in zip(clusters['filename'], clusters['cluster']):
+        cluster_examples[cluster].append(filename)
+
+    lines = ['Analyse et interprétation — TP3', f'Décennie analysée : {start}-{end}', '',
+             'Résumé des résultats :', f'- Documents analysés : {len(clusters)}',
+             f'- Nombre de clusters demandé : {len(top)}', '']
+    lines.append('Cohérence des clusters:')
+    lines.append("Les clusters obtenus à partir de TF-IDF + KMeans semblent regrouper des documents sur des thèmes majoritaires.\n"
+                 "Les top-terms par cluster (ci-dessous) fournissent une première indication sur les thématiques présentes — par exemple des clusters dominés par des termes liés à la politique, au sport, à la culture ou à l'international.")
+    lines.append('')
+    lines.append(f'Exemples de documents par cluster (1-{examples} fichiers exemplaires) :')
+    for i in sorted(cluster_examples):
+        ex = cluster_examples[i][:examples]
+        lines.append(f'Cluster {i}: ' + (', '.join(ex) if ex else 'aucun exemple'))
+    lines.append('')
+    lines.append('Méthodologie et limites:')
+    lines.append('- Représentation: TF-IDF (ngrams 1-2) utilisée pour KMeans. Les top-terms sont extraits à partir des centroïdes du modèle KMeans.')
+    lines.append("- Prétraitement: minimal (normalisation des espaces); le vectorizer a utilisé stopwords en anglais. Pour un corpus français, il serait préférable d'utiliser une liste de stopwords FR et de normaliser/lemmatiser.\n"
+                 "Ces choix peuvent affecter la cohérence des clusters (mots fonctionnels, lemmes, etc.).")
+    lines.append('- Les wordclouds par cluster sont disponibles dans le dossier `tp3/` pour inspection visuelle.')
+    lines.append('')
+    lines.append(f'Top terms par cluster (top {listed_terms}):')
+    for i in sorted(top):
+        lines.append(f'Cluster {i}: ' + ', '.join(top[i][:listed_terms]))
+    lines.append('')
+
+    lines.append('Word2Vec — modèles entraînés et exemples:')
+    for name, wv in models.items():
+        if wv is None:
+            lines.append(f'- {name}: entraînement ou chargement échoué')
+            continue
+        lines.append(f'- {name}: vocab_size={len(wv.key_to_index)}')
+        # all neighbours and pair similarities of a model in one batched query
+        res = query(wv, words=TEST_WORDS, pairs=PAIRS, topn=5)
+        for w in SAMPLE_WORDS:
+            sims = res['neighbours'][w]
+            lines.append(f'  {w} -> ' + ('OOV' if sims is None else '; '.join(f'{t}:{score:.3f}' for t, score in sims[:3])))
+        for a, b in PAIRS:
+            sc = res['similarity'][(a, b)]
+            lines.append(f'  similarity({a},{b}) = ' + ('OOV' if sc is None else f'{sc:.3f}'))
+        lines.append('')
+
+    lines.append('Conclusions et recommandations:')
+    lines.append("- Les clusters donnent une bonne vue d'ensemble mais doivent être validés manuellement : vérifier quelques documents par cluster pour confirmer la thématique.")
+    lines.append('- Améliorations: utiliser stopwords FR, normalisation (unicode, accents), lemmatisation, et tester différentes valeurs de n_clusters.')
+    lines.append('- Pour Word2Vec: comparer modèles avec fenêtres et min_count différents (déjà entraîné quelques variantes), et évaluer qualitativement via analogies et similarités.')
+    return '\n'.join(lines)
+
+
+def build(overrides: Dict[str, Dict] = None, cache_dir=PIPELINE_DIR) -> Pipeline:
+    """The TP3 pipeline with DEFAULTS updated by {stage: {param: value}}."""
+    params = {stage: dict(values) for stage, values in DEFAULTS.items()}
+    for stage, values in (overrides or {}).items():
+        if stage not in params:
+            raise KeyError(f'Unknown stage {stage!r}, expected one of {list(params)}')
+        params[stage].update(values)
+    return Pipeline([
+        Stage('select', select, params=params['select'], fingerprint=select_fingerprint),
+        Stage('tokenize', tokenize, ['select'], params['tokenize'], fingerprint=ocr_fingerprint, publish=True),
+        Stage('tfidf', tfidf, ['tokenize'], params['tfidf']),
+        Stage('kmeans', kmeans, ['tfidf', 'tokenize'], params['kmeans'], publish=True),
+        Stage('top_terms', top_terms, ['tfidf', 'kmeans', 'tokenize'], params['top_terms'], publish=True),
+        Stage('wordclouds', wordclouds, ['tfidf', 'kmeans', 'tokenize'], params['wordclouds'], publish=True),
+        Stage('word2vec', word2vec, ['tokenize'], params['word2vec'], publish=True),
+        Stage('w2v_sweep', w2v_sweep, ['tokenize'], params['w2v_sweep'], publish=True),
+        Stage('interpretation', interpretation, ['kmeans', 'top_terms', 'word2vec', 'w2v_sweep', 'tokenize'],
+              params['interpretation'], publish=True),
+    ], cache_dir=cache_dir)
+
+
+def _parse_set(spec: str):
+    """'stage.param=value' with value parsed as JSON when possible ('8', 'true', '[1, 3]')."""
+    target, _, raw = spec.partition('=')
+    stage, _, param = target.partition('.')
+    if not stage or not param:
+        raise argparse.ArgumentTypeError(f'Expected stage.param=value, got {spec!r}')
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    return stage, param, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the TP3 pipeline, rerunning only the stages whose inputs changed.')
+    parser.add_argument('--start', type=int, default=DEFAULTS['select']['start'])
+    parser.add_argument('--end', type=int, default=DEFAULTS['select']['end'])
+    parser.add_argument('--newspaper', default=None)
+    parser.add_argument('--set', dest='overrides', action='append', type=_parse_set, default=[],
+                        metavar='STAGE.PARAM=VALUE', help='Override a stage parameter (repeatable)')
+    parser.add_argument('--only', nargs='+', default=None, metavar='STAGE', help='Run these stages and their ancestors')
+    parser.add_argument('--force', nargs='+', default=[], metavar='STAGE', help='Rerun these stages (and their dependents)')
+    parser.add_argument('--jobs', type=int, default=None, help='Stages run at the same time (default: cores)')
+    parser.add_argument('--out', default=str(OUT_DIR), help='Where the artifacts are published')
+    parser.add_argument('--cache-dir', default=str(PIPELINE_DIR))
+    parser.add_argument('--dry-run', action='store_true', help='Only print the stages that would run')
+    parser.add_argument('--prune', action='store_true', help='Delete cached outputs of other parameter sets')
+    args = parser.parse_args()
+
+    overrides = defaultdict(dict)
+    overrides['select'].update(start=args.start, end=args.end, newspaper=args.newspaper)
+    for stage, param, value in args.overrides:
+        overrides[stage][param] = value
+    pipeline = build(overrides, args.cache_dir)
+
+    todo = pipeline.plan(args.only, args.force)
+    if args.dry_run:
+        for name in pipeline.needed(args.only):
+            print(f"{name:15s} {'run' if name in todo else 'cached'}  {pipeline.path(name)}")
+        return
+    status = pipeline.run(args.only, args.force, args.jobs)
+    for path in pipeline.publish(args.out):
+        print('Published', path)
+    if args.prune:
+        print(f'Pruned {len(pipeline.prune())} stale stage outputs')
+    failed = [n for n, s in status.items() if s in ('failed', 'skipped')]
+    if failed:
+        raise SystemExit(f'Stages not completed: {", ".join(failed)}')
+    print(f'Pipeline finished: {sum(s == "ran" for s in status.values())} stage(s) run, '
+          f'{sum(s == "cached" for s in status.values())} cached. Artifacts in {Path(args.out).resolve()}')
+
+
+if __name__ == '__main__':
+    main()